@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import argparse
+from cStringIO import StringIO
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from exams import optimized_HAC_news as hac
+from exams.document_matrix import build_document_matrix
+from exams.instrumentation import ClusteringStats
+from exams.similarity_join import similarity_join
+from recommendations import recommend
+from recommendations.rating_matrix import rating_matrix
+from synthetic import write_movielens, write_news
+
+__author__ = 'goran'
+
+# Run from the project root: python -m benchmarks.bench --output bench.json [--compare old.json]
+
+
+def timed(function, repeat=1):
+    '''
+    Calls function repeat times, returns (seconds of the fastest call, result of the last call). Whatever the call
+    prints is dropped.
+    :param function:
+    :param repeat:
+    :return:
+    '''
+    best, result = None, None
+    for _ in xrange(repeat):
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            start = time.time()
+            result = function()
+            seconds = time.time() - start
+        finally:
+            sys.stdout = stdout
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def bench_news(directory, n, repeat=1, min_closeness=0.4, linkage='centroid'):
+    '''
+    Times loading n synthetic news documents, their pairwise similarities, the clustering with both engines and the
+    similarity join
+    :param directory: where the corpus is written
+    :param n:
+    :param repeat:
+    :param min_closeness:
+    :param linkage:
+    :return: list of results, dictionaries with the name of the benchmark, n and seconds
+    '''
+    path = os.path.join(directory, 'news_%d.txt' % n)
+    write_news(path, documents=n)
+
+    results = []
+
+    def add(name, seconds):
+        results.append({'name': name, 'n': n, 'seconds': seconds})
+
+    seconds, docs = timed(lambda: hac.load_data(path), repeat)
+    add('news.load_data', seconds)
+
+    similarities, _ = timed(lambda: hac.similarity_matrix(docs), repeat)
+    add('news.similarity_matrix', similarities)
+
+    stats = []
+
+    def cluster():
+        stats.append(ClusteringStats())
+        return hac.hierarchical_clustering(docs, min_closeness=min_closeness, linkage=linkage, stats=stats[-1])
+
+    seconds, _ = timed(cluster, repeat)
+    add('news.hierarchical_clustering', seconds)
+    add('news.merge_loop', min(s.seconds['merge_loop'] for s in stats))
+
+    seconds, _ = timed(lambda: hac.nn_chain_clustering(docs, min_closeness=min_closeness, linkage='average'), repeat)
+    add('news.nn_chain_clustering', seconds)
+
+    seconds, _ = timed(lambda: similarity_join(build_document_matrix(docs), min_closeness), repeat)
+    add('news.similarity_join', seconds)
+    return results
+
+
+def bench_ratings(directory, n, repeat=1, neighbors=50, calls=20):
+    '''
+    Times loading synthetic MovieLens ratings of n users, calculate_similar_items, the conversion to RatingMatrix
+    and calls of the recommendation functions for calls users, with the dict prefs and with the RatingMatrix
+    :param directory: where the rating files are written
+    :param n:
+    :param repeat:
+    :param neighbors: n of calculate_similar_items
+    :param calls:
+    :return: list of results, dictionaries with the name of the benchmark, n and seconds (per call for the
+    recommendation functions)
+    '''
+    path = os.path.join(directory, 'movielens_%d' % n)
+    os.mkdir(path)
+    write_movielens(path, users=n)
+
+    results = []
+
+    def add(name, seconds):
+        results.append({'name': name, 'n': n, 'seconds': seconds})
+
+    seconds, prefs = timed(lambda: recommend.loadMovieLens(path), repeat)
+    add('ratings.loadMovieLens', seconds)
+
+    seconds, items_sim = timed(lambda: recommend.calculate_similar_items(prefs, n=neighbors), repeat)
+    add('ratings.calculate_similar_items', seconds)
+
+    # the dict functions run on the RatingMatrix kept for prefs (built by the first call, timed here on its own), the
+    # per_pair entries wrap sim_pearson so that it is called for every pair as before
+    seconds, _ = timed(lambda: rating_matrix(prefs), repeat)
+    add('ratings.rating_matrix', seconds)
+    recommend.prefs_matrix(prefs)
+    per_pair = lambda p, a, b: recommend.sim_pearson(p, a, b)
+
+    users = sorted(prefs)[:calls]
+    for name, call in [
+            ('ratings.top_matches', lambda user: recommend.top_matches(prefs, user)),
+            ('ratings.top_matches.per_pair', lambda user: recommend.top_matches(prefs, user, similarity=per_pair)),
+            ('ratings.user_based_recommendation', lambda user: recommend.user_based_recommendation(prefs, user)),
+            ('ratings.user_based_recommendation.per_pair',
+             lambda user: recommend.user_based_recommendation(prefs, user, per_pair)),
+            ('ratings.item_based_recommendation',
+             lambda user: recommend.item_based_recommendation(prefs, items_sim, user))]:
+        seconds, _ = timed(lambda: [call(user) for user in users], repeat)
+        add(name, seconds / len(users))
+    return results
+
+
+def exponents(results):
+    '''
+    Returns for every benchmark the exponent k of the best fit seconds ~ n^k (least squares on log-log scale), the
+    measured complexity of the engine. Runs shorter than a millisecond are too noisy and left out.
+    :param results:
+    :return:
+    '''
+    points = {}
+    for r in results:
+        if r['seconds'] >= 1e-3:
+            points.setdefault(r['name'], []).append((math.log(r['n']), math.log(r['seconds'])))
+
+    fitted = {}
+    for name, xy in points.iteritems():
+        if len(xy) < 2:
+            continue
+        mean_x = sum(x for x, y in xy) / len(xy)
+        mean_y = sum(y for x, y in xy) / len(xy)
+        den = sum((x - mean_x) ** 2 for x, y in xy)
+        if den > 0:
+            fitted[name] = sum((x - mean_x) * (y - mean_y) for x, y in xy) / den
+    return fitted
+
+
+def compare(old, new):
+    '''
+    Returns lines comparing the results of two runs (as written by run), one per benchmark and n in both
+    :param old:
+    :param new:
+    :return:
+    '''
+    before = dict(((r['name'], r['n']), r['seconds']) for r in old['results'])
+    lines = []
+    for r in new['results']:
+        key = (r['name'], r['n'])
+        if key in before and before[key] > 0:
+            lines.append('%-40s n=%-7d %10.4f -> %10.4f  x%.2f' % (r['name'], r['n'], before[key], r['seconds'],
+                                                                   r['seconds'] / before[key]))
+    return lines
+
+
+def run(news_sizes=(250, 500, 1000), ratings_sizes=(100, 200, 400), repeat=1, min_closeness=0.4, linkage='centroid'):
+    '''
+    Runs all benchmarks for every size, returns dictionary with the settings, the results and the fitted exponents
+    :param news_sizes: numbers of documents
+    :param ratings_sizes: numbers of users
+    :param repeat: the fastest of repeat runs is kept
+    :param min_closeness:
+    :param linkage:
+    :return:
+    '''
+    directory = tempfile.mkdtemp(prefix='bench')
+    try:
+        results = []
+        for n in news_sizes:
+            results.extend(bench_news(directory, n, repeat, min_closeness, linkage))
+        for n in ratings_sizes:
+            results.extend(bench_ratings(directory, n, repeat))
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'python': sys.version.split()[0],
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'settings': {'news_sizes': list(news_sizes), 'ratings_sizes': list(ratings_sizes), 'repeat': repeat,
+                     'min_closeness': min_closeness, 'linkage': linkage},
+        'results': results,
+        'exponents': exponents(results),
+    }
+
+
+def sizes(text):
+    return [int(s) for s in text.split(',') if s]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the news clustering and the recommendations')
+    parser.add_argument('--news-sizes', type=sizes, default=[250, 500, 1000], help='comma separated document counts')
+    parser.add_argument('--ratings-sizes', type=sizes, default=[100, 200, 400], help='comma separated user counts')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--min-closeness', type=float, default=0.4)
+    parser.add_argument('--linkage', default='centroid')
+    parser.add_argument('--output', default='bench.json', help='JSON file for the results')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    report = run(args.news_sizes, args.ratings_sizes, args.repeat, args.min_closeness, args.linkage)
+    with open(args.output, 'w') as w:
+        json.dump(report, w, indent=2, sort_keys=True)
+
+    for r in report['results']:
+        print '%-40s n=%-7d %10.4f' % (r['name'], r['n'], r['seconds'])
+    for name, k in sorted(report['exponents'].iteritems()):
+        print '%-40s ~ n^%.2f' % (name, k)
+    if args.compare:
+        with open(args.compare) as r:
+            for line in compare(json.load(r), report):
+                print line
+
+
+if __name__ == '__main__':
+    main()
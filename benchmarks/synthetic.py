@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left
+import random
+
+__author__ = 'goran'
+
+
+def zipf_weights(n, s=1.0):
+    '''
+    Returns the cumulative weights of a Zipf distribution over n ranks, for sample() (a few words or items are very
+    common and most are rare, like in the real data)
+    :param n:
+    :param s:
+    :return:
+    '''
+    cumulative = []
+    total = 0.0
+    for rank in xrange(1, n + 1):
+        total += 1.0 / rank ** s
+        cumulative.append(total)
+    return cumulative
+
+
+def sample(r, cumulative):
+    return bisect_left(cumulative, r.random() * cumulative[-1])
+
+
+def write_news(path, documents=1000, vocabulary=5000, words_per_document=15, topics=50, topic_words=0.7, seed=0):
+    '''
+    Writes synthetic corpus in the format of news.txt: for every document a title line, a line of key words as
+    word(rating) and an empty line. Every document belongs to one of topics, each with its own set of words, and
+    about topic_words of its words are from its topic (so there are clusters to find), the others from the whole
+    vocabulary with Zipf frequencies.
+    :param path:
+    :param documents:
+    :param vocabulary: number of different words
+    :param words_per_document: sparsity of the document vectors
+    :param topics:
+    :param topic_words: share of the words of a document taken from its topic
+    :param seed:
+    :return:
+    '''
+    r = random.Random(seed)
+    words = ['w%d' % i for i in xrange(vocabulary)]
+    cumulative = zipf_weights(vocabulary)
+    topic_vocabulary = [r.sample(words, min(vocabulary, 4 * words_per_document)) for _ in xrange(topics)]
+
+    with open(path, 'w') as w:
+        for d in xrange(documents):
+            topic = r.randrange(topics)
+            chosen = {}
+            while len(chosen) < words_per_document:
+                if r.random() < topic_words:
+                    word = r.choice(topic_vocabulary[topic])
+                else:
+                    word = words[sample(r, cumulative)]
+                chosen[word] = round(r.uniform(1.0, 30.0), 2)
+            w.write('Document %d on topic %d\n' % (d, topic))
+            w.write(' '.join('%s(%s)' % (word, rating) for word, rating in chosen.iteritems()) + '\n')
+            w.write('\n')
+
+
+def write_movielens(path, users=500, items=1000, ratings_per_user=50, seed=0):
+    '''
+    Writes synthetic ratings in the MovieLens 100k format to directory path (u.item and u.data, as read by
+    loadMovieLens). Items are picked with Zipf popularity and every user has ratings_per_user ratings on average, the
+    ratings are 1 to 5 around a per user and per item bias.
+    :param path:
+    :param users:
+    :param items:
+    :param ratings_per_user: sparsity of the rating matrix
+    :param seed:
+    :return:
+    '''
+    r = random.Random(seed)
+    cumulative = zipf_weights(items, 0.8)
+    item_bias = [r.gauss(0, 0.7) for _ in xrange(items)]
+
+    with open(path + '/u.item', 'w') as w:
+        for i in xrange(items):
+            w.write('%d|Movie %d (1995)|01-Jan-1995||\n' % (i + 1, i + 1))
+
+    with open(path + '/u.data', 'w') as w:
+        for u in xrange(users):
+            user_bias = r.gauss(0, 0.5)
+            count = max(1, min(items // 2, int(r.expovariate(1.0 / ratings_per_user))))
+            rated = set()
+            while len(rated) < count:
+                rated.add(sample(r, cumulative))
+            for i in sorted(rated):
+                rating = int(round(min(5, max(1, 3.5 + user_bias + item_bias[i] + r.gauss(0, 1)))))
+                w.write('%d\t%d\t%d\t%d\n' % (u + 1, i + 1, rating, 881250949 + r.randrange(10 ** 6)))
+
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import sys
+
+__author__ = 'goran'
+
+# Command line entry point: python cli.py cluster|add-news|recommend|build-model|bench ... (-h for the options of each).
+# The modules of a subcommand are imported only when it runs (the parser reads only the names of the linkages), so
+# the entry point itself starts at once.
+
+NEWS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exams', 'news.txt')
+
+
+def load_prefs(args):
+    '''
+    Loads the MovieLens ratings from args.data in format args.format (100k or 1m)
+    :param args:
+    :return:
+    '''
+    from recommendations import recommend
+
+    load = recommend.loadMovieLens if args.format == '100k' else recommend.loadMovieLens2
+    return load(args.data, cache=args.cache)
+
+
+def similarity_function(name):
+    from recommendations import recommend
+
+    return {'distance': recommend.sim_distance, 'pearson': recommend.sim_pearson}[name]
+
+
+def cluster(args):
+    from exams import optimized_HAC_news as hac
+
+    if args.linkage is None:
+        args.linkage = hac.DEFAULT_LINKAGES[args.algorithm]
+    try:
+        hac.check_linkage(args.algorithm, args.linkage)
+    except ValueError as e:
+        args.parser.error(str(e))
+
+    options = {}
+    if args.stats or args.progress:
+        if args.algorithm != 'heap':
+            raise SystemExit('--stats and --progress need --algorithm heap')
+        from exams.instrumentation import ClusteringStats, progress_printer
+
+        if args.stats:
+            options['stats'] = ClusteringStats()
+        if args.progress:
+            options['on_merge'] = progress_printer(args.progress)
+
+    hac.print_all_clusters(args.output, args.algorithm, args.linkage, args.limit, args.cache, args.workers,
+                           args.input, args.min_closeness, args.typecode, **options)
+    if args.stats:
+        print '\n'.join(options['stats'].report())
+
+
+def add_news(args):
+    from exams.incremental import IncrementalClustering, load_incremental
+    from exams.optimized_HAC_news import load_data, write_clusters
+
+    if os.path.exists(args.state):
+        state = load_incremental(args.state)
+        if args.rebuild_every is not None:
+            state.rebuild_every = args.rebuild_every or None
+    else:
+        state = IncrementalClustering(args.min_closeness, args.linkage, args.rebuild_every or None)
+
+    if args.input:
+        report = state.add_documents(load_data(args.input, limit=args.limit))
+        print ('%(routed)d documents routed to clusters, %(unrouted)d not, %(regions)d regions with '
+               '%(region_documents)d documents clustered again' % report)
+        if report['rebuilt']:
+            print 'All %d documents clustered again' % len(state)
+    if args.rebuild:
+        state.rebuild(args.typecode, args.workers)
+    state.save(args.state)
+    print '%d documents in %d clusters, state written to %s' % (len(state), len(state.clusters), args.state)
+
+    if args.output:
+        write_clusters(args.output, state.sorted_clusters())
+
+
+def recommend_users(args):
+    from recommendations import recommend
+
+    prefs = load_prefs(args)
+    if args.user_based:
+        items_sim = None
+    elif args.model:
+        from recommendations.item_model import load_item_model
+
+        items_sim = load_item_model(args.model)
+    else:
+        items_sim = recommend.calculate_similar_items(prefs, n=args.neighbors,
+                                                      similarity=similarity_function(args.metric))
+
+    if args.all:
+        if items_sim is None:
+            raise SystemExit('--all writes item based recommendations, it can not be used with --user-based')
+        from recommendations.batch import recommend_all
+
+        users = recommend_all(prefs, items_sim, args.all, args.n, args.workers, args.chunk_size)
+        print 'Recommendations of %d users written to %s' % (users, args.all)
+        return
+
+    for user in args.user or []:
+        if user not in prefs:
+            print >> sys.stderr, 'Unknown user %s' % user
+            continue
+        if items_sim is None:
+            ranking = recommend.user_based_recommendation(prefs, user, similarity_function(args.metric), top=args.n)
+        else:
+            ranking = recommend.item_based_recommendation(prefs, items_sim, user, top=args.n)
+        for score, item in ranking:
+            print '%s\t%s\t%f' % (user, item, score)
+
+
+def build_model(args):
+    from recommendations.item_model import build_item_model
+
+    model = build_item_model(load_prefs(args), args.neighbors, args.metric)
+    model.save(args.output)
+    print 'Model of %d items written to %s' % (len(model), args.output)
+
+
+def bench(args, options):
+    from benchmarks.bench import main as bench_main
+
+    bench_main(options)
+
+
+def add_ratings_arguments(parser):
+    parser.add_argument('--data', help='directory of the MovieLens files (default: recommend.DATA_PATH)')
+    parser.add_argument('--format', choices=['100k', '1m'], default='100k',
+                        help='100k: u.item and u.data, 1m: movies.dat and ratings.dat')
+    parser.add_argument('--cache', action='store_true', help='read the ratings through the binary cache')
+    parser.add_argument('--neighbors', type=int, default=50, help='similar items kept per item')
+    parser.add_argument('--metric', choices=['distance', 'pearson'], default='distance')
+
+
+def parser():
+    from exams.linkage import LINKAGES
+
+    linkages = sorted(LINKAGES)
+    main_parser = argparse.ArgumentParser(description='News clustering and movie recommendations')
+    commands = main_parser.add_subparsers(title='commands')
+
+    p = commands.add_parser('cluster', help='cluster the news and write the clusters')
+    p.add_argument('--input', default=NEWS_PATH, help='news file')
+    p.add_argument('--output', default='optimized_out.txt')
+    p.add_argument('--algorithm', choices=['heap', 'nn_chain'], default='heap')
+    p.add_argument('--linkage', choices=linkages,
+                   help='default centroid for heap and average for nn_chain (which needs a reducible linkage)')
+    p.add_argument('--min-closeness', type=float, default=0.4)
+    p.add_argument('--limit', type=int, help='cluster only the first LIMIT documents')
+    p.add_argument('--cache', action='store_true', help='read the news through the binary cache')
+    p.add_argument('--workers', type=int, default=1, help='processes computing the similarities, 0 for all cores')
+    p.add_argument('--typecode', choices=['d', 'f'], default='d', help='f stores the similarities as 4 byte floats')
+    p.add_argument('--stats', action='store_true', help='print counters and timings of the clustering')
+    p.add_argument('--progress', type=int, metavar='EVERY', help='report progress every EVERY merges')
+    p.set_defaults(run=cluster, parser=p)
+
+    p = commands.add_parser('add-news', help='add news to the clusters kept in a state file and write the clusters')
+    p.add_argument('--state', default='news.state', help='clustering state, created if it does not exist')
+    p.add_argument('--input', help='news file with the new documents')
+    p.add_argument('--output', help='write the clusters to OUTPUT')
+    p.add_argument('--limit', type=int, help='add only the first LIMIT documents')
+    p.add_argument('--rebuild', action='store_true', help='cluster all documents again')
+    p.add_argument('--rebuild-every', type=int, metavar='BATCHES',
+                   help='cluster all documents again after every BATCHES batches, 0 never')
+    p.add_argument('--linkage', choices=linkages, default='centroid', help='for a new state')
+    p.add_argument('--min-closeness', type=float, default=0.4, help='for a new state')
+    p.add_argument('--workers', type=int, default=1, help='processes computing the similarities of --rebuild')
+    p.add_argument('--typecode', choices=['d', 'f'], default='d')
+    p.set_defaults(run=add_news)
+
+    p = commands.add_parser('recommend', help='recommend movies to users')
+    add_ratings_arguments(p)
+    p.add_argument('--user', action='append', help='user to recommend to, can be repeated')
+    p.add_argument('-n', type=int, default=10, help='recommendations per user')
+    p.add_argument('--user-based', action='store_true', help='user based instead of item based recommendations')
+    p.add_argument('--model', help='item similarity model written by build-model, instead of computing it')
+    p.add_argument('--all', metavar='PATH', help='write the recommendations of all users to PATH')
+    p.add_argument('--workers', type=int, help='processes for --all (default all cores)')
+    p.add_argument('--chunk-size', type=int, default=500)
+    p.set_defaults(run=recommend_users)
+
+    p = commands.add_parser('build-model', help='build the item similarity model and save it')
+    add_ratings_arguments(p)
+    p.add_argument('--output', default='items.model')
+    p.set_defaults(run=build_model)
+
+    p = commands.add_parser('bench', help='run the benchmarks (the options are those of benchmarks.bench)',
+                            add_help=False)
+    p.set_defaults(run=bench)
+
+    return main_parser
+
+
+def main(argv=None):
+    main_parser = parser()
+    # the options of bench are left to benchmarks.bench
+    args, options = main_parser.parse_known_args(argv)
+    if args.run is bench:
+        return bench(args, options)
+    if options:
+        main_parser.error('unrecognized arguments: %s' % ' '.join(options))
+    if getattr(args, 'workers', None) == 0:
+        args.workers = None
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
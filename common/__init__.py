@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'goran'
+
+# Modules shared by the news clustering (exams) and the recommender (recommendations).
+# The packages import it as common, so the repository root has to be on sys.path: run their modules from the root as
+# python -m exams.optimized_HAC_news or python -m recommendations.recommend (or through cli.py).
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from array import array
+import ctypes
+import struct
+
+__author__ = 'goran'
+
+# The binary files of both packages (exams.corpus_cache, exams.incremental, recommendations.ratings_cache and
+# recommendations.item_model) are a header of their own followed by sections. Every section is its typecode, item
+# count, padding up to a multiple of ALIGNMENT bytes and the raw items, a list of strings is two sections: the offsets
+# and one string of all of them joined. Numbers are in the byte order of the machine, the files are not meant to be
+# copied around.
+SECTION = struct.Struct('<cq')
+ALIGNMENT = 8
+
+# ctypes type of the items of every array typecode, for the views over the mapped file
+CTYPES = {'c': ctypes.c_char, 'b': ctypes.c_byte, 'i': ctypes.c_int, 'l': ctypes.c_long, 'f': ctypes.c_float,
+          'd': ctypes.c_double}
+
+
+class MappedStrings:
+    '''
+    Read only list of strings stored in a memory mapped file. A string is read from the file only when accessed.
+    '''
+    def __init__(self, data, offsets, start):
+        self.data = data
+        self.offsets = offsets
+        self.start = start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('string index out of range')
+        return self.data[self.start + self.offsets[i]:self.start + self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+
+def padding(position):
+    return -position % ALIGNMENT
+
+
+def write_array(w, values):
+    w.write(SECTION.pack(values.typecode, len(values)))
+    w.write('\0' * padding(w.tell()))
+    values.tofile(w)
+
+
+def write_strings(w, strings):
+    offsets = array('l', [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    write_array(w, offsets)
+    write_array(w, array('c', ''.join(strings)))
+
+
+class SectionReader:
+    '''
+    Reads the sections written by write_array and write_strings one after the other from memory mapped file data,
+    starting at position
+    '''
+    def __init__(self, data, position):
+        self.data = data
+        self.position = position
+
+    def next_section(self):
+        '''
+        Returns (typecode, count, start) of the section at the current position and moves past it
+        :return:
+        '''
+        typecode, count = SECTION.unpack_from(self.data, self.position)
+        start = self.position + SECTION.size
+        start += padding(start)
+        self.position = start + count * ctypes.sizeof(CTYPES[typecode])
+        return typecode, count, start
+
+    def read_array(self):
+        '''
+        Returns the section at the current position copied into an array, for data that is changed after loading
+        :return:
+        '''
+        typecode, count, start = self.next_section()
+        values = array(typecode)
+        values.fromstring(buffer(self.data, start, count * values.itemsize))
+        return values
+
+    def read_view(self):
+        '''
+        Returns the section at the current position as a ctypes array over the mapped file itself, nothing is copied.
+        It is indexed like an array (slices are lists) and keeps the map open. ctypes needs a writable buffer, so data
+        has to be mapped with ACCESS_COPY (the pages are still shared with the file until something writes to them).
+        :return:
+        '''
+        typecode, count, start = self.next_section()
+        return (CTYPES[typecode] * count).from_buffer(self.data, start)
+
+    def read_strings(self, view=False):
+        '''
+        Returns MappedStrings, the strings stay in the file until they are used
+        :param view: the offsets are read with read_view instead of read_array
+        :return:
+        '''
+        offsets = self.read_view() if view else self.read_array()
+        typecode, count, start = self.next_section()
+        return MappedStrings(self.data, offsets, start)
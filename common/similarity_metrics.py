@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+from array import array
+from bisect import bisect_left
+from math import sqrt
+
+__author__ = 'goran'
+
+# Similarity metrics shared by the news clustering (exams) and the recommender (recommendations). Both keep their data
+# as a sparse matrix in CSR form, exams.document_matrix.DocumentMatrix (documents x key words) and
+# recommendations.rating_matrix.RatingMatrix (users x items), with the same interface: indptr, indices and data, the
+# lazily built columns(), row_totals() (number, sum and sum of squares of the values of every row) and
+# column_means(). The metrics here work on any such matrix.
+
+
+class Metric:
+    '''
+    Similarity of two rows of a sparse matrix, computed from the statistics of the columns they both have (shared):
+    their number, the sum of products of the two values and, if the metric needs them (sums, squares), the sums and
+    the sums of squares of the values of each row. With center the mean of every column is subtracted from its values
+    first. combine() turns the statistics into the similarity, so a new metric only has to define it (and
+    register_metric it), and gets both similarity() for one pair and the batched similarity_row() for one row against
+    all others.
+    Rows without shared columns have similarity 0.
+    '''
+    name = None
+    center = False
+    sums = False
+    squares = False
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        '''
+        Returns the similarity of rows r and c from the statistics of their shared columns
+        :param shared:
+        :param products:
+        :param sum_x: sums (None if not sums)
+        :param sum_y:
+        :param sq_x: sums of squares (None if neither sums nor squares)
+        :param sq_y:
+        :param totals: row_totals() of the matrix, (counts, sums, sums_sq) over all columns of every row
+        :param r:
+        :param c:
+        :return:
+        '''
+        raise NotImplementedError
+
+    def similarity(self, matrix, r, c):
+        '''
+        Returns the similarity of rows r and c of matrix
+        :param matrix:
+        :param r:
+        :param c:
+        :return:
+        '''
+        means = matrix.column_means() if self.center else None
+        indices, data = matrix.indices, matrix.data
+        other = dict((indices[k], data[k]) for k in xrange(matrix.indptr[c], matrix.indptr[c + 1]))
+
+        shared, products, sum_x, sum_y, sq_x, sq_y = 0, 0.0, 0.0, 0.0, 0.0, 0.0
+        for k in xrange(matrix.indptr[r], matrix.indptr[r + 1]):
+            col = indices[k]
+            if col not in other:
+                continue
+            m = means[col] if means else 0.0
+            x, y = data[k] - m, other[col] - m
+            shared += 1
+            products += x * y
+            sum_x += x
+            sum_y += y
+            sq_x += x * x
+            sq_y += y * y
+
+        if not shared:
+            return 0.0
+        return self.combine(shared, products, sum_x, sum_y, sq_x, sq_y, matrix.row_totals(), r, c)
+
+    def similarity_row(self, matrix, r, first=0):
+        '''
+        Returns array with the similarity of row r against every row of matrix (rows before first are left as 0).
+        The statistics of r with all other rows are collected in one pass over the columns of r.
+        :param matrix:
+        :param r:
+        :param first:
+        :return:
+        '''
+        col_rows, col_data = matrix.columns()
+        means = matrix.column_means() if self.center else None
+        n = len(matrix)
+        shared = array('l', [0]) * n
+        products = array('d', [0.0]) * n
+        sum_x = sum_y = sq_x = sq_y = None
+        if self.sums:
+            sum_x = array('d', [0.0]) * n
+            sum_y = array('d', [0.0]) * n
+        if self.sums or self.squares:
+            sq_x = array('d', [0.0]) * n
+            sq_y = array('d', [0.0]) * n
+
+        for k in xrange(matrix.indptr[r], matrix.indptr[r + 1]):
+            col = matrix.indices[k]
+            m = means[col] if means else 0.0
+            x = matrix.data[k] - m
+            rows, values = col_rows[col], col_data[col]
+            start = bisect_left(rows, first) if first else 0
+            if sum_x is not None:
+                for p in xrange(start, len(rows)):
+                    c, y = rows[p], values[p] - m
+                    shared[c] += 1
+                    products[c] += x * y
+                    sum_x[c] += x
+                    sum_y[c] += y
+                    sq_x[c] += x * x
+                    sq_y[c] += y * y
+            elif sq_x is not None:
+                for p in xrange(start, len(rows)):
+                    c, y = rows[p], values[p] - m
+                    shared[c] += 1
+                    products[c] += x * y
+                    sq_x[c] += x * x
+                    sq_y[c] += y * y
+            else:
+                for p in xrange(start, len(rows)):
+                    c = rows[p]
+                    shared[c] += 1
+                    products[c] += x * (values[p] - m)
+
+        totals = matrix.row_totals()
+        sims = array('d', [0.0]) * n
+        combine = self.combine
+        for c in xrange(first, n):
+            if not shared[c]:
+                continue
+            sims[c] = combine(shared[c], products[c], sum_x[c] if sum_x else None, sum_y[c] if sum_y else None,
+                              sq_x[c] if sq_x else None, sq_y[c] if sq_y else None, totals, r, c)
+        return sims
+
+
+class Cosine(Metric):
+    '''
+    Cosine of the angle between the rows
+    '''
+    name = 'cosine'
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        den = sqrt(totals[2][r] * totals[2][c])
+        return products / den if den else 0.0
+
+
+class ModuleCosine(Metric):
+    '''
+    sim_fun of the news clustering: dot product divided by the product of module()s, the square roots of the sums of
+    the values (not of their squares)
+    '''
+    name = 'sim_fun'
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        den = sqrt(totals[1][r]) * sqrt(totals[1][c])
+        return products / den if den else 0.0
+
+
+class AdjustedCosine(Metric):
+    '''
+    Cosine over the shared columns after subtracting the mean of every column (for item rows: the mean rating of every
+    user), so users who rate everything high or low do not make items look similar
+    '''
+    name = 'adjusted_cosine'
+    center = True
+    squares = True
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        den = sq_x * sq_y
+        return products / sqrt(den) if den > 0 else 0.0
+
+
+class Pearson(Metric):
+    '''
+    Pearson correlation over the shared columns, the same as sim_pearson
+    '''
+    name = 'pearson'
+    sums = True
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        num = products - (sum_x * sum_y / shared)
+        den = (sq_x - sum_x ** 2 / shared) * (sq_y - sum_y ** 2 / shared)
+        # rounding can leave a tiny negative instead of 0
+        return num / sqrt(den) if den > 0 else 0.0
+
+
+class Jaccard(Metric):
+    '''
+    Number of shared columns divided by the number of columns of either row (the values are not used)
+    '''
+    name = 'jaccard'
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        return 1.0 * shared / (totals[0][r] + totals[0][c] - shared)
+
+
+class Euclidean(Metric):
+    '''
+    1 / (1 + squared euclidean distance over the shared columns), the same as sim_distance
+    '''
+    name = 'euclidean'
+    squares = True
+
+    def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+        return 1.0 / (1.0 + max(0.0, sq_x + sq_y - 2 * products))
+
+
+METRICS = dict((m.name, m()) for m in [Cosine, ModuleCosine, AdjustedCosine, Pearson, Jaccard, Euclidean])
+
+
+def register_metric(metric):
+    '''
+    Adds Metric instance metric to METRICS under its name
+    :param metric:
+    :return:
+    '''
+    METRICS[metric.name] = metric
+    return metric
+
+
+def get_metric(name):
+    '''
+    Returns the Metric registered under name
+    :param name:
+    :return:
+    '''
+    if name not in METRICS:
+        raise ValueError('Unknown metric %r, expected one of %s' % (name, ', '.join(sorted(METRICS))))
+    return METRICS[name]
+
+
+def as_metric(similarity):
+    '''
+    Returns Metric for similarity given as Metric or as the name of one, None for anything else (a plain similarity
+    function)
+    :param similarity:
+    :return:
+    '''
+    if isinstance(similarity, Metric):
+        return similarity
+    if isinstance(similarity, basestring):
+        return get_metric(similarity)
+    return None
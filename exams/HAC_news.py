@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 # Because working with Macedonian Cyrillic characters
 
+# This module is kept as the straightforward reference clustering: every merge rescans all cluster pairs and builds
+# the merged centroid with merge_key_words, so a run is O(n^3). optimized_HAC_news.py holds the heap, nearest-neighbour
+# chain and Lance-Williams linkage versions, and the tests check them against the results of this one.
+
 import math
 import time
 
+from document_matrix import build_document_matrix
+
 __author__ = 'goran'
 
 def scalar(n1, n2):
@@ -141,33 +147,34 @@ def print_cluster(writer, cluster):
         writer.write('\n\n')
 
 
-def merge_key_words(x, y):
+def merge_key_words(x, y, size1, size2):
     '''
-    Calculates result[k] = (len1 * x[k] + len2 * y[k]) / (len1 + len2) for all keywords k in x or y
+    Calculates result[k] = (size1 * x[k] + size2 * y[k]) / (size1 + size2) for all keywords k in x or y, i.e. the
+    centroid of two clusters with size1 and size2 documents
     :param x:
     :param y:
+    :param size1:
+    :param size2:
     :return:
     '''
-    len1 = len(x)
-    len2 = len(y)
-
     allKeys = set(x.keys()).union(set(y.keys()))
 
     result = {}
 
     for key in allKeys:
-        result[key] = 1.0 * (len1 * x.get(key, 0) + len2 * y.get(key, 0)) / (len1 + len2)
+        result[key] = 1.0 * (size1 * x.get(key, 0) + size2 * y.get(key, 0)) / (size1 + size2)
 
     return result
 
 
-# print merge_key_words({'a': 1, 'b': 2}, {'b': 3, 'c': 3})
+# print merge_key_words({'a': 1, 'b': 2}, {'b': 3, 'c': 3}, 1, 2)
 
 
 def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4):
     '''
     At the start every news document is a cluster on its own. While there is a pair of clusters which similarity is
     above min_closeness the 2 closest such clusters are merged in one new cluster.
+    This is the O(n^3) reference version, see optimized_HAC_news.hierarchical_clustering for the fast one.
     :param data:
     :param sim_function:
     :param min_closeness:
@@ -180,9 +187,15 @@ def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4):
 
     before_similarities_calc = time.time()
 
-    for i in xrange(len(clusters)):
-        for j in xrange(i + 1, len(clusters)):
-            similarities[(clusters[i].id, clusters[j].id)] = sim_function(clusters[i].words, clusters[j].words)
+    if sim_function is sim_fun:
+        # all initial similarities come from the sparse document matrix instead of comparing dicts pair by pair
+        for i, sims in build_document_matrix(clusters).upper_similarities():
+            for k in xrange(len(sims)):
+                similarities[(clusters[i].id, clusters[i + 1 + k].id)] = sims[k]
+    else:
+        for i in xrange(len(clusters)):
+            for j in xrange(i + 1, len(clusters)):
+                similarities[(clusters[i].id, clusters[j].id)] = sim_function(clusters[i].words, clusters[j].words)
 
     after_similarities_calc = time.time()
 
@@ -214,7 +227,8 @@ def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4):
         if no_merge:
             break
 
-        merged_words = merge_key_words(clusters[clusters_to_merge[0]].words, clusters[clusters_to_merge[1]].words)
+        merged_words = merge_key_words(clusters[clusters_to_merge[0]].words, clusters[clusters_to_merge[1]].words,
+                                       clusters[clusters_to_merge[0]].size, clusters[clusters_to_merge[1]].size)
 
         new_cluster = BiCluster(merged_words, clusters[clusters_to_merge[0]], clusters[clusters_to_merge[1]], closest,
                                 id = current_id, size = clusters[clusters_to_merge[0]].size + clusters[clusters_to_merge[1]].size)
@@ -257,8 +271,5 @@ def print_all_clusters(path='out.txt'):
             print_cluster(wr, c)
 
 
-print_all_clusters()
-
-
-
-
+if __name__ == '__main__':
+    print_all_clusters()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+from multiprocessing.sharedctypes import RawArray
+
+__author__ = 'goran'
+
+
+class CondensedMatrix:
+    '''
+    Symmetric n x n matrix with no diagonal (similarities of n clusters) stored as its upper triangle in one flat
+    array, row by row: (0, 1), (0, 2), ..., (0, n - 1), (1, 2), ... That is n * (n - 1) / 2 values of 8 bytes, or 4
+    bytes with typecode 'f', instead of a dict entry or a heap tuple per pair. For i < j the value is at
+    offsets[i] + j, so the upper part of a row is contiguous and every lookup is O(1).
+    With shared the values are in shared memory (multiprocessing RawArray), so worker processes can fill them.
+    '''
+    def __init__(self, n, typecode='d', shared=False):
+        self.n = n
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        if shared:
+            self.values = RawArray(typecode, n * (n - 1) // 2)
+        else:
+            self.values = array(typecode, [0.0]) * (n * (n - 1) // 2)
+        self.offsets = array('l', (i * (2 * n - i - 1) // 2 - i - 1 for i in xrange(n)))
+
+    def __len__(self):
+        return self.n
+
+    def index(self, i, j):
+        '''
+        Returns the position of (i, j) in values
+        :param i:
+        :param j:
+        :return:
+        '''
+        if i > j:
+            i, j = j, i
+        elif i == j:
+            raise IndexError('The diagonal (%d, %d) is not stored' % (i, j))
+        return self.offsets[i] + j
+
+    def get(self, i, j):
+        return self.values[self.index(i, j)]
+
+    def set(self, i, j, value):
+        self.values[self.index(i, j)] = value
+
+    def set_upper_row(self, i, values):
+        '''
+        Sets (i, i + 1), ..., (i, n - 1) at once from values
+        :param i:
+        :param values:
+        :return:
+        '''
+        start = self.offsets[i] + i + 1
+        self.values[start:start + len(values)] = array(self.typecode, values)
+
+    def row(self, i):
+        '''
+        Returns RowView of row i
+        :param i:
+        :return:
+        '''
+        return RowView(self, i)
+
+    def nbytes(self):
+        return len(self.values) * self.itemsize
+
+
+class RowView:
+    '''
+    Row i of a CondensedMatrix, indexed like a list without copying anything. The diagonal reads as 1.0.
+    '''
+    def __init__(self, matrix, i):
+        self.matrix = matrix
+        self.i = i
+
+    def __len__(self):
+        return self.matrix.n
+
+    def __getitem__(self, j):
+        if j == self.i:
+            return 1.0
+        return self.matrix.get(self.i, j)
+
+    def __setitem__(self, j, value):
+        self.matrix.set(self.i, j, value)
+
+    def __iter__(self):
+        for j in xrange(self.matrix.n):
+            yield self[j]
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+import mmap
+import os
+import struct
+
+from common.sections import SectionReader, write_array, write_strings
+
+from document_matrix import DocumentMatrix, Vocabulary
+from news_reader import read_news
+
+__author__ = 'goran'
+
+# The cache file is the header followed by the sections (see common.sections): matrix indptr, indices, data and
+# norms, then the vocabulary and the titles.
+MAGIC = 'HACNEWS2'
+HEADER = struct.Struct('<8sqd')
+
+
+class MappedVocabulary(Vocabulary):
+    '''
+    Vocabulary with the words read from cache. The word -> id dictionary is built only when it is needed (when new
+    words are added), until then only the words that are printed are read.
+    '''
+    def __init__(self, words):
+        self.words = words
+
+    def __getattr__(self, name):
+        if name != 'ids':
+            raise AttributeError(name)
+        self.words = list(self.words)
+        self.ids = dict((w, i) for i, w in enumerate(self.words))
+        return self.ids
+
+
+def source_stamp(source):
+    '''
+    Returns (size, mtime) of source, the cache is valid only for the same values
+    :param source:
+    :return:
+    '''
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime
+
+
+def save_corpus(path, matrix, titles, source):
+    '''
+    Writes the documents (DocumentMatrix and their titles) loaded from source to cache file path. The file is written
+    next to path and renamed at the end, so a reader never sees half of it.
+    :param path:
+    :param matrix:
+    :param titles:
+    :param source:
+    :return:
+    '''
+    size, mtime = source_stamp(source)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as w:
+        w.write(HEADER.pack(MAGIC, size, mtime))
+        for values in (matrix.indptr, matrix.indices, matrix.data, matrix.norms):
+            write_array(w, values)
+        write_strings(w, matrix.vocabulary.words)
+        write_strings(w, titles)
+    os.rename(tmp, path)
+
+
+def load_corpus(path, source):
+    '''
+    Returns (DocumentMatrix, titles) from cache file path, or None if there is no cache or it was written for
+    different size or modification time of source. The file is memory mapped and the matrix, words and titles are
+    read from it in place (see SectionReader.read_view), a word or title is read only when it is used.
+    :param path:
+    :param source:
+    :return:
+    '''
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return None
+
+    with open(path, 'rb') as r:
+        data = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, size, mtime = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or (size, mtime) != source_stamp(source):
+        data.close()
+        return None
+
+    sections = SectionReader(data, HEADER.size)
+    matrix = DocumentMatrix()
+    matrix.indptr, matrix.indices, matrix.data, matrix.norms = [sections.read_view() for _ in xrange(4)]
+    matrix.vocabulary = MappedVocabulary(sections.read_strings(view=True))
+    titles = sections.read_strings(view=True)
+
+    return matrix, titles
+
+
+def cached_corpus(source='news.txt', path=None):
+    '''
+    Returns (DocumentMatrix, titles) of the documents in source. They are read from the cache file (source + '.cache'
+    by default) when it is up to date, otherwise source is parsed with read_news and the cache is written again.
+    :param source:
+    :param path:
+    :return:
+    '''
+    if path is None:
+        path = source + '.cache'
+
+    corpus = load_corpus(path, source)
+    if corpus is not None:
+        return corpus
+
+    matrix = DocumentMatrix()
+    titles = []
+    for title, vector in read_news(source, matrix.vocabulary):
+        matrix.add_vector(vector)
+        titles.append(title)
+
+    save_corpus(path, matrix, titles, source)
+
+    return matrix, titles
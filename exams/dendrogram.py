@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+
+__author__ = 'goran'
+
+
+class Dendrogram:
+    '''
+    The merge tree of one clustering, stored like a linkage matrix. Nodes 0 .. n - 1 are the documents, with their
+    ids, titles and vectors (DocumentVector) in parallel lists. Merge k creates node n + k, and its two children,
+    the similarity between them and its number of documents are left[k], right[k], similarity[k] and size[k] in
+    arrays. That is about 32 bytes per merge instead of a Python object with a __dict__ per cluster.
+    Key words (centroids) are computed only when asked for by centroid() and are not kept, the words dictionary holds
+    only the key words given with add_document.
+    Clusters are handed out as BiCluster views, which hold nothing but the tree and the node.
+    '''
+    def __init__(self):
+        self.ids = array('l')
+        self.titles = []
+        self.vectors = []
+        self.left = array('l')
+        self.right = array('l')
+        self.similarity = array('d')
+        self.size = array('l')
+        self.words = {}
+
+    def __len__(self):
+        return len(self.titles) + len(self.left)
+
+    def add_document(self, title, vector, id=None, words=None):
+        '''
+        Adds a document as a new leaf, returns BiCluster of it. All documents are added before the first merge.
+        :param title:
+        :param vector: DocumentVector of its key words
+        :param id: by default the number of documents before it
+        :param words: key words as dictionary word -> rating, if already known
+        :return:
+        '''
+        if len(self.left):
+            raise ValueError('Documents can not be added after a merge')
+        node = len(self.titles)
+        self.ids.append(node if id is None else id)
+        self.titles.append(title)
+        self.vectors.append(vector)
+        if words is not None:
+            self.words[node] = words
+        return BiCluster(self, node)
+
+    def add_documents(self, clusters):
+        '''
+        Adds the documents of clusters (single document BiClusters, e.g. from load_data of another tree), keeping their
+        ids, titles, vectors and already computed key words. Returns list of BiCluster of the new leaves.
+        :param clusters:
+        :return:
+        '''
+        return [self.add_document(c.title, c.vector, c.id, c.words) for c in clusters]
+
+    def merge(self, left, right, similarity):
+        '''
+        Adds the cluster made of BiClusters left and right, returns BiCluster of it
+        :param left:
+        :param right:
+        :param similarity: between left and right
+        :return:
+        '''
+        self.left.append(left.node)
+        self.right.append(right.node)
+        self.similarity.append(similarity)
+        self.size.append(self.node_size(left.node) + self.node_size(right.node))
+        return BiCluster(self, len(self) - 1)
+
+    def is_document(self, node):
+        return node < len(self.titles)
+
+    def node_size(self, node):
+        return 1 if node < len(self.titles) else self.size[node - len(self.titles)]
+
+    def centroid(self, node):
+        '''
+        Returns the key words of node, dictionary word -> rating. For a merged cluster it is the mean of the key words
+        of its documents (the same as the centroid of its two children weighted by their sizes), summed over its
+        leaves without recursion. Nothing is kept, so only the clusters asked for (e.g. the printed ones) ever have a
+        words dictionary, and only while the caller holds it.
+        :param node:
+        :return:
+        '''
+        if node in self.words:
+            return self.words[node]
+        if node < len(self.titles):
+            return self.vectors[node].words()
+
+        total = {}
+        for document in self.documents(node):
+            words = self.words[document] if document in self.words else self.vectors[document].words()
+            for word, rating in words.iteritems():
+                total[word] = total.get(word, 0) + rating
+        size = self.node_size(node)
+        return dict((word, 1.0 * rating / size) for word, rating in total.iteritems())
+
+    def documents(self, node):
+        '''
+        Yields the documents (leaf nodes) of node from left to right, without recursion
+        :param node:
+        :return:
+        '''
+        n = len(self.titles)
+        stack = [node]
+        while stack:
+            x = stack.pop()
+            if x < n:
+                yield x
+            else:
+                stack.append(self.right[x - n])
+                stack.append(self.left[x - n])
+
+    def linkage_matrix(self):
+        '''
+        Returns the merges as list of rows (left, right, similarity, size), row k for node n + k
+        :return:
+        '''
+        return zip(self.left, self.right, self.similarity, self.size)
+
+    def nbytes(self):
+        return sum(len(a) * a.itemsize for a in (self.ids, self.left, self.right, self.similarity, self.size))
+
+
+class BiCluster(object):
+    '''
+    Represents a cluster for HAC, a view of node of a Dendrogram. left and right are the children clusters (None for
+    documents), similarity is the similarity between them (1.0 for documents), id identifies the cluster: documents
+    have their id (>= 0) and merged clusters -1, -2, ... in the order they were created. size is the number of
+    documents in the cluster, title and vector (DocumentVector of the key words) are set only for documents. words is
+    the dictionary of key words given with the document, None otherwise (see cluster_words).
+    Views are created on the fly, two of the same node are equal.
+    '''
+    __slots__ = ('tree', 'node')
+
+    def __init__(self, tree, node):
+        self.tree = tree
+        self.node = node
+
+    def __eq__(self, other):
+        return isinstance(other, BiCluster) and self.tree is other.tree and self.node == other.node
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.tree), self.node))
+
+    def __repr__(self):
+        return 'BiCluster(id=%d, size=%d)' % (self.id, self.size)
+
+    @property
+    def id(self):
+        n = len(self.tree.titles)
+        return self.tree.ids[self.node] if self.node < n else n - self.node - 1
+
+    @property
+    def left(self):
+        n = len(self.tree.titles)
+        return BiCluster(self.tree, self.tree.left[self.node - n]) if self.node >= n else None
+
+    @property
+    def right(self):
+        n = len(self.tree.titles)
+        return BiCluster(self.tree, self.tree.right[self.node - n]) if self.node >= n else None
+
+    @property
+    def similarity(self):
+        n = len(self.tree.titles)
+        return self.tree.similarity[self.node - n] if self.node >= n else 1.0
+
+    @property
+    def size(self):
+        return self.tree.node_size(self.node)
+
+    @property
+    def title(self):
+        return self.tree.titles[self.node] if self.tree.is_document(self.node) else None
+
+    @property
+    def vector(self):
+        return self.tree.vectors[self.node] if self.tree.is_document(self.node) else None
+
+    @property
+    def words(self):
+        return self.tree.words.get(self.node)
+
+    def documents(self):
+        '''
+        Yields BiCluster of every document in the cluster, from left to right
+        :return:
+        '''
+        for node in self.tree.documents(self.node):
+            yield BiCluster(self.tree, node)
+
+
+def merge_key_words(x, y, size1, size2):
+    '''
+    Calculates result[k] = (size1 * x[k] + size2 * y[k]) / (size1 + size2) for all keywords k in x or y, i.e. the
+    centroid of two clusters with size1 and size2 documents
+    :param x:
+    :param y:
+    :param size1:
+    :param size2:
+    :return:
+    '''
+    allKeys = set(x.keys()).union(set(y.keys()))
+
+    result = {}
+
+    for key in allKeys:
+        result[key] = 1.0 * (size1 * x.get(key, 0) + size2 * y.get(key, 0)) / (size1 + size2)
+
+    return result
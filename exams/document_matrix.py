@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+from bisect import bisect_left
+import math
+
+__author__ = 'goran'
+
+
+class Vocabulary:
+    '''
+    Maps every key word to an integer id, which is the column of that word in the document matrix. Ids are given in
+    order of first appearance, so loading the same corpus always gives the same ids.
+    '''
+    def __init__(self):
+        self.ids = {}
+        self.words = []
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        '''
+        Returns the id of word, giving it a new one if it was not seen before
+        :param word:
+        :return:
+        '''
+        id = self.ids.get(word)
+        if id is None:
+            id = len(self.words)
+            self.ids[word] = id
+            self.words.append(word)
+        return id
+
+
+class DocumentVector:
+    '''
+    Key words of one document as two parallel arrays: sorted word ids from vocabulary and the ratings of the words
+    '''
+    def __init__(self, vocabulary, ids, weights):
+        self.vocabulary = vocabulary
+        self.ids = ids
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.ids)
+
+    def words(self):
+        '''
+        Returns the document as dictionary word -> rating
+        :return:
+        '''
+        words = self.vocabulary.words
+        return dict((words[self.ids[k]], self.weights[k]) for k in xrange(len(self.ids)))
+
+
+class DocumentMatrix:
+    '''
+    Key words of all documents stored as a sparse matrix in CSR form. Row r holds the words of document r: its word ids
+    are indices[indptr[r]:indptr[r + 1]] (sorted) and the corresponding ratings are in data at the same positions.
+    norms[r] is module() of the document, precomputed once, so similarities need only the dot products.
+    The transposed (column) form is built lazily the first time similarities are asked for, and with it every dot
+    product of a row against all other rows is one pass over the documents sharing a word with it.
+    '''
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.data = array('d')
+        self.norms = array('d')
+        self._columns = None
+        self._totals = None
+        self._means = None
+
+    def __len__(self):
+        return len(self.norms)
+
+    def add_row(self, words):
+        '''
+        Appends a document given as dictionary word -> rating, returns its row number
+        :param words:
+        :return:
+        '''
+        row = sorted((self.vocabulary.add(w), r) for w, r in words.iteritems())
+        self.indices.extend(w for w, r in row)
+        self.data.extend(r for w, r in row)
+        self.indptr.append(len(self.indices))
+        self.norms.append(math.sqrt(sum(r for w, r in row)))
+        self._columns = self._totals = self._means = None
+        return len(self.norms) - 1
+
+    def add_vector(self, vector):
+        '''
+        Appends a DocumentVector, returns its row number. An empty matrix takes over the vocabulary of the vector, so
+        vectors from one loader are added without translating their ids.
+        :param vector:
+        :return:
+        '''
+        if not len(self.norms) and not len(self.vocabulary):
+            self.vocabulary = vector.vocabulary
+        if vector.vocabulary is not self.vocabulary:
+            return self.add_row(vector.words())
+        self.indices.extend(vector.ids)
+        self.data.extend(vector.weights)
+        self.indptr.append(len(self.indices))
+        self.norms.append(math.sqrt(sum(vector.weights)))
+        self._columns = self._totals = self._means = None
+        return len(self.norms) - 1
+
+    def row_vector(self, r):
+        '''
+        Returns row r as DocumentVector
+        :param r:
+        :return:
+        '''
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return DocumentVector(self.vocabulary, self.indices[start:end], self.data[start:end])
+
+    def row_words(self, r):
+        '''
+        Returns row r back as dictionary word -> rating
+        :param r:
+        :return:
+        '''
+        words = self.vocabulary.words
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return dict((words[self.indices[k]], self.data[k]) for k in xrange(start, end))
+
+    def columns(self):
+        '''
+        Returns the transposed matrix as two lists indexed by word id: the rows containing the word (ascending) and the
+        ratings of the word in those rows
+        :return:
+        '''
+        if self._columns is None:
+            col_rows = [array('l') for _ in xrange(len(self.vocabulary))]
+            col_data = [array('d') for _ in xrange(len(self.vocabulary))]
+            for r in xrange(len(self.norms)):
+                for k in xrange(self.indptr[r], self.indptr[r + 1]):
+                    col_rows[self.indices[k]].append(r)
+                    col_data[self.indices[k]].append(self.data[k])
+            self._columns = (col_rows, col_data)
+        return self._columns
+
+    def row_totals(self):
+        '''
+        Returns (counts, sums, sums_sq), arrays with the number of words of every row, the sum of their ratings and
+        the sum of their squares (for similarity_metrics)
+        :return:
+        '''
+        if self._totals is None:
+            n = len(self.norms)
+            counts = array('l', (self.indptr[r + 1] - self.indptr[r] for r in xrange(n)))
+            sums = array('d', (sum(self.data[self.indptr[r]:self.indptr[r + 1]]) for r in xrange(n)))
+            sums_sq = array('d', (sum(x * x for x in self.data[self.indptr[r]:self.indptr[r + 1]]) for r in xrange(n)))
+            self._totals = (counts, sums, sums_sq)
+        return self._totals
+
+    def column_means(self):
+        '''
+        Returns array with the average rating of every word over the rows containing it
+        :return:
+        '''
+        if self._means is None:
+            col_rows, col_data = self.columns()
+            self._means = array('d', (sum(values) / len(values) if values else 0.0 for values in col_data))
+        return self._means
+
+    def dot_row(self, r, first=0):
+        '''
+        Returns array with the dot products of row r with every row (rows before first are left as 0)
+        :param r:
+        :param first:
+        :return:
+        '''
+        col_rows, col_data = self.columns()
+        dots = array('d', [0.0]) * len(self.norms)
+        for k in xrange(self.indptr[r], self.indptr[r + 1]):
+            x = self.data[k]
+            rows = col_rows[self.indices[k]]
+            weights = col_data[self.indices[k]]
+            for p in xrange(bisect_left(rows, first) if first else 0, len(rows)):
+                dots[rows[p]] += x * weights[p]
+        return dots
+
+    def similarity_row(self, r, first=0):
+        '''
+        Returns array with sim_fun of row r against every row (rows before first are left as 0). Pairs where one of
+        the documents has no words get similarity 0.
+        :param r:
+        :param first:
+        :return:
+        '''
+        dots = self.dot_row(r, first)
+        norm = self.norms[r]
+        for c in xrange(first, len(dots)):
+            den = norm * self.norms[c]
+            dots[c] = dots[c] / den if den != 0 else 0.0
+        return dots
+
+    def similarity(self, r, c):
+        '''
+        Returns sim_fun of rows r and c (0 if one of them has no words), walking their sorted word ids together
+        :param r:
+        :param c:
+        :return:
+        '''
+        den = self.norms[r] * self.norms[c]
+        if den == 0:
+            return 0.0
+        indices, data = self.indices, self.data
+        p, p_end = self.indptr[r], self.indptr[r + 1]
+        q, q_end = self.indptr[c], self.indptr[c + 1]
+        dot = 0.0
+        while p < p_end and q < q_end:
+            if indices[p] < indices[q]:
+                p += 1
+            elif indices[p] > indices[q]:
+                q += 1
+            else:
+                dot += data[p] * data[q]
+                p += 1
+                q += 1
+        return dot / den
+
+    def similarity_block(self, rows, cols=None):
+        '''
+        Returns list with one array per row in rows containing the similarities to cols (all rows if cols is None)
+        :param rows:
+        :param cols:
+        :return:
+        '''
+        block = []
+        for r in rows:
+            sims = self.similarity_row(r)
+            block.append(sims if cols is None else array('d', (sims[c] for c in cols)))
+        return block
+
+    def upper_similarities(self):
+        '''
+        Generator over the upper triangle of the similarity matrix. For row r yields (r, sims) where sims[k] is the
+        similarity between rows r and r + 1 + k.
+        :return:
+        '''
+        n = len(self.norms)
+        for r in xrange(n):
+            yield r, self.similarity_row(r, r + 1)[r + 1:]
+
+
+def build_document_matrix(clusters, vocabulary=None):
+    '''
+    Builds DocumentMatrix from the single document clusters returned by load_data (row r holds clusters[r].words, or
+    clusters[r].vector for clusters loaded without a words dictionary)
+    :param clusters:
+    :param vocabulary:
+    :return:
+    '''
+    matrix = DocumentMatrix(vocabulary)
+    for c in clusters:
+        if c.words is not None:
+            matrix.add_row(c.words)
+        else:
+            matrix.add_vector(c.vector)
+    return matrix
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+import mmap
+import os
+import struct
+
+from common.sections import SectionReader, write_array, write_strings
+
+from dendrogram import BiCluster, Dendrogram
+from document_matrix import DocumentMatrix, Vocabulary, build_document_matrix
+from optimized_HAC_news import hierarchical_clustering, sparse_clustering
+from similarity_join import similarity_join
+
+__author__ = 'goran'
+
+# The state file is the header (magic, linkage, min_closeness, batches since the last full rebuild and rebuild_every)
+# and then sections (see common.sections): the documents (matrix indptr, indices, data, norms, vocabulary and titles),
+# the merges of all cluster trees as one forest (left, right, similarity, node n + k is merge k), the forest node of
+# every cluster and the centroids of the clusters (indptr, word ids, ratings, modules).
+MAGIC = 'HACINCR2'
+HEADER = struct.Struct('<8s16sdqq')
+
+
+class IncrementalClustering:
+    '''
+    Keeps the clusters of a growing news corpus up to date batch by batch, instead of clustering all documents again.
+    Every cluster has its centroid (the mean of the key words of its documents) and an inverted index word -> clusters
+    with that word in the centroid. A new document is routed to the cluster with the most similar centroid (sim_fun)
+    if that is at least min_closeness, only the clusters sharing a word with it are scored. Then only the affected
+    regions are clustered again: every cluster that got new documents together with them, and the documents routed
+    nowhere among themselves. A region is clustered with sparse_clustering from the pairs of similarity_join, so it
+    costs about the square of its size and no n x n matrix is built.
+    Clusters never merge with each other across regions and routing looks only at the centroids from before the
+    batch, so the result drifts from what hierarchical_clustering of all documents would give. rebuild() clusters
+    everything again, with rebuild_every it runs after every rebuild_every batches.
+    The documents are stored once in matrix (one vocabulary) and as leaves of the documents Dendrogram, the clusters
+    are BiCluster roots of the (per region) trees. save() and load_incremental() keep all of it between batches.
+    '''
+    def __init__(self, min_closeness=0.4, linkage='centroid', rebuild_every=None):
+        self.min_closeness = min_closeness
+        self.linkage = linkage
+        self.rebuild_every = rebuild_every
+        self.batches = 0
+        self.matrix = DocumentMatrix()
+        self.documents = Dendrogram()
+        self.clusters = {}
+        self.centroids = {}
+        self.index = {}
+        self._next_key = 0
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def _add_cluster(self, root, centroid=None):
+        key = self._next_key
+        self._next_key += 1
+        if centroid is None:
+            centroid = self._centroid(root)
+        self.clusters[key] = root
+        self.centroids[key] = centroid
+        for w in centroid[0]:
+            self.index.setdefault(w, set()).add(key)
+
+    def _remove_cluster(self, key):
+        for w in self.centroids.pop(key)[0]:
+            keys = self.index[w]
+            keys.discard(key)
+            if not keys:
+                del self.index[w]
+        return self.clusters.pop(key)
+
+    def _centroid(self, root):
+        '''
+        Returns (dictionary word id -> rating, module) of the mean of the documents of root, the same as
+        Dendrogram.centroid but by word id
+        :param root:
+        :return:
+        '''
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        total = {}
+        for document in root.documents():
+            for k in xrange(indptr[document.id], indptr[document.id + 1]):
+                total[indices[k]] = total.get(indices[k], 0.0) + data[k]
+        size = root.size
+        words = dict((w, rating / size) for w, rating in total.iteritems())
+        return words, sum(words.itervalues()) ** 0.5
+
+    def route(self, row):
+        '''
+        Returns the key of the cluster with the most similar centroid to document row, None if no centroid is at
+        least min_closeness similar
+        :param row:
+        :return:
+        '''
+        indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+        products = {}
+        for k in xrange(indptr[row], indptr[row + 1]):
+            w, rating = indices[k], data[k]
+            for key in self.index.get(w, ()):
+                products[key] = products.get(key, 0.0) + rating * self.centroids[key][0][w]
+
+        best, closest = None, self.min_closeness
+        for key, product in products.iteritems():
+            # like DocumentMatrix.similarity, 0 if the document or the centroid has no ratings
+            den = self.centroids[key][1] * self.matrix.norms[row]
+            similarity = product / den if den != 0 else 0.0
+            if similarity >= closest:
+                best, closest = key, similarity
+        return best
+
+    def cluster_rows(self, rows):
+        '''
+        Clusters the documents rows on their own, returns the list of roots
+        :param rows:
+        :return:
+        '''
+        leaves = [BiCluster(self.documents, r) for r in rows]
+        edges = similarity_join(build_document_matrix(leaves), self.min_closeness)
+        return sparse_clustering(leaves, edges, min_closeness=self.min_closeness, linkage=self.linkage)
+
+    def add_documents(self, data):
+        '''
+        Adds the documents data (single document clusters from load_data) and clusters again the regions they
+        affect. Returns dictionary with the numbers of documents routed to existing clusters and starting new ones,
+        the regions clustered again and their documents, and whether the batch ended with a full rebuild.
+        :param data:
+        :return:
+        '''
+        rows = []
+        for c in data:
+            r = self.matrix.add_vector(c.vector) if c.words is None else self.matrix.add_row(c.words)
+            self.documents.add_document(c.title, self.matrix.row_vector(r))
+            rows.append(r)
+
+        affected = {}
+        unrouted = []
+        for r in rows:
+            key = self.route(r)
+            if key is None:
+                unrouted.append(r)
+            else:
+                affected.setdefault(key, []).append(r)
+
+        regions = [[d.id for d in self._remove_cluster(key).documents()] + routed
+                   for key, routed in affected.iteritems()]
+        if unrouted:
+            regions.append(unrouted)
+        for region in regions:
+            for root in self.cluster_rows(region):
+                self._add_cluster(root)
+
+        self.batches += 1
+        rebuilt = self.rebuild_every is not None and self.batches >= self.rebuild_every
+        if rebuilt:
+            self.rebuild()
+        return {'routed': len(rows) - len(unrouted), 'unrouted': len(unrouted), 'regions': len(regions),
+                'region_documents': sum(len(region) for region in regions), 'rebuilt': rebuilt}
+
+    def rebuild(self, typecode='d', workers=1):
+        '''
+        Clusters all documents again with hierarchical_clustering, which removes the drift of the incremental updates
+        :param typecode: 'd' or 'f', type of the stored similarities
+        :param workers: processes computing the similarities
+        :return:
+        '''
+        leaves = [BiCluster(self.documents, r) for r in xrange(len(self.matrix))]
+        roots = hierarchical_clustering(leaves, min_closeness=self.min_closeness, linkage=self.linkage,
+                                        typecode=typecode, workers=workers)
+        for key in self.clusters.keys():
+            self._remove_cluster(key)
+        for root in roots:
+            self._add_cluster(root)
+        self.batches = 0
+
+    def sorted_clusters(self):
+        '''
+        Returns the clusters from the largest, clusters of equal size in the order of their first documents
+        :return:
+        '''
+        return sorted(self.clusters.itervalues(), key=lambda c: (-c.size, min(d.id for d in c.documents())))
+
+    def save(self, path):
+        '''
+        Writes the state to file path (through a temporary file, renamed at the end). The trees of all clusters are
+        written as one forest over the documents.
+        :param path:
+        :return:
+        '''
+        n = len(self.matrix)
+        left, right, similarity, roots = array('l'), array('l'), array('d'), array('l')
+        centroid_indptr, centroid_words, centroid_ratings, modules = array('l', [0]), array('l'), array('d'), array('d')
+        for key in sorted(self.clusters):
+            cluster = self.clusters[key]
+            tree, leaves = cluster.tree, len(cluster.tree.titles)
+
+            # post order, the children of a merge are in the forest before it
+            forest = {}
+            stack = [cluster.node]
+            while stack:
+                x = stack[-1]
+                if x < leaves:
+                    forest[x] = tree.ids[x]
+                    stack.pop()
+                elif tree.left[x - leaves] not in forest:
+                    stack.append(tree.left[x - leaves])
+                elif tree.right[x - leaves] not in forest:
+                    stack.append(tree.right[x - leaves])
+                else:
+                    left.append(forest[tree.left[x - leaves]])
+                    right.append(forest[tree.right[x - leaves]])
+                    similarity.append(tree.similarity[x - leaves])
+                    forest[x] = n + len(left) - 1
+                    stack.pop()
+            roots.append(forest[cluster.node])
+
+            words = sorted(self.centroids[key][0].iteritems())
+            centroid_words.extend(w for w, rating in words)
+            centroid_ratings.extend(rating for w, rating in words)
+            centroid_indptr.append(len(centroid_words))
+            modules.append(self.centroids[key][1])
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as w:
+            w.write(HEADER.pack(MAGIC, self.linkage, self.min_closeness, self.batches, self.rebuild_every or 0))
+            for values in (self.matrix.indptr, self.matrix.indices, self.matrix.data, self.matrix.norms):
+                write_array(w, values)
+            write_strings(w, self.matrix.vocabulary.words)
+            write_strings(w, self.documents.titles)
+            for values in (left, right, similarity, roots, centroid_indptr, centroid_words, centroid_ratings, modules):
+                write_array(w, values)
+        os.rename(tmp, path)
+
+
+def load_incremental(path):
+    '''
+    Reads IncrementalClustering written by IncrementalClustering.save from file path. The clusters are views of one
+    Dendrogram, the forest in the file.
+    :param path:
+    :return:
+    '''
+    with open(path, 'rb') as r:
+        data = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, linkage, min_closeness, batches, rebuild_every = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not an incremental clustering' % path)
+
+        state = IncrementalClustering(min_closeness, linkage.rstrip('\0'), rebuild_every or None)
+        state.batches = batches
+        sections = SectionReader(data, HEADER.size)
+        matrix = state.matrix
+        matrix.indptr, matrix.indices, matrix.data, matrix.norms = [sections.read_array() for _ in xrange(4)]
+        matrix.vocabulary = Vocabulary()
+        for word in sections.read_strings():
+            matrix.vocabulary.add(word)
+        for r, title in enumerate(sections.read_strings()):
+            state.documents.add_document(title, matrix.row_vector(r))
+
+        left, right, similarity, roots = [sections.read_array() for _ in xrange(4)]
+        centroid_indptr, centroid_words, centroid_ratings, modules = [sections.read_array() for _ in xrange(4)]
+    finally:
+        data.close()
+
+    forest = Dendrogram()
+    forest.add_documents(BiCluster(state.documents, r) for r in xrange(len(matrix)))
+    for k in xrange(len(left)):
+        forest.merge(BiCluster(forest, left[k]), BiCluster(forest, right[k]), similarity[k])
+
+    for c, root in enumerate(roots):
+        start, end = centroid_indptr[c], centroid_indptr[c + 1]
+        words = dict(zip(centroid_words[start:end], centroid_ratings[start:end]))
+        state._add_cluster(BiCluster(forest, root), (words, modules[c]))
+    return state
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+import sys
+from timeit import default_timer
+
+__author__ = 'goran'
+
+# Size of one heap entry of hierarchical_clustering, a tuple (-similarity, i, j, gen_i, gen_j): the list slot, the
+# tuple and the float in it (the small ints are shared)
+HEAP_ENTRY_BYTES = 8 + sys.getsizeof((0.0, 0, 0, 0, 0)) + sys.getsizeof(0.0)
+
+
+class ClusteringStats:
+    '''
+    Counters and timings of one run of hierarchical_clustering, filled only when passed to it as stats. Every phase
+    ('similarities', 'heap', 'merge_loop') has its seconds (timeit.default_timer, the most precise clock of the
+    platform) and a dictionary of counters: similarity evaluations, heap pushes and pops, stale entries skipped and
+    merges. The clustering derives the counters from the heap length once per merge instead of counting every push and
+    pop, so the instrumented loop does the same work as the plain one.
+    store_bytes is the size of the similarity matrix and peak_heap_entries the largest number of candidate pairs held
+    at once, peak_memory() estimates the bytes of both together.
+    '''
+    def __init__(self):
+        self.phases = []
+        self.seconds = {}
+        self.counters = {}
+        self.store_bytes = 0
+        self.peak_heap_entries = 0
+        self._started = {}
+
+    def start(self, phase):
+        if phase not in self.seconds:
+            self.phases.append(phase)
+            self.seconds[phase] = 0.0
+            self.counters[phase] = {}
+        self._started[phase] = default_timer()
+
+    def stop(self, phase):
+        self.seconds[phase] += default_timer() - self._started.pop(phase)
+
+    def count(self, phase, name, n=1):
+        counters = self.counters[phase]
+        counters[name] = counters.get(name, 0) + n
+
+    def total(self, name):
+        '''
+        Returns the sum of counter name over all phases
+        :param name:
+        :return:
+        '''
+        return sum(counters.get(name, 0) for counters in self.counters.itervalues())
+
+    def peak_memory(self):
+        return self.store_bytes + self.peak_heap_entries * HEAP_ENTRY_BYTES
+
+    def report(self):
+        '''
+        Returns the stats as lines of text, one per phase and one for the memory
+        :return:
+        '''
+        lines = []
+        for phase in self.phases:
+            counters = ' '.join('%s=%d' % item for item in sorted(self.counters[phase].iteritems()))
+            lines.append('%-12s %10.6f s  %s' % (phase, self.seconds[phase], counters))
+        lines.append('memory       %d bytes (matrix %d, at most %d heap entries)' %
+                     (self.peak_memory(), self.store_bytes, self.peak_heap_entries))
+        return lines
+
+
+def progress_printer(every=1000, writer=sys.stdout):
+    '''
+    Returns on_merge callback for hierarchical_clustering that writes a line after every every merges, for long runs
+    :param every:
+    :param writer:
+    :return:
+    '''
+    started = [default_timer()]
+
+    def on_merge(cluster, merges, clusters):
+        if merges % every == 0:
+            writer.write('%d merges, %d of %d clusters left, %.1f s\n' %
+                         (merges, clusters, merges + clusters, default_timer() - started[0]))
+    return on_merge
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+import math
+
+__author__ = 'goran'
+
+
+class Linkage:
+    '''
+    Decides how similar a merged cluster is to the other clusters. After clusters i and j are merged (the result
+    keeps slot i), update() gives the similarity of every other cluster k to it from s_ki, s_kj and s_ij only
+    (Lance-Williams formula), so a merge costs O(n) instead of recomputing the similarities from key words.
+    Keeps the size and the mass (sum of ratings of the centroid) of the cluster in every slot. The formula itself is
+    combine(), which takes sizes and masses directly, so it can also be used for clusters that are no longer in a slot.
+    reducible linkages never make a merged cluster more similar to k than both of its parts were, which is needed by
+    the nearest neighbor chain algorithm. needs_low is False for linkages which only compare similarities, for them
+    every similarity below min_closeness can be taken as -inf without changing any merge.
+    '''
+    name = None
+    reducible = False
+    needs_low = True
+
+    def __init__(self, sizes, masses):
+        self.sizes = list(sizes)
+        self.masses = list(masses)
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        raise NotImplementedError
+
+    def update(self, s_ki, s_kj, s_ij, i, j, k):
+        return self.combine(s_ki, s_kj, s_ij, self.sizes[i], self.sizes[j], self.sizes[k],
+                            self.masses[i], self.masses[j])
+
+    def merge(self, i, j, s_ij):
+        '''
+        Called after all updates for the merge of j into slot i
+        :param i:
+        :param j:
+        :param s_ij:
+        :return:
+        '''
+        self.masses[i] = merged_mass(self.sizes[i], self.sizes[j], self.masses[i], self.masses[j])
+        self.sizes[i] += self.sizes[j]
+
+
+def merged_mass(n_i, n_j, m_i, m_j):
+    '''
+    Mass of the centroid of two clusters, the size weighted average of their masses
+    :param n_i:
+    :param n_j:
+    :param m_i:
+    :param m_j:
+    :return:
+    '''
+    return 1.0 * (n_i * m_i + n_j * m_j) / (n_i + n_j)
+
+
+class SingleLinkage(Linkage):
+    '''
+    Similarity of two clusters is the similarity of their most similar documents
+    '''
+    name = 'single'
+    reducible = True
+    needs_low = False
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        return max(s_ki, s_kj)
+
+
+class CompleteLinkage(Linkage):
+    '''
+    Similarity of two clusters is the similarity of their least similar documents
+    '''
+    name = 'complete'
+    reducible = True
+    needs_low = False
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        return min(s_ki, s_kj)
+
+
+class AverageLinkage(Linkage):
+    '''
+    Similarity of two clusters is the average similarity over all pairs of their documents
+    '''
+    name = 'average'
+    reducible = True
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        return 1.0 * (n_i * s_ki + n_j * s_kj) / (n_i + n_j)
+
+
+class CentroidLinkage(Linkage):
+    '''
+    Similarity of two clusters is sim_fun of their centroids, where the centroid of a merged cluster is the average of
+    the centroids of its parts weighted by their sizes (see merge_key_words). Dot products with the centroid are the
+    same weighted average, and so is its mass (the sum of its ratings, module() squared), so with the masses kept per
+    slot the update is exact. Not reducible: a merged centroid can be closer to k than both parts were.
+    '''
+    name = 'centroid'
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        m_ij = merged_mass(n_i, n_j, m_i, m_j)
+        if m_ij <= 0:
+            return 0.0
+        return (n_i * s_ki * math.sqrt(m_i) + n_j * s_kj * math.sqrt(m_j)) / ((n_i + n_j) * math.sqrt(m_ij))
+
+
+class WardLinkage(Linkage):
+    '''
+    Ward's minimum variance linkage with 1 - similarity used as the squared distance. The coefficients sum to 1, so
+    the update is the same written for similarities.
+    '''
+    name = 'ward'
+    reducible = True
+
+    def combine(self, s_ki, s_kj, s_ij, n_i, n_j, n_k, m_i, m_j):
+        return 1.0 * ((n_i + n_k) * s_ki + (n_j + n_k) * s_kj - n_k * s_ij) / (n_i + n_j + n_k)
+
+
+LINKAGES = dict((l.name, l) for l in [SingleLinkage, CompleteLinkage, AverageLinkage, CentroidLinkage, WardLinkage])
+
+
+def get_linkage(name, sizes, masses):
+    '''
+    Returns new linkage object of the given name for clusters with the given sizes and masses (sum of ratings)
+    :param name:
+    :param sizes:
+    :param masses:
+    :return:
+    '''
+    if name not in LINKAGES:
+        raise ValueError('Unknown linkage %r, expected one of %s' % (name, ', '.join(sorted(LINKAGES))))
+    return LINKAGES[name](sizes, masses)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+import heapq
+import random
+import time
+
+__author__ = 'goran'
+
+
+class SimHashIndex:
+    '''
+    Locality sensitive hashing of the rows of a DocumentMatrix for cosine similarity. Every word gets a random +1/-1
+    for each of bands * rows_per_band hyperplanes, and bit b of a document's signature is the sign of the weighted sum
+    of its words on hyperplane b. The signature is cut in bands, and documents with the same value of some band become
+    candidate pairs. Two documents agree on one bit with probability 1 - angle / pi, so more bands find more of the
+    similar pairs (better recall) and more rows per band give fewer, more similar candidates (faster).
+    '''
+    def __init__(self, matrix, bands=16, rows_per_band=4, seed=0, max_bucket=500):
+        self.matrix = matrix
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+        self.seed = seed
+        self.max_bucket = max_bucket
+        self._planes = {}
+        self.signatures = [self.signature(r) for r in xrange(len(matrix))]
+
+    def planes(self, word):
+        '''
+        Returns list with the +1.0/-1.0 of word on every hyperplane, the same for the same seed
+        :param word:
+        :return:
+        '''
+        planes = self._planes.get(word)
+        if planes is None:
+            bits = random.Random(self.seed * 1000003 + word).getrandbits(self.bands * self.rows_per_band)
+            planes = [1.0 if bits >> b & 1 else -1.0 for b in xrange(self.bands * self.rows_per_band)]
+            self._planes[word] = planes
+        return planes
+
+    def signature(self, r):
+        '''
+        Returns the signature of row r as a tuple with one integer per band
+        :param r:
+        :return:
+        '''
+        m = self.matrix
+        sums = [0.0] * (self.bands * self.rows_per_band)
+        for k in xrange(m.indptr[r], m.indptr[r + 1]):
+            w = m.data[k]
+            sums = [s + w * p for s, p in zip(sums, self.planes(m.indices[k]))]
+
+        band = []
+        for b in xrange(self.bands):
+            value = 0
+            for s in sums[b * self.rows_per_band:(b + 1) * self.rows_per_band]:
+                value = value << 1 | (s > 0)
+            band.append(value)
+        return tuple(band)
+
+    def candidate_pairs(self):
+        '''
+        Returns set of pairs (i, j), i < j, of rows sharing at least one band. Buckets with more than max_bucket rows
+        (e.g. documents without words) are skipped, they would give too many pairs.
+        :return:
+        '''
+        pairs = set()
+        for b in xrange(self.bands):
+            buckets = {}
+            for r, signature in enumerate(self.signatures):
+                buckets.setdefault(signature[b], []).append(r)
+            for rows in buckets.itervalues():
+                if 1 < len(rows) <= self.max_bucket:
+                    for x in xrange(len(rows)):
+                        for y in xrange(x + 1, len(rows)):
+                            pairs.add((rows[x], rows[y]))
+        return pairs
+
+
+def knn_graph(matrix, k=10, min_closeness=0.4, bands=16, rows_per_band=4, seed=0):
+    '''
+    Returns approximate k nearest neighbor graph of the rows of DocumentMatrix matrix as list of edges
+    (i, j, similarity). Only the LSH candidate pairs are scored (exactly), only those with similarity at least
+    min_closeness are kept and for every document only its k most similar ones. The edges can be passed to
+    hierarchical_clustering.
+    :param matrix:
+    :param k:
+    :param min_closeness:
+    :param bands:
+    :param rows_per_band:
+    :param seed:
+    :return:
+    '''
+    index = SimHashIndex(matrix, bands, rows_per_band, seed)
+
+    nearest = [[] for _ in xrange(len(matrix))]
+    for i, j in index.candidate_pairs():
+        similarity = matrix.similarity(i, j)
+        if similarity < min_closeness:
+            continue
+        for a, b in ((i, j), (j, i)):
+            if len(nearest[a]) < k:
+                heapq.heappush(nearest[a], (similarity, b))
+            elif similarity > nearest[a][0][0]:
+                heapq.heapreplace(nearest[a], (similarity, b))
+
+    edges = set()
+    for i, neighbors in enumerate(nearest):
+        for similarity, j in neighbors:
+            edges.add((min(i, j), max(i, j), similarity))
+    return sorted(edges)
+
+
+def recall_report(matrix, k=10, min_closeness=0.4, bands=16, rows_per_band=4, seed=0):
+    '''
+    Compares knn_graph with the exact pairs above min_closeness (from matrix.upper_similarities), returns dictionary
+    with the number of exact pairs, of the pairs found by knn_graph, the recall and the seconds both took
+    :param matrix:
+    :param k:
+    :param min_closeness:
+    :param bands:
+    :param rows_per_band:
+    :param seed:
+    :return:
+    '''
+    before = time.time()
+    edges = knn_graph(matrix, k, min_closeness, bands, rows_per_band, seed)
+    after_lsh = time.time()
+
+    exact = set()
+    for i, sims in matrix.upper_similarities():
+        for x in xrange(len(sims)):
+            if sims[x] >= min_closeness:
+                exact.add((i, i + 1 + x))
+    after_exact = time.time()
+
+    found = set((i, j) for i, j, similarity in edges)
+
+    return {
+        'exact_pairs': len(exact),
+        'found_pairs': len(found),
+        'recall': 1.0 * len(found & exact) / len(exact) if exact else 1.0,
+        'lsh_seconds': after_lsh - before,
+        'exact_seconds': after_exact - after_lsh,
+    }
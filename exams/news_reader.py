@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+
+from document_matrix import DocumentVector, Vocabulary
+
+__author__ = 'goran'
+
+def parse_word_ratings(line, vocabulary):
+    '''
+    Parses line of 'word(rating)' pairs into DocumentVector, interning the words in vocabulary. Malformed pairs are
+    skipped and if a word repeats its last rating is kept (like split_all_word_rating_pairs does).
+    :param line:
+    :param vocabulary:
+    :return:
+    '''
+    ids = vocabulary.ids
+    ratings = {}
+
+    for token in line.split():
+        word, bracket, rating = token.partition('(')
+        if not word or not bracket or rating[-1:] != ')':
+            continue
+        try:
+            rating = float(rating[:-1])
+        except ValueError:
+            continue
+
+        id = ids.get(word)
+        if id is None:
+            id = vocabulary.add(word)
+        ratings[id] = rating
+
+    keys = sorted(ratings)
+    return DocumentVector(vocabulary, array('l', keys), array('d', [ratings[k] for k in keys]))
+
+
+def read_news(path='news.txt', vocabulary=None):
+    '''
+    Generator over the documents in path, yields (title, DocumentVector) for every one of them without keeping the
+    file in memory. A document is its title line, its key words line and an empty line. If the empty line is missing
+    the line is taken as the title of the next document instead of shifting all documents after it, and documents
+    without any key words are skipped. All documents share vocabulary (a new one if not given), so every word is kept
+    only once.
+    :param path:
+    :param vocabulary:
+    :return:
+    '''
+    if vocabulary is None:
+        vocabulary = Vocabulary()
+
+    with open(path, 'r') as r:
+        title = None
+        expect_words = False
+        for line in r:
+            if expect_words:
+                vector = parse_word_ratings(line, vocabulary)
+                if len(vector):
+                    yield title, vector
+                expect_words = False
+            elif title is None or line.strip():
+                # title of the next document (after the empty line, or in place of it)
+                title = line
+                expect_words = True
+            else:
+                title = None
+
+
+def read_news_chunks(path='news.txt', chunk_size=1000, vocabulary=None):
+    '''
+    Same as read_news, but yields lists of up to chunk_size documents
+    :param path:
+    :param chunk_size:
+    :param vocabulary:
+    :return:
+    '''
+    chunk = []
+    for document in read_news(path, vocabulary):
+        chunk.append(document)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
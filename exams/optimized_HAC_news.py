@@ -7,6 +7,16 @@ import math
 import time
 import heapq
 
+from common.similarity_metrics import as_metric
+
+from condensed import CondensedMatrix
+from corpus_cache import cached_corpus
+from dendrogram import Dendrogram
+from document_matrix import build_document_matrix
+from linkage import LINKAGES, get_linkage, merged_mass
+from news_reader import read_news
+from parallel_similarity import fill_similarities
+
 # class SimWrapper:
 #     def __init__(self, sim, id):
 #         self.sim = -sim
@@ -61,24 +71,6 @@ def sim_fun(n1, n2):
     return 1.0 * scalar(n1, n2) / (module(n1) * module(n2))
 
 
-class BiCluster:
-    '''
-    Represents a cluster for HAC. Contains dictionary of key words for the cluster, left child and right child
-    are the corresponding children clusters of the cluster,
-    similarity keeps track of the similarity between the left and right children. id is used to identify the cluster
-    and keep track which ones are single documents (the ones with positive id). size equals the number of documents
-    in the cluster. Title is the title of the document for single document clusters and None otherwise.
-    '''
-    def __init__(self, words, left=None, right=None, similarity=1.0, id=None, size=1, title=None):
-        self.words = words
-        self.left = left
-        self.right = right
-        self.similarity = similarity
-        self.id = id
-        self.size = size
-        self.title = title
-
-
 def get_word_and_rating(p):
     '''
     Used to extract word and its rating from strings of form 'word(rating)'
@@ -112,146 +104,241 @@ def join_all_word_rating_pairs(words):
     return ' '.join(str.format('%s(%f)' %(w[0], w[1])) for w in words.items())
 
 
-def load_data(path='news.txt'):
+def load_data(path='news.txt', limit=None, vocabulary=None, cache=False):
     '''
-    Loads initial clusters (every news document is cluster on its own at the start)
+    Loads initial clusters (every news document is cluster on its own at the start). The file is streamed with
+    read_news, the key words of every document are kept as DocumentVector and malformed documents are skipped.
+    With cache the documents are read from the binary cache of path (see corpus_cache), which is rebuilt when path
+    changes.
     :param path:
+    :param limit: load at most this many documents (all if None)
+    :param vocabulary: ignored with cache, the cached vocabulary is used
+    :param cache:
     :return:
     '''
-    clusters = {}
-
-    with open(path, 'r') as r:
-        count = 0
-        for line in r:
-            if count % 3 == 0:
-                # Title reading
-                title = line
-            elif count % 3 == 1:
-                words = split_all_word_rating_pairs(line)
-            else:
-                cluster = BiCluster(words, left=None, right=None, similarity=1, id=count/3, title=title)
-                clusters[cluster.id] = cluster
-
-            count += 1
+    tree = Dendrogram()
+    clusters = []
+
+    if cache:
+        matrix, titles = cached_corpus(path)
+        n = len(matrix) if limit is None else min(limit, len(matrix))
+        for r in xrange(n):
+            clusters.append(tree.add_document(titles[r], matrix.row_vector(r)))
+        return clusters
+
+    for title, vector in read_news(path, vocabulary):
+        if limit is not None and len(clusters) >= limit:
+            break
+        clusters.append(tree.add_document(title, vector))
 
-            if count > 20:
-                break
     return clusters
 
 
 def print_cluster(writer, cluster):
     '''
-    Prints cluster recursively (first line contains words for this cluster, then for each document in the cluster
-    prints firstly the title and after it the key words for that document
+    Prints cluster: for each document in the cluster (from left to right) prints firstly the title and after it the
+    key words for that document. The tree is walked with a stack, so deep trees do not hit the recursion limit.
     :param cluster:
     :return:
     '''
-    if cluster.id < 0:# this is not a document so it don't need to be printed
-
-        if cluster.left != None:# recursively do the printing for the left child
-            print_cluster(writer, cluster.left)
-
-        if cluster.right != None: # recursively do the printing for the right child
-            print_cluster(writer, cluster.right)
-
-    else:
+    for document in cluster.documents():
 
-        writer.write('\t' + cluster.title)
+        writer.write('\t' + document.title)
 
-        writer.write('\t' + join_all_word_rating_pairs(cluster.words))
+        writer.write('\t' + join_all_word_rating_pairs(cluster_words(document)))
 
         writer.write('\n\n')
 
 
-def merge_key_words(x, y):
+def cluster_words(cluster):
     '''
-    Calculates result[k] = (len1 * x[k] + len2 * y[k]) / (len1 + len2) for all keywords k in x or y
-    :param x:
-    :param y:
+    Returns the key words of cluster. Merged clusters are created without them, the centroid is computed from the
+    documents by the Dendrogram only when it is asked for, i.e. for the clusters that are printed, and is not kept.
+    Documents get them from their vector.
+    :param cluster:
     :return:
     '''
-    len1 = len(x)
-    len2 = len(y)
-
-    allKeys = set(x.keys()).union(set(y.keys()))
-
-    result = {}
+    return cluster.tree.centroid(cluster.node)
 
-    for key in allKeys:
-        result[key] = 1.0 * (len1 * x.get(key, 0) + len2 * y.get(key, 0)) / (len1 + len2)
 
-    return result
-
-
-# print merge_key_words({'a': 1, 'b': 2}, {'b': 3, 'c': 3})
+def cluster_order(cluster):
+    '''
+    Key giving the order in which HAC_news keeps its clusters: documents by id, then merged clusters in the order
+    they were created. Used to pick left/right children and to order the result the same way.
+    :param cluster:
+    :return:
+    '''
+    return (0, cluster.id) if cluster.id >= 0 else (1, -cluster.id)
 
 
-def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4):
+def similarity_matrix(leaves, sim_function=sim_fun, typecode='d', workers=1):
+    '''
+    Returns the similarities of the documents as CondensedMatrix (with typecode 'f' stored as 4 byte floats) and their
+    masses (module() squared). With sim_fun and more than one worker (None for all cores) the matrix is filled by a
+    pool of processes, see parallel_similarity. sim_function can also be a similarity_metrics.Metric (or its name),
+    then every row is computed against all others at once from the document matrix.
+    :param leaves:
+    :param sim_function:
+    :param typecode:
+    :param workers:
+    :return:
+    '''
+    n = len(leaves)
+    metric = as_metric(sim_function)
+
+    if metric is not None:
+        matrix = build_document_matrix(leaves)
+        store = CondensedMatrix(n, typecode)
+        for i in xrange(n):
+            store.set_upper_row(i, metric.similarity_row(matrix, i, i + 1)[i + 1:])
+        return store, [norm * norm for norm in matrix.norms]
+
+    if sim_function is sim_fun:
+        matrix = build_document_matrix(leaves)
+        if workers == 1:
+            store = CondensedMatrix(n, typecode)
+            for i, sims in matrix.upper_similarities():
+                store.set_upper_row(i, sims)
+        else:
+            store = fill_similarities(matrix, CondensedMatrix(n, typecode, shared=True), workers)
+        return store, [norm * norm for norm in matrix.norms]
+
+    store = CondensedMatrix(n, typecode)
+    words = [cluster_words(c) for c in leaves]
+    for i in xrange(n):
+        store.set_upper_row(i, [sim_function(words[i], words[j]) for j in xrange(i + 1, n)])
+    return store, [module(w) ** 2 for w in words]
+
+
+def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4, linkage='centroid', typecode='d', workers=1,
+                            edges=None, stats=None, on_merge=None):
     '''
     At the start every news document is a cluster on its own. While there is a pair of clusters which similarity is
     above min_closeness the 2 closest such clusters are merged in one new cluster.
+    The candidate pairs are kept in a heap ordered by -similarity. Every cluster lives in a slot and the slot has a
+    generation counter, increased whenever the cluster in it is merged. A heap entry remembers the generations of its
+    two slots, so entries for already merged clusters are recognised and skipped when popped instead of being searched
+    for and deleted. The merged cluster takes the slot of one of its children, its similarities are updated from the
+    children's ones by the linkage (see linkage.py) and only its pairs are pushed, so every merge costs O(n log n) and
+    the whole clustering O(n^2 log n).
+    Pairs below min_closeness can never be merged, so they are not pushed at all. The similarities themselves are kept
+    in a CondensedMatrix, with typecode 'f' at 4 bytes per pair.
     :param data:
-    :param sim_function:
+    :param sim_function: function of two word dictionaries, or similarity_metrics.Metric or its name. The centroid
+    linkage is exact only for sim_fun.
     :param min_closeness:
+    :param linkage: name of linkage from linkage.LINKAGES
+    :param typecode: 'd' or 'f', type of the stored similarities
+    :param workers: processes computing the initial similarities (see similarity_matrix)
+    :param edges: if given, only these candidate pairs are clustered, see sparse_clustering
+    :param stats: instrumentation.ClusteringStats to fill with counters and timings of every phase
+    :param on_merge: function called after every merge with the new cluster, the number of merges so far and the
+    number of clusters left, e.g. instrumentation.progress_printer
     :return:
     '''
 
-    similarities = []
+    if edges is not None:
+        if stats is not None or on_merge is not None:
+            raise ValueError('stats and on_merge are supported only without edges')
+        return sparse_clustering(data, edges, sim_function, min_closeness, linkage)
 
-    clusters = data
+    tree = Dendrogram()
+    slots = tree.add_documents(data)
+    n = len(slots)
+    generation = [0] * n
 
     before_similarities_calc = time.time()
 
-    for i in xrange(len(clusters)):
-        for j in xrange(i + 1, len(clusters)):
-            heapq.heappush(similarities, (-sim_function(clusters[i].words, clusters[j].words), i, j))
+    if stats is not None:
+        stats.start('similarities')
+    store, masses = similarity_matrix(slots, sim_function, typecode, workers)
+    values, offsets = store.values, store.offsets
+    if stats is not None:
+        stats.stop('similarities')
+        stats.count('similarities', 'evaluations', n * (n - 1) // 2)
+        stats.store_bytes = store.nbytes()
+        stats.start('heap')
+
+    similarities = []
+    for i in xrange(n):
+        for j in xrange(i + 1, n):
+            if values[offsets[i] + j] >= min_closeness:
+                similarities.append((-values[offsets[i] + j], i, j, 0, 0))
+
+    heapq.heapify(similarities)
 
-    print similarities
     after_similarities_calc = time.time()
 
     print 'Similarity calculations seconds = %d' %(after_similarities_calc - before_similarities_calc)
 
+    link = get_linkage(linkage, [c.size for c in slots], masses)
 
-    current_id = -1
-    while(len(clusters) > 1):
-        no_merge = True
+    # With instrumentation the counters are derived from the length of the heap once per merge: the entries popped
+    # since the previous merge are the drop of the length, the pushes of this merge its growth. Stale entries are the
+    # pops that did not merge and every merge updates the similarities of all other clusters left.
+    instrumented = stats is not None or on_merge is not None
+    merges = pops = pushes = evaluations = 0
+    heap_length = peak_heap = len(similarities)
+    if stats is not None:
+        stats.stop('heap')
+        stats.count('heap', 'pushes', heap_length)
+        stats.start('merge_loop')
 
-        closest = min_closeness
+    while similarities:
+        closest, i, j, gen_i, gen_j = heapq.heappop(similarities)
 
-        most_similar = heapq.heappop(similarities)
+        # one of the clusters was merged after this pair was pushed
+        if generation[i] != gen_i or generation[j] != gen_j:
+            continue
 
-        if -most_similar[0] >= closest:
-            print 'MERGE'
-            closest = -most_similar[0]
-            clusters_to_merge = (most_similar[1], most_similar[2])
-            no_merge = False
+        left, right = sorted((slots[i], slots[j]), key=cluster_order)
 
-        # if there aren't 2 clusters which can be merged, then clustering is finished
-        if no_merge:
-            break
+        new_cluster = tree.merge(left, right, -closest)
 
-        merged_words = merge_key_words(clusters[clusters_to_merge[0]].words, clusters[clusters_to_merge[1]].words)
+        # the new cluster takes slot i, slot j becomes empty
+        slots[i] = new_cluster
+        slots[j] = None
+        generation[i] += 1
+        generation[j] += 1
 
-        new_cluster = BiCluster(merged_words, clusters[clusters_to_merge[0]], clusters[clusters_to_merge[1]], closest,
-                                id = current_id, size = clusters[clusters_to_merge[0]].size + clusters[clusters_to_merge[1]].size)
+        if instrumented:
+            pops += heap_length - len(similarities)
+            heap_length = len(similarities)
 
-        del clusters[clusters_to_merge[1]]
-        del clusters[clusters_to_merge[0]]
-        clusters[new_cluster.id] = new_cluster
+        for k in xrange(len(slots)):
+            if k == i or slots[k] is None:
+                continue
 
-        for i in xrange(len(similarities) - 1, -1, -1):
-            if (similarities[i][1] == clusters_to_merge[0] and similarities[i][2] == clusters_to_merge[1]) \
-                    or (similarities[i][1] == clusters[1] and similarities[i][2] == clusters_to_merge[0]):
-                del similarities[i]
-        # Update similarities dictionary
+            ik = offsets[i] + k if i < k else offsets[k] + i
+            jk = offsets[j] + k if j < k else offsets[k] + j
 
-        for other in clusters:
-            if other.id != current_id:
-                heapq.heappush(similarities, (sim_function(other.words, new_cluster.words), current_id, other.id))
+            similarity = link.update(values[ik], values[jk], -closest, i, j, k)
+            values[ik] = similarity
 
-        current_id -= 1
+            if similarity >= min_closeness:
+                a, b = min(i, k), max(i, k)
+                heapq.heappush(similarities, (-similarity, a, b, generation[a], generation[b]))
 
+        link.merge(i, j, -closest)
 
+        if instrumented:
+            evaluations += n - merges - 2
+            merges += 1
+            pushes += len(similarities) - heap_length
+            heap_length = len(similarities)
+            peak_heap = max(peak_heap, heap_length)
+            if on_merge is not None:
+                on_merge(new_cluster, merges, n - merges)
+
+    if stats is not None:
+        stats.stop('merge_loop')
+        pops += heap_length
+        for name, value in [('evaluations', evaluations), ('pushes', pushes), ('pops', pops),
+                            ('stale', pops - merges), ('merges', merges)]:
+            stats.count('merge_loop', name, value)
+        stats.peak_heap_entries = max(stats.peak_heap_entries, peak_heap)
+
+    clusters = sorted((c for c in slots if c is not None), key=cluster_order)
 
     # Sort clusters by size
 
@@ -261,33 +348,327 @@ def hierarchical_clustering(data, sim_function=sim_fun, min_closeness=0.4):
     return clusters
 
 
-def print_all_clusters(path='optimized_out.txt'):
+def sparse_clustering(data, edges, sim_function=sim_fun, min_closeness=0.4, linkage='centroid'):
     '''
-    Prints all clusters. For each cluster firstly the key words are written. After that each document contained
-    in the cluster is printed indented, firstly the title and below its key words.
-    :param path:
+    Same clustering as hierarchical_clustering, starting only from the candidate pairs in edges, list of
+    (i, j, similarity) for documents data[i] and data[j] (from lsh.knn_graph or similarity_join.similarity_join).
+    No n x n matrix is built: every cluster has a dictionary of its known neighbors. After a merge only the neighbors
+    of the two merged clusters are updated. When the linkage needs the similarity of a neighbor to the other merged
+    cluster and it is not known, it is computed exactly from the merge history down to the documents. For reducible
+    linkages a cluster similar to neither part can not be similar enough to the merged one, so if edges hold all
+    pairs above min_closeness the result is the same as from hierarchical_clustering. The same holds for centroid
+    linkage with non negative ratings: its two coefficients sum to at most 1 (the square root of the average mass is at
+    least the average of the square roots), so the merged similarity is not above the larger of the parts. Single and
+    complete linkage never need the exact value of a similarity below min_closeness.
+    :param data:
+    :param edges:
+    :param sim_function:
+    :param min_closeness:
+    :param linkage: name of linkage from linkage.LINKAGES
     :return:
     '''
-    before_load = time.time()
-    clusters = load_data() # takes 38 seconds for 700 items. For more than 1000 news works slow.
-    after_load = time.time()
+    tree = Dendrogram()
+    slots = tree.add_documents(data)
+    n = len(slots)
+
+    metric = as_metric(sim_function)
+    if sim_function is sim_fun or metric is not None:
+        matrix = build_document_matrix(slots)
+        masses = [norm * norm for norm in matrix.norms]
+        if metric is not None:
+            document_similarity = lambda a, b: metric.similarity(matrix, a, b)
+        else:
+            document_similarity = matrix.similarity
+    else:
+        words = [cluster_words(c) for c in slots]
+        masses = [module(w) ** 2 for w in words]
+        document_similarity = lambda a, b: sim_function(words[a], words[b])
 
-    print 'Loading seconds = %d' %(after_load - before_load)
+    link = get_linkage(linkage, [c.size for c in slots], masses)
 
-    clusters = hierarchical_clustering(clusters)
-    after_clust = time.time()
+    # clusters are numbered in the order they are created (documents first), for merged clusters children holds
+    # their two parts and the similarity between them
+    sizes = list(link.sizes)
+    masses = list(link.masses)
+    children = [None] * n
+    alive = [True] * n
+    neighbors = [{} for _ in xrange(n)]
 
-    print 'Clustering seconds = %d' %(after_clust - after_load)
+    similarities = []
+    for i, j, similarity in edges:
+        neighbors[i][j] = neighbors[j][i] = similarity
+        if similarity >= min_closeness:
+            similarities.append((-similarity, min(i, j), max(i, j)))
+    heapq.heapify(similarities)
+
+    def cluster_similarity(a, b):
+        # the newer of the two clusters is split in its parts, both of which existed together with the older one,
+        # until the similarity is known or both are documents
+        known = {}
+        stack = [(a, b)]
+        while stack:
+            x, y = stack[-1]
+            if x < y:
+                x, y = y, x
+            if (x, y) in known or y in neighbors[x]:
+                stack.pop()
+                continue
+            if x < n:
+                known[(x, y)] = document_similarity(x, y)
+                stack.pop()
+                continue
+            left, right, s_lr = children[x]
+            s_l = neighbors[left].get(y, known.get((max(left, y), min(left, y))))
+            s_r = neighbors[right].get(y, known.get((max(right, y), min(right, y))))
+            if s_l is None:
+                stack.append((left, y))
+            elif s_r is None:
+                stack.append((right, y))
+            else:
+                known[(x, y)] = link.combine(s_l, s_r, s_lr, sizes[left], sizes[right], sizes[y],
+                                             masses[left], masses[right])
+                stack.pop()
+        x, y = max(a, b), min(a, b)
+        return neighbors[x][y] if y in neighbors[x] else known[(x, y)]
+
+    # an unknown similarity is below min_closeness, single and complete linkage do not need its value
+    unknown = cluster_similarity if link.needs_low else lambda a, b: float('-inf')
+
+    while similarities:
+        closest, i, j = heapq.heappop(similarities)
+
+        # one of the clusters was already merged
+        if not alive[i] or not alive[j]:
+            continue
+
+        left, right = sorted((slots[i], slots[j]), key=cluster_order)
+        # the new cluster is node len(slots) of the tree, the same as its index here
+        slots.append(tree.merge(left, right, -closest))
+
+        new = len(slots) - 1
+        alive[i] = alive[j] = False
+        alive.append(True)
+        children.append((i, j, -closest))
+        sizes.append(sizes[i] + sizes[j])
+        masses.append(merged_mass(sizes[i], sizes[j], masses[i], masses[j]))
+        neighbors.append({})
+
+        for k in set(neighbors[i]) | set(neighbors[j]):
+            if not alive[k]:
+                continue
+            s_ki = neighbors[i][k] if k in neighbors[i] else unknown(k, i)
+            s_kj = neighbors[j][k] if k in neighbors[j] else unknown(k, j)
+            similarity = link.combine(s_ki, s_kj, -closest, sizes[i], sizes[j], sizes[k], masses[i], masses[j])
+            neighbors[new][k] = neighbors[k][new] = similarity
+            if similarity >= min_closeness:
+                heapq.heappush(similarities, (-similarity, k, new))
+
+    clusters = sorted((slots[c] for c in xrange(len(slots)) if alive[c]), key=cluster_order)
+
+    clusters.sort(cmp=lambda x,y: cmp(x.size, y.size))
+    clusters.reverse()
 
+    return clusters
+
+
+def build_clusters(leaves, merges):
+    '''
+    Builds the BiCluster trees from list of merges (similarity, a, b), where a and b are indexes of any document in
+    the two merged clusters. Merges are replayed from the most similar one, so ids, children order and the order of
+    the result are the same as from hierarchical_clustering.
+    :param leaves:
+    :param merges:
+    :return:
+    '''
+    tree = Dendrogram()
+    roots = tree.add_documents(leaves)
+    parent = range(len(roots))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # stable sort keeps every child merge before its parent when their similarities are equal
+    for similarity, a, b in sorted(merges, key=lambda m: -m[0]):
+        a, b = find(a), find(b)
+        left, right = sorted((roots[a], roots[b]), key=cluster_order)
+        roots[a] = tree.merge(left, right, similarity)
+        roots[b] = None
+        parent[b] = a
+
+    clusters = sorted((c for c in roots if c is not None), key=cluster_order)
+
+    clusters.sort(cmp=lambda x,y: cmp(x.size, y.size))
+    clusters.reverse()
+
+    return clusters
+
+
+def nn_chain_clustering(data, sim_function=sim_fun, min_closeness=0.4, linkage='average', typecode='d', workers=1):
+    '''
+    Same clustering as hierarchical_clustering, but for reducible linkages (single, complete, average, ward), found
+    with the nearest neighbor chain algorithm. The chain is followed from cluster to its most similar cluster until two
+    clusters are each other's nearest neighbors, and those are merged. For these linkages merging never makes a
+    cluster more similar to the others than it already was, so the merges found this way are the ones the greedy
+    algorithm would do and a cluster with no neighbor above min_closeness is final. Only the similarity matrix (a
+    CondensedMatrix) and the chain are kept (no heap of pairs) and the time is O(n^2).
+    :param data:
+    :param sim_function:
+    :param min_closeness:
+    :param linkage: name of reducible linkage from linkage.LINKAGES
+    :param typecode: 'd' or 'f', type of the stored similarities
+    :param workers: processes computing the initial similarities (see similarity_matrix)
+    :return:
+    '''
+    leaves = list(data)
+    n = len(leaves)
+
+    before_similarities_calc = time.time()
+
+    store, masses = similarity_matrix(leaves, sim_function, typecode, workers)
+    values, offsets = store.values, store.offsets
+
+    after_similarities_calc = time.time()
+
+    print 'Similarity calculations seconds = %d' %(after_similarities_calc - before_similarities_calc)
+
+    link = get_linkage(linkage, [c.size for c in leaves], masses)
+    if not link.reducible:
+        raise ValueError('Nearest neighbor chain needs a reducible linkage, %r is not' % linkage)
+
+    # every active slot holds a cluster that can still be merged, the cluster is represented by one of its documents
+    active = range(n)
+    position = range(n)
+
+    def deactivate(x):
+        last = active.pop()
+        if last != x:
+            active[position[x]] = last
+            position[last] = position[x]
+
+    merges = []
+    chain = []
+    while active:
+        if not chain:
+            chain.append(active[-1])
+
+        a = chain[-1]
+
+        # the previous cluster in the chain wins ties, so the chain can not run in a cycle
+        best = chain[-2] if len(chain) > 1 else None
+        closest = store.get(a, best) if best is not None else float('-inf')
+        for k in active:
+            if k != a:
+                similarity = values[offsets[a] + k] if a < k else values[offsets[k] + a]
+                if similarity > closest:
+                    best, closest = k, similarity
+
+        if closest < min_closeness:
+            # nothing is similar enough to a, now or after any later merge
+            chain.pop()
+            deactivate(a)
+            continue
+
+        if len(chain) == 1 or best != chain[-2]:
+            chain.append(best)
+            continue
+
+        # a and best are each other's nearest neighbors
+        chain.pop()
+        chain.pop()
+        merges.append((closest, a, best))
+
+        for k in active:
+            if k != a and k != best:
+                ak = offsets[a] + k if a < k else offsets[k] + a
+                bk = offsets[best] + k if best < k else offsets[k] + best
+                values[ak] = link.update(values[ak], values[bk], closest, a, best, k)
+        link.merge(a, best, closest)
+        deactivate(best)
+
+    return build_clusters(leaves, merges)
+
+
+ALGORITHMS = {
+    'heap': hierarchical_clustering,
+    'nn_chain': nn_chain_clustering,
+}
+
+# Linkage used when none is given, nn_chain works only with the reducible ones
+DEFAULT_LINKAGES = {
+    'heap': 'centroid',
+    'nn_chain': 'average',
+}
+
+
+def check_linkage(algorithm, linkage):
+    '''
+    Raises ValueError if algorithm (one of ALGORITHMS) can not cluster with linkage (name from linkage.LINKAGES)
+    :param algorithm:
+    :param linkage:
+    :return:
+    '''
+    if algorithm not in ALGORITHMS:
+        raise ValueError('Unknown algorithm %r, expected one of %s' % (algorithm, ', '.join(sorted(ALGORITHMS))))
+    if linkage not in LINKAGES:
+        raise ValueError('Unknown linkage %r, expected one of %s' % (linkage, ', '.join(sorted(LINKAGES))))
+    if algorithm == 'nn_chain' and not LINKAGES[linkage].reducible:
+        raise ValueError('Nearest neighbor chain needs a reducible linkage (%s), %r is not' %
+                         (', '.join(sorted(l for l in LINKAGES if LINKAGES[l].reducible)), linkage))
+
+
+def write_clusters(path, clusters):
+    '''
+    Writes clusters to file path: for each cluster firstly the size and the key words, after that each document
+    contained in the cluster indented, firstly the title and below its key words
+    :param path:
+    :param clusters:
+    :return:
+    '''
     with open(path, 'w') as wr:
         for c in clusters:
             wr.write('Size:\t%d\n' %c.size)
-            wr.write(join_all_word_rating_pairs(c.words) + '\n')
+            wr.write(join_all_word_rating_pairs(cluster_words(c)) + '\n')
             print_cluster(wr, c)
 
 
-print_all_clusters()
+def print_all_clusters(path='optimized_out.txt', algorithm='heap', linkage=None, limit=None, cache=False,
+                       workers=1, source='news.txt', min_closeness=0.4, typecode='d', **options):
+    '''
+    Prints all clusters. For each cluster firstly the key words are written. After that each document contained
+    in the cluster is printed indented, firstly the title and below its key words.
+    :param path:
+    :param limit: cluster only the first limit documents (all if None)
+    :param cache: load the news from the binary cache (see load_data)
+    :param workers: processes computing the initial similarities
+    :param algorithm: one of ALGORITHMS
+    :param linkage: one of linkage.LINKAGES, by default DEFAULT_LINKAGES[algorithm]
+    :param source: the news file
+    :param min_closeness:
+    :param typecode: 'd' or 'f', type of the stored similarities
+    :param options: passed to the clustering, e.g. stats and on_merge of hierarchical_clustering
+    :return:
+    '''
+    if linkage is None:
+        linkage = DEFAULT_LINKAGES[algorithm]
+    check_linkage(algorithm, linkage)
+
+    before_load = time.time()
+    clusters = load_data(source, limit=limit, cache=cache)
+    after_load = time.time()
+
+    print 'Loading seconds = %d' %(after_load - before_load)
 
+    clusters = ALGORITHMS[algorithm](clusters, min_closeness=min_closeness, linkage=linkage, typecode=typecode,
+                                     workers=workers, **options)
+    after_clust = time.time()
+
+    print 'Clustering seconds = %d' %(after_clust - after_load)
 
+    write_clusters(path, clusters)
 
 
+if __name__ == '__main__':
+    print_all_clusters()
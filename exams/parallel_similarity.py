@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+from array import array
+import ctypes
+import multiprocessing
+
+__author__ = 'goran'
+
+# Set in every worker by init_worker. On Linux the workers are forked, so the initializer arguments (the document
+# matrix and the shared similarity store) reach them without being pickled and the matrix pages stay shared.
+_matrix = None
+_store = None
+
+
+def init_worker(matrix, store):
+    global _matrix, _store
+    _matrix = matrix
+    _store = store
+
+
+def fill_rows(rows):
+    '''
+    Computes the upper part of the similarity rows in range rows and copies them straight into the shared store
+    :param rows: (first, last) rows of the block, last not included
+    :return: number of similarities computed
+    '''
+    n = len(_matrix)
+    base = ctypes.addressof(_store.values)
+    count = 0
+    for r in xrange(*rows):
+        sims = array(_store.typecode, _matrix.similarity_row(r, r + 1)[r + 1:])
+        if sims:
+            ctypes.memmove(base + (_store.offsets[r] + r + 1) * _store.itemsize, sims.buffer_info()[0],
+                           len(sims) * _store.itemsize)
+        count += n - r - 1
+    return count
+
+
+def row_blocks(n, blocks):
+    '''
+    Splits the rows of the upper triangle of n x n matrix in about blocks ranges with the same number of pairs each
+    (row r has n - r - 1 pairs, so the blocks get longer towards the end)
+    :param n:
+    :param blocks:
+    :return: list of (first, last) ranges
+    '''
+    total = n * (n - 1) // 2
+    per_block = max(1, total // max(1, blocks))
+    ranges = []
+    first, pairs = 0, 0
+    for r in xrange(n):
+        pairs += n - r - 1
+        if pairs >= per_block:
+            ranges.append((first, r + 1))
+            first, pairs = r + 1, 0
+    if first < n:
+        ranges.append((first, n))
+    return ranges
+
+
+def fill_similarities(matrix, store, workers=None, blocks_per_worker=4):
+    '''
+    Fills CondensedMatrix store (created with shared=True) with the similarities of the rows of DocumentMatrix matrix
+    using a pool of worker processes. The upper triangle is split in blocks with equal number of pairs, a few per
+    worker so the ones that finish early take more.
+    :param matrix:
+    :param store:
+    :param workers: number of processes, all cores if None
+    :param blocks_per_worker:
+    :return: store
+    '''
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    # built once here, so the workers share it instead of each building its own
+    matrix.columns()
+
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(matrix, store))
+    try:
+        for _ in pool.imap_unordered(fill_rows, row_blocks(len(matrix), workers * blocks_per_worker)):
+            pass
+    finally:
+        pool.close()
+        pool.join()
+
+    return store
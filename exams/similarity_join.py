@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Because working with Macedonian Cyrillic characters
+
+__author__ = 'goran'
+
+
+def similarity_join(matrix, min_closeness=0.4):
+    '''
+    Returns all pairs of rows of DocumentMatrix matrix with similarity at least min_closeness, as list of edges
+    (i, j, similarity) with i < j, for hierarchical_clustering(edges=...). Pairs that can not reach min_closeness are
+    mostly never scored (All-Pairs algorithm):
+    - every row is scaled by its norm, so the similarity is just the dot product of the scaled rows
+    - the words of a row are taken from the most to the least frequent one, and only once the row could reach
+      min_closeness with the words taken so far (bounded by the largest scaled rating of every word) the rest of its
+      words are put in the inverted index. Two rows with similarity above min_closeness always share an indexed word,
+      so only rows found through the index are candidates.
+    - a candidate is dropped if even its largest rating times the other row's sum of ratings is below min_closeness
+      (length filter), otherwise the part of its similarity from the not indexed words is added
+    :param matrix:
+    :param min_closeness:
+    :return:
+    '''
+    n = len(matrix)
+    indptr, indices, data, norms = matrix.indptr, matrix.indices, matrix.data, matrix.norms
+
+    frequency = {}
+    largest = {}
+    for r in xrange(n):
+        if norms[r] == 0:
+            continue
+        for k in xrange(indptr[r], indptr[r + 1]):
+            w = indices[k]
+            frequency[w] = frequency.get(w, 0) + 1
+            largest[w] = max(largest.get(w, 0.0), data[k] / norms[r])
+
+    index = {}
+    prefixes = [None] * n
+    row_sums = [0.0] * n
+    row_largest = [0.0] * n
+
+    edges = []
+    for r in xrange(n):
+        if norms[r] == 0:
+            continue
+
+        row = sorted(((indices[k], data[k] / norms[r]) for k in xrange(indptr[r], indptr[r + 1])),
+                     key=lambda p: -frequency[p[0]])
+        row_sums[r] = sum(u for w, u in row)
+        row_largest[r] = max(u for w, u in row)
+
+        scores = {}
+        for w, u in row:
+            for other, v in index.get(w, ()):
+                scores[other] = scores.get(other, 0.0) + u * v
+
+        if scores:
+            words = dict(row)
+            for other, score in scores.iteritems():
+                if min(row_largest[r] * row_sums[other], row_largest[other] * row_sums[r]) < min_closeness:
+                    continue
+                for w, v in prefixes[other]:
+                    if w in words:
+                        score += words[w] * v
+                if score >= min_closeness:
+                    edges.append((other, r, score))
+
+        bound = 0.0
+        prefix = []
+        for w, u in row:
+            if bound < min_closeness:
+                bound += u * largest[w]
+            if bound < min_closeness:
+                prefix.append((w, u))
+            else:
+                index.setdefault(w, []).append((r, u))
+        prefixes[r] = prefix
+
+    edges.sort()
+    return edges
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+from array import array
+from collections import deque
+import heapq
+from itertools import islice
+import multiprocessing
+
+__author__ = 'goran'
+
+# Set in every worker by init_worker. On Linux the workers are forked, so the rating matrix (of the front end, None
+# for recommend_all, which sends the users chunk by chunk) and the neighbor lists reach them without being pickled.
+# Scoring in this process passes the matrices directly and never sets these.
+_matrix = None
+_neighbors = None
+_n = None
+
+
+class NeighborMatrix:
+    '''
+    The neighbor lists of items_sim (from calculate_similar_items or an item_model.ItemSimilarityModel) in CSR form
+    over the item indexes of items (the items of items_sim by default, or e.g. RatingMatrix.items to score rows of
+    that matrix): item i has neighbors indices[k] with similarity sims[k], for k in indptr[i]:indptr[i + 1].
+    Neighbors which are not in items are left out, they can not be recommended.
+    '''
+    def __init__(self, items_sim, items=None):
+        self.items = list(items if items is not None else items_sim)
+        self.item_ids = dict((item, i) for i, item in enumerate(self.items))
+        self.indptr = array('l', [0])
+        self.indices = array('l')
+        self.sims = array('d')
+        for item in self.items:
+            for similarity, item2 in (items_sim[item] if item in items_sim else ()):
+                if item2 in self.item_ids:
+                    self.indices.append(self.item_ids[item2])
+                    self.sims.append(similarity)
+            self.indptr.append(len(self.indices))
+
+
+class UserChunk:
+    '''
+    The ratings of some users in CSR form over the item indexes of a NeighborMatrix, the part of a RatingMatrix that
+    recommend_rows reads. recommend_all builds one per chunk and sends it to a worker with the task.
+    '''
+    def __init__(self, users, indptr, indices, ratings):
+        self.users = users
+        self.indptr = indptr
+        self.indices = indices
+        self.ratings = ratings
+
+    def __len__(self):
+        return len(self.users)
+
+
+def user_chunk(prefs, users, neighbors):
+    '''
+    Returns UserChunk with the ratings of users from prefs, items which are not in neighbors are left out (they have
+    no neighbors, so they do not change the scores)
+    :param prefs:
+    :param users:
+    :param neighbors: NeighborMatrix
+    :return:
+    '''
+    indptr, indices, ratings = array('l', [0]), array('l'), array('d')
+    for user in users:
+        for item, rating in prefs[user].iteritems():
+            i = neighbors.item_ids.get(item)
+            if i is not None:
+                indices.append(i)
+                ratings.append(rating)
+        indptr.append(len(indices))
+    return UserChunk(users, indptr, indices, ratings)
+
+
+def init_worker(matrix, neighbors, n):
+    global _matrix, _neighbors, _n
+    _matrix = matrix
+    _neighbors = neighbors
+    _n = n
+
+
+def recommend_rows(matrix, neighbors, users, n):
+    '''
+    Returns the n best (score, item) for every user index in users, the same as item_based_recommendation(...)[:n].
+    Row u of the scores is row u of the rating matrix times the neighbor matrix, divided by the same product with
+    all ratings taken as 1, over the items u did not rate.
+    :param matrix: RatingMatrix or UserChunk, over the item indexes of neighbors
+    :param neighbors: NeighborMatrix
+    :param users:
+    :param n:
+    :return: list with one list of (score, item) per user
+    '''
+    items = neighbors.items
+    total_score = array('d', [0.0]) * len(items)
+    total_sim = array('d', [0.0]) * len(items)
+    rated = array('b', [0]) * len(items)
+
+    results = []
+    for u in users:
+        start, end = matrix.indptr[u], matrix.indptr[u + 1]
+        for k in xrange(start, end):
+            rated[matrix.indices[k]] = 1
+
+        touched = set()
+        for k in xrange(start, end):
+            rating = matrix.ratings[k]
+            i = matrix.indices[k]
+            for p in xrange(neighbors.indptr[i], neighbors.indptr[i + 1]):
+                j = neighbors.indices[p]
+                if rated[j]:
+                    continue
+                total_score[j] += rating * neighbors.sims[p]
+                total_sim[j] += neighbors.sims[p]
+                touched.add(j)
+
+        results.append(heapq.nlargest(n, ((1.0 * total_score[j] / total_sim[j], items[j])
+                                          for j in touched if total_sim[j] > 0)))
+
+        for j in touched:
+            total_score[j] = total_sim[j] = 0.0
+        for k in xrange(start, end):
+            rated[matrix.indices[k]] = 0
+    return results
+
+
+def chunk_lines(chunk, neighbors, n):
+    '''
+    Returns the recommendations for all users of chunk as lines of the output file
+    :param chunk: UserChunk
+    :param neighbors: NeighborMatrix
+    :param n:
+    :return:
+    '''
+    lines = []
+    for user, rankings in zip(chunk.users, recommend_rows(chunk, neighbors, xrange(len(chunk)), n)):
+        for score, item in rankings:
+            lines.append('%s\t%s\t%r\n' % (user, item, score))
+    return ''.join(lines)
+
+
+def recommend_chunk(chunk):
+    '''
+    chunk_lines for a pool set up by init_worker
+    :param chunk:
+    :return:
+    '''
+    return chunk_lines(chunk, _neighbors, _n)
+
+
+def recommend_indexes(users):
+    '''
+    Returns the recommendations for the user indexes users, as recommend_rows (for a pool set up by init_worker)
+    :param users:
+    :return:
+    '''
+    return recommend_rows(_matrix, _neighbors, users, _n)
+
+
+def user_chunks(prefs, neighbors, chunk_size):
+    '''
+    Yields UserChunk of the next chunk_size users of prefs (in the order of prefs) until all are done. Only the
+    ratings of one chunk are collected at a time.
+    :param prefs:
+    :param neighbors:
+    :param chunk_size:
+    :return:
+    '''
+    users = iter(prefs)
+    while True:
+        chunk = list(islice(users, chunk_size))
+        if not chunk:
+            return
+        yield user_chunk(prefs, chunk, neighbors)
+
+
+def recommend_all(prefs, items_sim, path, n=10, workers=None, chunk_size=500, window=None):
+    '''
+    Writes the n best item based recommendations of every user in prefs to file path, one line user, item and score
+    separated by tabs, users in the order of prefs and their items from the best. The ratings are read from prefs
+    chunk by chunk of chunk_size users and sent to a pool of worker processes, which get only the neighbor lists up
+    front. At most window chunks are in the pool or waiting to be written (in order) at a time, so apart from prefs
+    itself and the neighbor lists memory grows with chunk_size * window, not with the number of users. With the
+    ratings cache (loadMovieLens(cache=True)) prefs is a RatingMatrix over the mapped file, so the ratings are not in
+    memory at all until their chunk is read.
+    :param prefs: prefs[user][item] dictionary or RatingMatrix
+    :param items_sim: calculate_similar_items output or ItemSimilarityModel
+    :param path:
+    :param n:
+    :param workers: number of processes, all cores if None, 1 to score in this process
+    :param chunk_size:
+    :param window: chunks in flight, twice the number of processes if None
+    :return: number of users
+    '''
+    neighbors = NeighborMatrix(items_sim)
+    users = 0
+
+    with open(path, 'w') as w:
+        if workers == 1:
+            for chunk in user_chunks(prefs, neighbors, chunk_size):
+                w.write(chunk_lines(chunk, neighbors, n))
+                users += len(chunk)
+            return users
+
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(None, neighbors, n))
+        window = window or 2 * (workers or multiprocessing.cpu_count())
+        pending = deque()
+        try:
+            for chunk in user_chunks(prefs, neighbors, chunk_size):
+                if len(pending) == window:
+                    w.write(pending.popleft().get())
+                pending.append(pool.apply_async(recommend_chunk, (chunk,)))
+                users += len(chunk)
+            while pending:
+                w.write(pending.popleft().get())
+        finally:
+            pool.close()
+            pool.join()
+    return users
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+from array import array
+import multiprocessing
+import random
+from math import sqrt
+
+from rating_matrix import rating_matrix
+from recommend import (calculate_similar_items, item_based_recommendation, ranked, sim_pearson,
+                       user_based_recommendation)
+
+__author__ = 'goran'
+
+# Set in every worker by init_worker (see train_als), the matrices whose rows the worker solves. Training in this
+# process passes them directly and never sets this.
+_rows = None
+
+
+class FactorModel:
+    '''
+    Latent factor model: rating(u, i) ~ mean + b_u + b_i + p_u . q_i, with k factors per user and per item. The
+    parameters of every user are k + 1 numbers in one flat array, b_u first and p_u after it, and the same for items,
+    so user u is user_params[u * (k + 1):(u + 1) * (k + 1)].
+    Recommending to a user is one dot product per item, whatever the number of users, instead of comparing the user
+    with all others like user_based_recommendation.
+    '''
+    def __init__(self, matrix, k, mean, user_params, item_params):
+        self.matrix = matrix
+        self.users = matrix.users
+        self.items = matrix.items
+        self.user_ids = matrix.user_ids
+        self.item_ids = matrix.item_ids
+        self.k = k
+        self.mean = mean
+        self.user_params = user_params
+        self.item_params = item_params
+
+    def predict(self, user, item):
+        '''
+        Returns the predicted rating of item by user. Unknown users or items add nothing for their side.
+        :param user:
+        :param item:
+        :return:
+        '''
+        size = self.k + 1
+        u, i = self.user_ids.get(user), self.item_ids.get(item)
+        prediction = self.mean
+        if u is not None:
+            prediction += self.user_params[u * size]
+        if i is not None:
+            prediction += self.item_params[i * size]
+        if u is not None and i is not None:
+            p, q = u * size, i * size
+            for f in xrange(1, size):
+                prediction += self.user_params[p + f] * self.item_params[q + f]
+        return prediction
+
+    def scores(self, user):
+        '''
+        Returns array with the predicted rating of every item by user
+        :param user:
+        :return:
+        '''
+        size = self.k + 1
+        u = self.user_ids[user]
+        user_vector = self.user_params[u * size:(u + 1) * size]
+        base = self.mean + user_vector[0]
+        item_params = self.item_params
+        scores = array('d', [0.0]) * len(self.items)
+        for i in xrange(len(self.items)):
+            q = i * size
+            s = base + item_params[q]
+            for f in xrange(1, size):
+                s += user_vector[f] * item_params[q + f]
+            scores[i] = s
+        return scores
+
+    def recommend(self, user, top=None, rated=None):
+        '''
+        Returns (predicted rating, item) for the items user did not rate, from the best
+        :param user:
+        :param top: see recommend.ranked
+        :param rated: the items of user to leave out, by default the ones rated in the training data
+        :return:
+        '''
+        if rated is None:
+            rated = self.matrix[user]
+        scores = self.scores(user)
+        return ranked(((scores[i], item) for i, item in enumerate(self.items) if item not in rated), top)
+
+
+def cholesky_solve(a, b):
+    '''
+    Solves a x = b for symmetric positive definite a (list of rows), by Cholesky decomposition
+    :param a:
+    :param b:
+    :return:
+    '''
+    n = len(b)
+    l = [[0.0] * n for _ in xrange(n)]
+    for i in xrange(n):
+        for j in xrange(i + 1):
+            s = a[i][j] - sum(l[i][m] * l[j][m] for m in xrange(j))
+            l[i][j] = sqrt(s) if i == j else s / l[j][j]
+    y = [0.0] * n
+    for i in xrange(n):
+        y[i] = (b[i] - sum(l[i][m] * y[m] for m in xrange(i))) / l[i][i]
+    x = [0.0] * n
+    for i in reversed(xrange(n)):
+        x[i] = (y[i] - sum(l[m][i] * x[m] for m in xrange(i + 1, n))) / l[i][i]
+    return x
+
+
+def solve_rows(matrix, first, last, fixed, mean, k, regularization):
+    '''
+    One ALS half step for rows first:last of matrix (users, or items of the transposed matrix): with the parameters
+    of the other side fixed, the bias and the factors of every row are the ridge regression of its ratings minus the
+    mean and the other side's bias on the features [1, q_j].
+    :param matrix: RatingMatrix
+    :param first:
+    :param last:
+    :param fixed: flat parameters of the columns of matrix
+    :param mean:
+    :param k:
+    :param regularization:
+    :return: flat parameters of the rows, array of (last - first) * (k + 1)
+    '''
+    size = k + 1
+    params = array('d', [0.0]) * ((last - first) * size)
+    for r in xrange(first, last):
+        start, end = matrix.indptr[r], matrix.indptr[r + 1]
+        if start == end:
+            continue
+        a = [[0.0] * size for _ in xrange(size)]
+        b = [0.0] * size
+        for p in xrange(start, end):
+            c = matrix.indices[p] * size
+            x = fixed[c:c + size]
+            x[0] = 1.0
+            target = matrix.ratings[p] - mean - fixed[c]
+            for f in xrange(size):
+                xf = x[f]
+                b[f] += target * xf
+                row = a[f]
+                for g in xrange(f + 1):
+                    row[g] += xf * x[g]
+        for f in xrange(size):
+            a[f][f] += regularization * (end - start)
+            for g in xrange(f):
+                a[g][f] = a[f][g]
+        params[(r - first) * size:(r - first + 1) * size] = array('d', cholesky_solve(a, b))
+    return params
+
+
+def init_worker(rows):
+    global _rows
+    _rows = rows
+
+
+def solve_task(rows, task):
+    first, last, which, fixed, mean, k, regularization = task
+    return solve_rows(rows[which], first, last, fixed, mean, k, regularization)
+
+
+def solve_chunk(task):
+    '''
+    solve_task for a pool set up by init_worker
+    :param task:
+    :return:
+    '''
+    return solve_task(_rows, task)
+
+
+def train_als(prefs, k=10, iterations=10, regularization=0.1, workers=1, chunk_size=200, seed=0):
+    '''
+    Trains FactorModel on prefs[user][item] (dictionary or RatingMatrix) by alternating least squares: the user
+    parameters are solved exactly with the item ones fixed, then the other way round. The regularization of a row is
+    weighted by its number of ratings, so users and items with many ratings are not underfitted. Every row is solved
+    on its own, so the rows are split in chunks solved by a pool of processes (forked, the rating matrices are not
+    pickled).
+    :param prefs:
+    :param k: number of factors
+    :param iterations:
+    :param regularization:
+    :param workers: number of processes, all cores if None, 1 to train in this process
+    :param chunk_size: rows per task
+    :param seed:
+    :return:
+    '''
+    matrix = rating_matrix(prefs)
+    rows = (matrix, matrix.transposed())
+    mean = sum(matrix.ratings) / len(matrix.ratings) if len(matrix.ratings) else 0.0
+    size = k + 1
+
+    r = random.Random(seed)
+    params = [array('d', [0.0]) * (len(matrix.users) * size),
+              array('d', (0.0 if f == 0 else r.gauss(0, 0.1) for i in xrange(len(matrix.items)) for f in xrange(size)))]
+
+    pool = None
+    if workers != 1:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(rows,))
+    try:
+        for _ in xrange(iterations):
+            for which in (0, 1):
+                n = len(rows[which])
+                tasks = [(first, min(first + chunk_size, n), which, params[1 - which], mean, k, regularization)
+                         for first in xrange(0, n, chunk_size)]
+                solved = pool.map(solve_chunk, tasks) if pool else [solve_task(rows, task) for task in tasks]
+                params[which] = array('d')
+                for chunk in solved:
+                    params[which].extend(chunk)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return FactorModel(matrix, k, mean, params[0], params[1])
+
+
+def train_sgd(prefs, k=10, iterations=20, regularization=0.05, learning_rate=0.01, seed=0):
+    '''
+    Trains FactorModel on prefs by stochastic gradient descent over the ratings in random order. Cheaper per
+    iteration than ALS (O(k) per rating), but it runs in one process.
+    :param prefs:
+    :param k:
+    :param iterations:
+    :param regularization:
+    :param learning_rate:
+    :param seed:
+    :return:
+    '''
+    matrix = rating_matrix(prefs)
+    mean = sum(matrix.ratings) / len(matrix.ratings) if len(matrix.ratings) else 0.0
+    size = k + 1
+
+    r = random.Random(seed)
+    user_params = array('d', (0.0 if f == 0 else r.gauss(0, 0.1) for u in xrange(len(matrix.users))
+                              for f in xrange(size)))
+    item_params = array('d', (0.0 if f == 0 else r.gauss(0, 0.1) for i in xrange(len(matrix.items))
+                              for f in xrange(size)))
+
+    order = [(u, p) for u in xrange(len(matrix.users)) for p in xrange(matrix.indptr[u], matrix.indptr[u + 1])]
+    for _ in xrange(iterations):
+        r.shuffle(order)
+        for u, p in order:
+            pu, qi = u * size, matrix.indices[p] * size
+            prediction = mean + user_params[pu] + item_params[qi]
+            for f in xrange(1, size):
+                prediction += user_params[pu + f] * item_params[qi + f]
+            error = matrix.ratings[p] - prediction
+
+            user_params[pu] += learning_rate * (error - regularization * user_params[pu])
+            item_params[qi] += learning_rate * (error - regularization * item_params[qi])
+            for f in xrange(1, size):
+                x, y = user_params[pu + f], item_params[qi + f]
+                user_params[pu + f] += learning_rate * (error * y - regularization * x)
+                item_params[qi + f] += learning_rate * (error * x - regularization * y)
+    return FactorModel(matrix, k, mean, user_params, item_params)
+
+
+def factor_recommendation(prefs, model, person, top=None):
+    '''
+    Recommendations for person from FactorModel model, like item_based_recommendation(prefs, items_sim, person, top)
+    :param prefs: the items person rated here are left out (the training data of model if None)
+    :param model:
+    :param person:
+    :param top: see recommend.ranked
+    :return:
+    '''
+    return model.recommend(person, top, prefs[person] if prefs is not None else None)
+
+
+def split_prefs(prefs, test_fraction=0.2, seed=0):
+    '''
+    Splits prefs in training prefs and held out test ratings, every rating goes to the test part with probability
+    test_fraction
+    :param prefs:
+    :param test_fraction:
+    :param seed:
+    :return: (train, test), train as prefs dictionary and test as list of (user, item, rating)
+    '''
+    r = random.Random(seed)
+    train, test = {}, []
+    for user in sorted(prefs):
+        for item, rating in sorted(prefs[user].iteritems()):
+            if r.random() < test_fraction:
+                test.append((user, item, rating))
+            else:
+                train.setdefault(user, {})[item] = rating
+    return train, test
+
+
+def rmse(predictions, test):
+    '''
+    Returns the root mean squared error of predictions against the ratings of test
+    :param predictions: predicted rating for every rating in test
+    :param test: list of (user, item, rating)
+    :return:
+    '''
+    return sqrt(sum((p - rating) ** 2 for p, (user, item, rating) in zip(predictions, test)) / len(test))
+
+
+def compare_rmse(prefs, test_fraction=0.2, k=10, iterations=10, neighbors=50, workers=1, seed=0):
+    '''
+    Holds out test_fraction of the ratings of prefs, trains on the rest and returns the RMSE on the held out ratings
+    of the factor models (ALS and SGD) and of the neighborhood methods. user_based_recommendation and
+    item_based_recommendation predict a rating as the weighted average they rank by, where they give none the mean
+    rating of the user is used instead (coverage is the share of test ratings they did predict).
+    :param prefs:
+    :param test_fraction:
+    :param k:
+    :param iterations:
+    :param neighbors: n of calculate_similar_items
+    :param workers: processes for ALS
+    :param seed:
+    :return: dictionary method -> (rmse, coverage)
+    '''
+    train, test = split_prefs(prefs, test_fraction, seed)
+    matrix = rating_matrix(train)
+    mean = sum(matrix.ratings) / len(matrix.ratings)
+
+    def fallback(user):
+        return matrix.mean(matrix.user_ids[user]) if user in matrix else mean
+
+    def neighborhood(recommendations):
+        cache = {}
+        predictions, covered = [], 0
+        for user, item, rating in test:
+            if user not in cache:
+                cache[user] = dict((i, s) for s, i in recommendations(user)) if user in matrix else {}
+            if item in cache[user]:
+                covered += 1
+                predictions.append(cache[user][item])
+            else:
+                predictions.append(fallback(user))
+        return rmse(predictions, test), 1.0 * covered / len(test)
+
+    results = {'mean': (rmse([mean] * len(test), test), 1.0)}
+    for name, model in [('als', train_als(matrix, k, iterations, workers=workers, seed=seed)),
+                        ('sgd', train_sgd(matrix, k, 2 * iterations, seed=seed))]:
+        results[name] = (rmse([model.predict(user, item) for user, item, rating in test], test), 1.0)
+
+    results['user_based'] = neighborhood(lambda user: user_based_recommendation(matrix, user, sim_pearson))
+    items_sim = calculate_similar_items(matrix, n=neighbors)
+    results['item_based'] = neighborhood(lambda user: item_based_recommendation(matrix, items_sim, user))
+    return results
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from Queue import Empty, Queue
+import threading
+from timeit import default_timer
+
+from batch import NeighborMatrix, init_worker, recommend_indexes, recommend_rows
+from rating_matrix import rating_matrix
+from service import LatencyCounter
+
+__author__ = 'goran'
+
+# Python 2 has no asyncio, so the front end is built from threads: callers block on a PendingResult (or poll it),
+# one dispatcher thread forms the batches and a pool of processes does the scoring.
+
+
+class PendingResult:
+    '''
+    Result of one request, set by the front end when its batch is scored
+    '''
+    def __init__(self):
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def set(self, value):
+        self._value = value
+        self._done.set()
+
+    def fail(self, error):
+        self._error = error
+        self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        '''
+        Waits for the result and returns it, raises the error of the request if it failed
+        :param timeout: seconds, None waits for ever
+        :return:
+        '''
+        if not self._done.wait(timeout):
+            raise RuntimeError('No result after %s seconds' % timeout)
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class BatchingFrontend:
+    '''
+    Answers many concurrent item based recommendation requests. Requests are queued and the dispatcher thread takes
+    the first waiting one and everything arriving within window seconds after it (at most max_batch) as one batch.
+    The whole batch is scored by one recommend_rows call (rating matrix times neighbor matrix, see batch.py) in a
+    pool of worker processes, so the CPU heavy part runs outside of the threads taking requests and several batches
+    can be scored at once. The results are the same as item_based_recommendation(prefs, items_sim, user, top=n).
+    stats() gives the queue depth seen by the dispatcher and the sizes of the batches.
+    '''
+    def __init__(self, prefs, items_sim, n=10, window=0.005, max_batch=64, workers=1):
+        self.matrix = rating_matrix(prefs)
+        self.n = n
+        self.window = window
+        self.max_batch = max_batch
+        self.neighbors = NeighborMatrix(items_sim, self.matrix.items)
+        self.workers = workers
+        if workers == 1:
+            # scoring still leaves the dispatcher thread, but runs in this process on the matrices of this front end
+            # (the globals of batch are left to forked workers, other front ends may have their own matrices)
+            self.pool = ThreadPool(1)
+        else:
+            self.pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                             initargs=(self.matrix, self.neighbors, n))
+
+        self.requests = Queue()
+        self.completions = Queue()
+        self.latencies = LatencyCounter()
+        self.batch_sizes = LatencyCounter()
+        self.queue_depths = LatencyCounter()
+        self.served = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._dispatch), threading.Thread(target=self._complete)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, user, n=None):
+        '''
+        Queues request for the n (at most self.n) best recommendations for user, returns its PendingResult
+        :param user:
+        :param n:
+        :return:
+        '''
+        pending = PendingResult()
+        if user not in self.matrix.user_ids:
+            pending.fail(KeyError(user))
+        else:
+            self.requests.put((self.matrix.user_ids[user], n or self.n, pending, default_timer()))
+        return pending
+
+    def recommend(self, user, n=None, timeout=None):
+        return self.submit(user, n).result(timeout)
+
+    def _dispatch(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                self.completions.put(None)
+                return
+            batch = [request]
+            deadline = default_timer() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - default_timer()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except Empty:
+                    break
+                if request is None:
+                    # finish this batch, then stop
+                    self.requests.put(None)
+                    break
+                batch.append(request)
+
+            depth = self.requests.qsize()
+            with self._lock:
+                self.batches += 1
+                self.batch_sizes.add(len(batch))
+                self.queue_depths.add(depth)
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+            users = [u for u, n, p, t in batch]
+            if self.workers == 1:
+                scored = self.pool.apply_async(recommend_rows, (self.matrix, self.neighbors, users, self.n))
+            else:
+                scored = self.pool.apply_async(recommend_indexes, (users,))
+            self.completions.put((scored, batch))
+
+    def _complete(self):
+        while True:
+            item = self.completions.get()
+            if item is None:
+                return
+            scored, batch = item
+            try:
+                results = scored.get()
+            except Exception as e:
+                for u, n, pending, started in batch:
+                    pending.fail(e)
+                continue
+            now = default_timer()
+            for (u, n, pending, started), result in zip(batch, results):
+                pending.set(result[:n])
+                with self._lock:
+                    self.served += 1
+                    self.latencies.add(now - started)
+
+    def stats(self):
+        '''
+        Returns dictionary with the number of requests served and batches scored, the current, the p99 and the largest
+        queue depth, the mean and largest batch size and the p50 and p99 latency in milliseconds
+        :return:
+        '''
+        with self._lock:
+            sizes = self.batch_sizes.values[:min(self.batch_sizes.count, len(self.batch_sizes.values))]
+            result = {'served': self.served, 'batches': self.batches, 'queue_depth': self.requests.qsize(),
+                      'max_queue_depth': self.max_queue_depth,
+                      'mean_batch_size': 1.0 * sum(sizes) / len(sizes) if sizes else None,
+                      'queue_depth_p99': self.queue_depths.percentile(99),
+                      'max_batch_size': max(sizes) if sizes else None}
+            for p in (50, 99):
+                value = self.latencies.percentile(p)
+                result['latency_p%d_ms' % p] = value * 1000 if value is not None else None
+        return result
+
+    def close(self):
+        '''
+        Answers the queued requests and stops the threads and the pool
+        :return:
+        '''
+        self.requests.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.pool.close()
+        self.pool.join()
+
+
+def load_test(frontend, users, clients=16, requests_per_client=100):
+    '''
+    Local load generator: clients threads each send requests_per_client requests for users (round robin, each
+    waiting for its answer before the next one) and the throughput is measured
+    :param frontend: BatchingFrontend
+    :param users:
+    :param clients:
+    :param requests_per_client:
+    :return: dictionary with requests per second and frontend.stats()
+    '''
+    def client(c):
+        for k in xrange(requests_per_client):
+            frontend.recommend(users[(c * requests_per_client + k) % len(users)])
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in xrange(clients)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = default_timer() - start
+
+    result = frontend.stats()
+    result['requests_per_second'] = clients * requests_per_client / seconds
+    return result
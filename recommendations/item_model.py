@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+from array import array
+import heapq
+from math import sqrt
+import mmap
+import os
+import struct
+
+from common.sections import SectionReader, write_array, write_strings
+
+__author__ = 'goran'
+
+# The model file is the header (magic, metric and number of neighbors per item) and then sections like in
+# ratings_cache: user and item names, the ratings user by user (indptr, item indexes, values), the neighbor lists
+# item by item (indptr, item indexes, similarities) and the co-rating statistics of every pair of items.
+MAGIC = 'ITEMSIM2'
+HEADER = struct.Struct('<8s8sq')
+
+METRICS = ('distance', 'pearson')
+
+
+class ItemSimilarityModel:
+    '''
+    The n most similar items of every item (like calculate_similar_items) together with everything needed to keep them
+    up to date when ratings change. For every pair of items rated by the same users it keeps the co-rating
+    statistics: the number of those users, the sums and sums of squares of the ratings of both items, the sum of
+    their products and the sum of squared differences. sim_distance and sim_pearson of the pair follow from them, so
+    a new rating of user u changes only the pairs of the item with the other items of u, and only those items get
+    their neighbor lists recomputed.
+    Works as the items_sim dictionary for item_based_recommendation (model[item] is the neighbor list).
+    '''
+    def __init__(self, n=10, metric='distance'):
+        if metric not in METRICS:
+            raise ValueError('Unknown metric %r, expected one of %s' % (metric, ', '.join(METRICS)))
+        self.n = n
+        self.metric = metric
+        # changes with every update, results computed from the model can be cached per version
+        self.version = 0
+
+        self.users = []
+        self.user_ids = {}
+        self.items = []
+        self.item_ids = {}
+        # per user dictionary item index -> rating
+        self.ratings = []
+        # number of ratings of every item
+        self.counts = array('l')
+
+        # position of the statistics of items i < j in the arrays below, under key i << 32 | j
+        self.pairs = {}
+        # per item the items co-rated with it
+        self.adjacent = []
+        self.shared = array('l')
+        self.sums_i = array('d')
+        self.sums_j = array('d')
+        self.squares_i = array('d')
+        self.squares_j = array('d')
+        self.products = array('d')
+        self.sqr_dist = array('d')
+
+        # per item list of (similarity, item) like top_matches
+        self.neighbors = []
+        # item indexes by name, descending
+        self._by_name = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return (item for i, item in enumerate(self.items) if self.counts[i])
+
+    def __contains__(self, item):
+        return item in self.item_ids and self.counts[self.item_ids[item]] > 0
+
+    def __getitem__(self, item):
+        return self.neighbors[self.item_ids[item]]
+
+    def user_prefs(self, user):
+        '''
+        Returns the ratings of user as dictionary item -> rating
+        :param user:
+        :return:
+        '''
+        return dict((self.items[i], rating) for i, rating in self.ratings[self.user_ids[user]].iteritems())
+
+    def rated_any(self, user, items):
+        '''
+        Returns True if user rated some of items
+        :param user:
+        :param items:
+        :return:
+        '''
+        u = self.user_ids.get(user)
+        if u is None:
+            return False
+        ratings = self.ratings[u]
+        return any(self.item_ids[item] in ratings for item in items)
+
+    def _user(self, user):
+        u = self.user_ids.get(user)
+        if u is None:
+            u = len(self.users)
+            self.user_ids[user] = u
+            self.users.append(user)
+            self.ratings.append({})
+        return u
+
+    def _item(self, item):
+        i = self.item_ids.get(item)
+        if i is None:
+            i = len(self.items)
+            self.item_ids[item] = i
+            self.items.append(item)
+            self.counts.append(0)
+            self.adjacent.append(array('l'))
+            self.neighbors.append([])
+        return i
+
+    def _pair(self, i, j):
+        '''
+        Returns the position of the statistics of items i < j, adding them if the pair is new
+        '''
+        key = i << 32 | j
+        p = self.pairs.get(key)
+        if p is None:
+            p = len(self.shared)
+            self.pairs[key] = p
+            self.adjacent[i].append(j)
+            self.adjacent[j].append(i)
+            self.shared.append(0)
+            for values in (self.sums_i, self.sums_j, self.squares_i, self.squares_j, self.products, self.sqr_dist):
+                values.append(0.0)
+        return p
+
+    def _contribute(self, u, i, x, sign):
+        '''
+        Adds (sign 1) or removes (sign -1) rating x of user u for item i to the statistics of i with the other items
+        of u
+        '''
+        for j, y in self.ratings[u].iteritems():
+            if j == i:
+                continue
+            if i < j:
+                p, a, b = self._pair(i, j), x, y
+            else:
+                p, a, b = self._pair(j, i), y, x
+            self.shared[p] += sign
+            self.sums_i[p] += sign * a
+            self.sums_j[p] += sign * b
+            self.squares_i[p] += sign * a * a
+            self.squares_j[p] += sign * b * b
+            self.products[p] += sign * a * b
+            self.sqr_dist[p] += sign * (a - b) ** 2
+
+    def similarity(self, i, j):
+        '''
+        Returns sim_distance or sim_pearson (by metric) of items i and j from their co-rating statistics
+        :param i:
+        :param j:
+        :return:
+        '''
+        p = self.pairs.get(min(i, j) << 32 | max(i, j))
+        if p is None or self.shared[p] <= 0:
+            return 0.0
+        if self.metric == 'distance':
+            return 1.0 / (1.0 + self.sqr_dist[p])
+
+        n = self.shared[p]
+        num = self.products[p] - (self.sums_i[p] * self.sums_j[p] / n)
+        den = (self.squares_i[p] - self.sums_i[p] ** 2 / n) * (self.squares_j[p] - self.sums_j[p] ** 2 / n)
+        # rounding can leave a tiny negative instead of 0
+        if den <= 0:
+            return 0.0
+        return num / sqrt(den)
+
+    def refresh(self, i):
+        '''
+        Recomputes the neighbor list of item i. Like top_matches it is the n largest (similarity, item) over all other
+        rated items, so items not co-rated with i fill it up with similarity 0 (largest names first).
+        :param i:
+        :return:
+        '''
+        if not self.counts[i]:
+            self.neighbors[i] = []
+            return
+
+        scores = [(self.similarity(i, j), self.items[j]) for j in self.adjacent[i] if self.counts[j]]
+        adjacent = set(self.adjacent[i])
+        if self._by_name is None or len(self._by_name) != len(self.items):
+            self._by_name = sorted(xrange(len(self.items)), key=self.items.__getitem__, reverse=True)
+        zeros = []
+        for j in self._by_name:
+            if len(zeros) == self.n:
+                break
+            if j != i and j not in adjacent and self.counts[j]:
+                zeros.append((0.0, self.items[j]))
+
+        scores.extend(zeros)
+        self.neighbors[i] = heapq.nlargest(self.n, scores)
+
+    def update(self, ratings):
+        '''
+        Applies new or changed ratings and recomputes the neighbor lists of the affected items only
+        :param ratings: iterable of (user, item, rating), rating None removes the rating
+        :return: set of the items whose neighbor lists changed
+        '''
+        affected = set()
+        rated_items_changed = False
+        for user, item, rating in ratings:
+            u, i = self._user(user), self._item(item)
+            old = self.ratings[u].get(i)
+            if old is not None:
+                self._contribute(u, i, old, -1)
+                del self.ratings[u][i]
+                self.counts[i] -= 1
+            if rating is not None:
+                self._contribute(u, i, rating, 1)
+                self.ratings[u][i] = rating
+                self.counts[i] += 1
+            if (old is None) != (rating is None) and self.counts[i] == (1 if rating is not None else 0):
+                rated_items_changed = True
+            affected.add(i)
+            affected.update(self.ratings[u])
+
+        if rated_items_changed:
+            # an item appeared or disappeared, which changes the 0 similarity fillers of the short lists
+            for i in xrange(len(self.items)):
+                if len(self.neighbors[i]) < self.n or self.neighbors[i][-1][0] <= 0:
+                    affected.add(i)
+
+        changed = set()
+        for i in affected:
+            neighbors = self.neighbors[i]
+            self.refresh(i)
+            if self.neighbors[i] != neighbors:
+                changed.add(self.items[i])
+        self.version += 1
+        return changed
+
+    def set_rating(self, user, item, rating):
+        return self.update([(user, item, rating)])
+
+    def remove_rating(self, user, item):
+        return self.update([(user, item, None)])
+
+    def save(self, path):
+        '''
+        Writes the model to file path (through a temporary file, renamed at the end)
+        :param path:
+        :return:
+        '''
+        indptr, indices, values = array('l', [0]), array('l'), array('d')
+        for ratings in self.ratings:
+            indices.extend(ratings.iterkeys())
+            values.extend(ratings.itervalues())
+            indptr.append(len(indices))
+
+        neighbor_indptr, neighbor_items, neighbor_sims = array('l', [0]), array('l'), array('d')
+        for neighbors in self.neighbors:
+            neighbor_items.extend(self.item_ids[item] for similarity, item in neighbors)
+            neighbor_sims.extend(similarity for similarity, item in neighbors)
+            neighbor_indptr.append(len(neighbor_items))
+
+        keys = array('l', [0]) * len(self.shared)
+        for key, p in self.pairs.iteritems():
+            keys[p] = key
+
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as w:
+            w.write(HEADER.pack(MAGIC, self.metric, self.n))
+            write_strings(w, self.users)
+            write_strings(w, self.items)
+            for section in (indptr, indices, values, neighbor_indptr, neighbor_items, neighbor_sims, keys,
+                            self.shared, self.sums_i, self.sums_j, self.squares_i, self.squares_j, self.products,
+                            self.sqr_dist):
+                write_array(w, section)
+        os.rename(tmp, path)
+
+
+def build_item_model(prefs, n=10, metric='distance'):
+    '''
+    Returns ItemSimilarityModel of prefs[user][item] (a dictionary or RatingMatrix), with the same neighbor lists as
+    calculate_similar_items(prefs, n, sim_distance or sim_pearson)
+    :param prefs:
+    :param n:
+    :param metric: 'distance' or 'pearson'
+    :return:
+    '''
+    model = ItemSimilarityModel(n, metric)
+    for user in prefs:
+        u = model._user(user)
+        for item, rating in prefs[user].iteritems():
+            i = model._item(item)
+            model._contribute(u, i, rating, 1)
+            model.ratings[u][i] = rating
+            model.counts[i] += 1
+    for i in xrange(len(model.items)):
+        model.refresh(i)
+    return model
+
+
+def load_item_model(path):
+    '''
+    Reads ItemSimilarityModel written by ItemSimilarityModel.save from file path. All numbers are copied from the
+    memory mapped file in one piece per section.
+    :param path:
+    :return:
+    '''
+    with open(path, 'rb') as r:
+        data = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, metric, n = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not an item similarity model' % path)
+
+        model = ItemSimilarityModel(n, metric.rstrip('\0'))
+        sections = SectionReader(data, HEADER.size)
+        model.users = list(sections.read_strings())
+        model.items = list(sections.read_strings())
+        model.user_ids = dict((user, u) for u, user in enumerate(model.users))
+        model.item_ids = dict((item, i) for i, item in enumerate(model.items))
+
+        indptr, indices, values = sections.read_array(), sections.read_array(), sections.read_array()
+        model.ratings = [dict(zip(indices[indptr[u]:indptr[u + 1]], values[indptr[u]:indptr[u + 1]]))
+                         for u in xrange(len(model.users))]
+        model.counts = array('l', [0]) * len(model.items)
+        for i in indices:
+            model.counts[i] += 1
+
+        indptr, items, sims = sections.read_array(), sections.read_array(), sections.read_array()
+        model.neighbors = [[(sims[k], model.items[items[k]]) for k in xrange(indptr[i], indptr[i + 1])]
+                           for i in xrange(len(model.items))]
+
+        keys = sections.read_array()
+        model.pairs = dict(zip(keys, xrange(len(keys))))
+        model.adjacent = [array('l') for _ in model.items]
+        for key in keys:
+            model.adjacent[key >> 32].append(key & 0xffffffff)
+            model.adjacent[key & 0xffffffff].append(key >> 32)
+        model.shared = sections.read_array()
+        model.sums_i, model.sums_j = sections.read_array(), sections.read_array()
+        model.squares_i, model.squares_j = sections.read_array(), sections.read_array()
+        model.products, model.sqr_dist = sections.read_array(), sections.read_array()
+    finally:
+        data.close()
+    return model
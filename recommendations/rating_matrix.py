@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+from ratings_cache import corpus_from_prefs
+
+__author__ = 'goran'
+
+
+class RatingMatrix:
+    '''
+    All ratings with users and items mapped to integer indexes, in CSR form: user users[u] rated item items[indices[k]]
+    with ratings[k], for k in indptr[u]:indptr[u + 1]. The arrays are used as they are given, so a matrix from the
+    ratings cache reads them straight from the mapped file (see matrix_from_corpus).
+    The transposed (column) form is built lazily the first time similarities are asked for. With it the co-rating
+    sums of one user with all other users are collected in one pass over the users who share an item with it, instead
+    of intersecting the item sets of every pair (see similarity_metrics).
+    Also works as read only prefs[user][item] dictionary, so it can be passed to all functions in recommend.
+    '''
+    def __init__(self, users, items, indptr, indices, ratings):
+        self.users = list(users)
+        self.items = list(items)
+        self.user_ids = dict((user, u) for u, user in enumerate(self.users))
+        self.item_ids = dict((item, i) for i, item in enumerate(self.items))
+        self.indptr = indptr
+        self.indices = indices
+        self.ratings = ratings
+        # the same array under the name DocumentMatrix uses, for similarity_metrics
+        self.data = self.ratings
+
+        self._totals = None
+        self._columns = None
+        self._means = None
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        return iter(self.users)
+
+    def __contains__(self, user):
+        return user in self.user_ids
+
+    def __getitem__(self, user):
+        '''
+        Returns the ratings of user as dictionary item -> rating
+        :param user:
+        :return:
+        '''
+        u = self.user_ids[user]
+        return dict((self.items[self.indices[k]], self.ratings[k]) for k in xrange(self.indptr[u], self.indptr[u + 1]))
+
+    def keys(self):
+        return list(self.users)
+
+    def iteritems(self):
+        for user in self.users:
+            yield user, self[user]
+
+    def items_of(self, u):
+        '''
+        Returns the item indexes and the ratings of user u as two arrays
+        :param u:
+        :return:
+        '''
+        start, end = self.indptr[u], self.indptr[u + 1]
+        return self.indices[start:end], self.ratings[start:end]
+
+    def mean(self, u):
+        counts, sums, sums_sq = self.row_totals()
+        return sums[u] / counts[u] if counts[u] else 0.0
+
+    def row_totals(self):
+        '''
+        Returns (counts, sums, sums_sq), arrays with the number of ratings of every user, their sum and the sum of
+        their squares, for similarity_metrics. They are computed the first time they are asked for.
+        :return:
+        '''
+        if self._totals is None:
+            n = len(self.users)
+            counts = array('l', (self.indptr[u + 1] - self.indptr[u] for u in xrange(n)))
+            sums = array('d', [0.0]) * n
+            sums_sq = array('d', [0.0]) * n
+            for u in xrange(n):
+                for k in xrange(self.indptr[u], self.indptr[u + 1]):
+                    sums[u] += self.ratings[k]
+                    sums_sq[u] += self.ratings[k] ** 2
+            self._totals = (counts, sums, sums_sq)
+        return self._totals
+
+    def column_means(self):
+        '''
+        Returns array with the average rating of every item
+        :return:
+        '''
+        if self._means is None:
+            col_users, col_ratings = self.columns()
+            self._means = array('d', (sum(values) / len(values) if values else 0.0 for values in col_ratings))
+        return self._means
+
+    def columns(self):
+        '''
+        Returns the transposed matrix as two lists indexed by item: the users who rated the item (ascending) and their
+        ratings of it
+        :return:
+        '''
+        if self._columns is None:
+            col_users = [array('l') for _ in xrange(len(self.items))]
+            col_ratings = [array('d') for _ in xrange(len(self.items))]
+            for u in xrange(len(self.users)):
+                for k in xrange(self.indptr[u], self.indptr[u + 1]):
+                    col_users[self.indices[k]].append(u)
+                    col_ratings[self.indices[k]].append(self.ratings[k])
+            self._columns = (col_users, col_ratings)
+        return self._columns
+
+    def transposed(self):
+        '''
+        Returns RatingMatrix with the roles of users and items swapped, like transform_prefs
+        :return:
+        '''
+        col_users, col_ratings = self.columns()
+        indptr = array('l', [0])
+        indices = array('l')
+        ratings = array('d')
+        for i in xrange(len(self.items)):
+            indices.extend(col_users[i])
+            ratings.extend(col_ratings[i])
+            indptr.append(len(indices))
+        return RatingMatrix(self.items, self.users, indptr, indices, ratings)
+
+    def weighted_ratings(self, u, others, weights):
+        '''
+        Sums the ratings of users others, each multiplied by its weight, for every item not rated by user u
+        :param u:
+        :param others: user indexes
+        :param weights: weight of every user in others
+        :return: (items, totals, weight_totals), the indexes of the items rated by some of others but not by u, and
+        arrays indexed by item with the weighted sum of their ratings and the sum of the weights
+        '''
+        rated = array('b', [0]) * len(self.items)
+        for k in xrange(self.indptr[u], self.indptr[u + 1]):
+            rated[self.indices[k]] = 1
+
+        totals = array('d', [0.0]) * len(self.items)
+        weight_totals = array('d', [0.0]) * len(self.items)
+        seen = array('b', [0]) * len(self.items)
+        items = []
+        for v, w in zip(others, weights):
+            for k in xrange(self.indptr[v], self.indptr[v + 1]):
+                i = self.indices[k]
+                if rated[i]:
+                    continue
+                if not seen[i]:
+                    seen[i] = 1
+                    items.append(i)
+                totals[i] += w * self.ratings[k]
+                weight_totals[i] += w
+        return items, totals, weight_totals
+
+
+def matrix_from_corpus(corpus):
+    '''
+    Returns RatingMatrix with the ratings of ratings_cache.RatingsCorpus corpus (e.g. from cached_ratings). The
+    arrays of the corpus are not copied, for a cached corpus they stay in the mapped file.
+    :param corpus:
+    :return:
+    '''
+    return RatingMatrix(corpus.users, corpus.items, corpus.indptr, corpus.item_ids, corpus.ratings)
+
+
+def rating_matrix(prefs):
+    '''
+    Returns RatingMatrix with the ratings from prefs[user][item], or prefs itself if it is already one
+    :param prefs:
+    :return:
+    '''
+    if isinstance(prefs, RatingMatrix):
+        return prefs
+    return matrix_from_corpus(corpus_from_prefs(prefs))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+from array import array
+import mmap
+import os
+import struct
+
+from common.sections import SectionReader, write_array, write_strings
+
+__author__ = 'goran'
+
+# The cache file is the header (magic and number of source files), size and mtime of every source file and then the
+# sections (see common.sections): user names and item names, then for every user the start of its ratings (indptr)
+# and all ratings as item indexes and values, user by user.
+MAGIC = 'RATINGS2'
+HEADER = struct.Struct('<8sq')
+STAMP = struct.Struct('<qd')
+
+
+class RatingsCorpus:
+    '''
+    All ratings in CSR form: the ratings of users[u] are for items[item_ids[k]] with value ratings[k], for k in
+    indptr[u]:indptr[u + 1].
+    '''
+    def __init__(self, users, items, indptr, item_ids, ratings):
+        self.users = users
+        self.items = items
+        self.indptr = indptr
+        self.item_ids = item_ids
+        self.ratings = ratings
+
+    def prefs(self):
+        '''
+        Returns the ratings as prefs[user][item] like loadMovieLens does. This builds all of them as Python objects,
+        rating_matrix.matrix_from_corpus uses the arrays as they are.
+        :return:
+        '''
+        items = list(self.items)
+        prefs = {}
+        for u, user in enumerate(self.users):
+            start, end = self.indptr[u], self.indptr[u + 1]
+            prefs[user] = dict((items[self.item_ids[k]], self.ratings[k]) for k in xrange(start, end))
+        return prefs
+
+
+def corpus_from_prefs(prefs):
+    '''
+    Returns RatingsCorpus with the ratings from prefs[user][item]
+    :param prefs:
+    :return:
+    '''
+    items = {}
+    item_names = []
+    indptr = array('l', [0])
+    item_ids = array('l')
+    ratings = array('d')
+    users = list(prefs)
+    for user in users:
+        for item, rating in prefs[user].iteritems():
+            if item not in items:
+                items[item] = len(item_names)
+                item_names.append(item)
+            item_ids.append(items[item])
+            ratings.append(rating)
+        indptr.append(len(item_ids))
+    return RatingsCorpus(users, item_names, indptr, item_ids, ratings)
+
+
+def source_stamps(sources):
+    '''
+    Returns (size, mtime) of every file in sources, the cache is valid only for the same values
+    :param sources:
+    :return:
+    '''
+    return [(os.stat(s).st_size, os.stat(s).st_mtime) for s in sources]
+
+
+def save_ratings(path, corpus, sources):
+    '''
+    Writes RatingsCorpus loaded from files sources to cache file path (through a temporary file, renamed at the end)
+    :param path:
+    :param corpus:
+    :param sources:
+    :return:
+    '''
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as w:
+        w.write(HEADER.pack(MAGIC, len(sources)))
+        for size, mtime in source_stamps(sources):
+            w.write(STAMP.pack(size, mtime))
+        write_strings(w, corpus.users)
+        write_strings(w, corpus.items)
+        for values in (corpus.indptr, corpus.item_ids, corpus.ratings):
+            write_array(w, values)
+    os.rename(tmp, path)
+
+
+def load_ratings(path, sources):
+    '''
+    Returns RatingsCorpus from cache file path, or None if there is no cache or any of the sources has different size
+    or modification time than when it was written. The file is memory mapped and the ratings are read from it in place
+    (see SectionReader.read_view), a name is read only when it is used.
+    :param path:
+    :param sources:
+    :return:
+    '''
+    if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+        return None
+
+    with open(path, 'rb') as r:
+        data = mmap.mmap(r.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, count = HEADER.unpack_from(data, 0)
+    stamps = [STAMP.unpack_from(data, HEADER.size + i * STAMP.size) for i in xrange(count)]
+    if magic != MAGIC or stamps != source_stamps(sources):
+        data.close()
+        return None
+
+    sections = SectionReader(data, HEADER.size + count * STAMP.size)
+    users = sections.read_strings(view=True)
+    items = sections.read_strings(view=True)
+    return RatingsCorpus(users, items, sections.read_view(), sections.read_view(), sections.read_view())
+
+
+def cached_ratings(load, sources, path):
+    '''
+    Returns RatingsCorpus of the ratings in the files sources. It is read from cache file path when the cache is up to
+    date, otherwise load() is called to parse them into prefs[user][item] and the cache is written again.
+    :param load:
+    :param sources:
+    :param path:
+    :return:
+    '''
+    corpus = load_ratings(path, sources)
+    if corpus is None:
+        corpus = corpus_from_prefs(load())
+        save_ratings(path, corpus, sources)
+    return corpus
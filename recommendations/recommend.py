@@ -1,8 +1,20 @@
 # -*- coding: utf-8 -*-
+from collections import OrderedDict
+import heapq
 from math import sqrt
+import os
+import threading
+
+from common.similarity_metrics import as_metric, get_metric
+
+from rating_matrix import RatingMatrix, matrix_from_corpus, rating_matrix
+from ratings_cache import cached_ratings
 
 __author__ = 'goran'
 
+# Default directory of the MovieLens files, can be set with the MOVIELENS_DATA environment variable
+DATA_PATH = os.environ.get('MOVIELENS_DATA', '/home/goran/Desktop/data')
+
 # A dictionary of movie critics and their ratings of a small
 # set of movies
 critics = {'Lisa Rose': {'Lady in the Water': 2.5, 'Snakes on a Plane': 3.5,
@@ -73,16 +85,142 @@ def sim_pearson(prefs, p1, p2):
 # print sim_pearson(critics, 'Lisa Rose', 'Gene Seymour')
 
 
+# The similarity_metrics equal to the functions above. The functions below use them to get the similarities of one
+# person to all others at once from a RatingMatrix, instead of calling the function for every pair. Dictionary prefs
+# are served from a RatingMatrix too, see prefs_matrix.
+BATCHED_SIMILARITIES = {sim_distance: get_metric('euclidean'), sim_pearson: get_metric('pearson')}
+
+# RatingMatrix of the last MAX_KEPT_MATRICES dictionary prefs, as id(prefs) -> (prefs, matrix). The matrix of a
+# dictionary is built the first time it is used and kept until prefs_changed(prefs) is called: code that changes a
+# dictionary in place has to call it (service.RecommendationService.set_rating does), then the matrix is built again
+# on the next use.
+MAX_KEPT_MATRICES = 4
+kept_matrices = OrderedDict()
+kept_matrices_lock = threading.Lock()
+
+
+def keep_matrix(prefs, matrix):
+    '''
+    Keeps matrix as the RatingMatrix of dictionary prefs (see prefs_matrix)
+    :param prefs:
+    :param matrix:
+    :return:
+    '''
+    with kept_matrices_lock:
+        kept_matrices.pop(id(prefs), None)
+        if len(kept_matrices) >= MAX_KEPT_MATRICES:
+            kept_matrices.popitem(last=False)
+        kept_matrices[id(prefs)] = (prefs, matrix)
+
+
+def prefs_matrix(prefs):
+    '''
+    Returns prefs as RatingMatrix: prefs itself if it is one, otherwise the matrix kept for dictionary prefs, which is
+    built if there is none
+    :param prefs:
+    :return:
+    '''
+    if isinstance(prefs, RatingMatrix):
+        return prefs
+    with kept_matrices_lock:
+        entry = kept_matrices.get(id(prefs))
+    # the entry holds prefs, so while it is kept no other object can have the same id
+    if entry is not None and entry[0] is prefs:
+        return entry[1]
+    matrix = rating_matrix(prefs)
+    keep_matrix(prefs, matrix)
+    return matrix
+
+
+def prefs_changed(prefs):
+    '''
+    Drops the RatingMatrix kept for dictionary prefs, which were changed in place
+    :param prefs:
+    :return:
+    '''
+    with kept_matrices_lock:
+        kept_matrices.pop(id(prefs), None)
+
+
+def batched_metric(similarity):
+    '''
+    Returns the similarity_metrics.Metric for similarity given as a Metric, the name of one or one of the functions in
+    BATCHED_SIMILARITIES, None for other functions
+    :param similarity:
+    :return:
+    '''
+    if similarity in BATCHED_SIMILARITIES:
+        return BATCHED_SIMILARITIES[similarity]
+    return as_metric(similarity)
+
+
+def batched_prefs(prefs, similarity):
+    '''
+    Returns the RatingMatrix (see prefs_matrix) the recommendations for prefs are computed from, None for dictionary
+    prefs with a similarity function that has no Metric, which are left to the loops over the dictionaries
+    :param prefs:
+    :param similarity:
+    :return:
+    '''
+    if isinstance(prefs, RatingMatrix) or batched_metric(similarity) is not None:
+        return prefs_matrix(prefs)
+    return None
+
+
+def similarities_to(prefs, person, similarity=sim_pearson):
+    '''
+    Returns list of (similarity, other) for every other person in prefs. Batched (one row of similarities of the
+    RatingMatrix of prefs) unless similarity is a function without a Metric, which is called for every pair.
+    :param prefs: prefs[person][item] dictionary or RatingMatrix
+    :param person:
+    :param similarity: function like sim_pearson, or similarity_metrics.Metric or its name
+    :return:
+    '''
+    metric = batched_metric(similarity)
+    if metric is not None:
+        matrix = prefs_matrix(prefs)
+        u = matrix.user_ids[person]
+        sims = metric.similarity_row(matrix, u)
+        return [(sims[v], other) for v, other in enumerate(matrix.users) if v != u]
+    return [(similarity(prefs, person, other), other) for other in prefs if other != person]
+
+
+def ranked(scores, top=None):
+    '''
+    Returns scores sorted from the largest, or only the top largest of them if top is given. Those are selected with a
+    heap in O(len(scores) log top) instead of sorting all, in the same order as sorting and slicing would give.
+    :param scores: iterable of (score, name)
+    :param top:
+    :return:
+    '''
+    if top is None:
+        return sorted(scores, reverse=True)
+    return heapq.nlargest(top, scores)
+
+
 def top_matches(prefs, person, n=10, similarity=sim_pearson):
-    scores = [(similarity(prefs, person, other), other) for other in prefs if other != person]
-    scores.sort(reverse=True)
-    return scores[:n]
+    return ranked(similarities_to(prefs, person, similarity), n)
 
 
 # print top_matches(critics, 'Toby', n=3)
 
 
-def user_based_recommendation(prefs, person, similarity=sim_pearson):
+def user_based_recommendation(prefs, person, similarity=sim_pearson, top=None):
+    '''
+    Recommendations for person weighted by the similarity of all other persons. The similarities are one batched row
+    and the scores come from matrix_recommendation, only dictionary prefs with a similarity function that has no
+    Metric use the loops below.
+    :param prefs: prefs[person][item] dictionary or RatingMatrix
+    :param person:
+    :param similarity:
+    :param top: see ranked
+    :return:
+    '''
+    matrix = batched_prefs(prefs, similarity)
+    if matrix is not None:
+        others = [(sim, other) for sim, other in similarities_to(matrix, person, similarity) if sim > 0]
+        return matrix_recommendation(matrix, person, others, lambda total_sim: total_sim != 0.0, top)
+
     total_sim = {}
     total_score = {}
 
@@ -100,23 +238,25 @@ def user_based_recommendation(prefs, person, similarity=sim_pearson):
                 # calculate total weighted score as sum of sim(user) * rating_by(user)
                 total_score[item] = total_score.get(item, 0) + sim * prefs[other][item]
 
-    return sorted([(1.0 * score / total_sim[item], item)
-                   for item, score in total_score.items() if total_sim[item] != 0.0], reverse=True)
+    return ranked(((1.0 * score / total_sim[item], item)
+                   for item, score in total_score.items() if total_sim[item] != 0.0), top)
 
 
 # print user_based_recommendation(critics, 'Toby')
 # print user_based_recommendation(critics, 'Toby', sim_distance)
 
 
-def user_based_recommendation_first_n(prefs, person, similarity=sim_pearson, n=10):
-    most_sim_users = [tm[1] for tm in top_matches(prefs, person, n=n, similarity=similarity)]
+def user_based_recommendation_first_n(prefs, person, similarity=sim_pearson, n=10, top=None):
+    matrix = batched_prefs(prefs, similarity)
+    most_sim_users = top_matches(matrix if matrix is not None else prefs, person, n=n, similarity=similarity)
+
+    if matrix is not None:
+        return matrix_recommendation(matrix, person, most_sim_users, lambda total_sim: True, top)
 
     total_sim = {}
     total_score = {}
 
-    for other in most_sim_users:
-        sim = similarity(prefs, person, other)
-
+    for sim, other in most_sim_users:
         for item in prefs[other]:
             if item not in prefs[person]:
                 # calculate total similarity with users who rated this item
@@ -124,11 +264,28 @@ def user_based_recommendation_first_n(prefs, person, similarity=sim_pearson, n=1
                 # calculate total weighted score as sum of sim(user) * rating_by(user)
                 total_score[item] = total_score.get(item, 0) + sim * prefs[other][item]
 
-    return sorted([(1.0 * total_score[item] / total_sim[item], item) for item in total_sim.keys()], reverse=True)
+    return ranked(((1.0 * total_score[item] / total_sim[item], item) for item in total_sim.keys()), top)
 
 
 # print user_based_recommendation_first_n(critics, 'Toby', sim_pearson, 3)
 
+
+def matrix_recommendation(prefs, person, others, keep, top=None):
+    '''
+    Recommendations for person from RatingMatrix prefs, scored like user_based_recommendation
+    :param prefs:
+    :param person:
+    :param others: list of (similarity, other) used as weights
+    :param keep: function of the total similarity of an item, False to leave the item out
+    :param top: see ranked
+    :return:
+    '''
+    items, total_score, total_sim = prefs.weighted_ratings(prefs.user_ids[person],
+                                                           [prefs.user_ids[other] for sim, other in others],
+                                                           [sim for sim, other in others])
+    return ranked(((1.0 * total_score[i] / total_sim[i], prefs.items[i]) for i in items if keep(total_sim[i])), top)
+
+
 def transform_prefs(prefs):
     result = {}
     for person, items_ratings in prefs.iteritems():
@@ -142,7 +299,11 @@ def transform_prefs(prefs):
 def calculate_similar_items(prefs, n=10, similarity=sim_distance):
     result = {}
 
-    item_prefs = transform_prefs(prefs)
+    # the transposed RatingMatrix is built once and gives the similarities of an item to all others in one pass
+    if batched_metric(similarity) is not None:
+        item_prefs = prefs_matrix(prefs).transposed()
+    else:
+        item_prefs = transform_prefs(prefs)
 
     for item in item_prefs:
         result[item] = top_matches(item_prefs, item, n=n, similarity=similarity)
@@ -156,15 +317,17 @@ def calculate_similar_items(prefs, n=10, similarity=sim_distance):
 
 # print calculate_similar_items(critics)
 
-def item_based_recommendation(prefs, items_sim, person):
+def item_based_recommendation(prefs, items_sim, person, top=None):
     '''
-    You need to previously have built items_sim = calculate_similar_items(...)
+    You need to previously have built items_sim = calculate_similar_items(...), or an item_model.ItemSimilarityModel
+    (then prefs can be None and the ratings of person are taken from the model)
     :param prefs:
     :param items_sim:
     :param person:
+    :param top: if given only the top best items are returned, see ranked
     :return:
     '''
-    userRatings = prefs[person]
+    userRatings = prefs[person] if prefs is not None else items_sim.user_prefs(person)
     totalScore = {}
     totalSim = {}
 
@@ -187,17 +350,35 @@ def item_based_recommendation(prefs, items_sim, person):
             totalSim[item2] += similarity
 
     # Divide each total score by the corresponding weighting sum to get an average
-    rankings = [(1.0 * score / totalSim[item], item) for (item, score) in totalScore.items() if totalSim[item] > 0]
+    rankings = ((1.0 * score / totalSim[item], item) for (item, score) in totalScore.items() if totalSim[item] > 0)
 
-    rankings.sort(reverse=True)
-
-    return rankings
+    return ranked(rankings, top)
 
 
 # print item_based_recommendation(critics, 'Toby', sim_distance)
 
 
-def loadMovieLens(path='/home/goran/Desktop/data'):
+def dict_prefs(corpus):
+    '''
+    Returns the ratings of ratings_cache.RatingsCorpus corpus as prefs dictionary, with the RatingMatrix over the
+    corpus kept for it (see prefs_matrix)
+    :param corpus:
+    :return:
+    '''
+    prefs = corpus.prefs()
+    keep_matrix(prefs, matrix_from_corpus(corpus))
+    return prefs
+
+
+def loadMovieLens(path=None, cache=False, as_dict=False):
+    # With cache the ratings are read from the binary u.data.cache (rebuilt when u.item or u.data change)
+    # and returned as a read only RatingMatrix over the mapped file, as_dict builds the prefs dictionary from it instead
+    path = path or DATA_PATH
+    if cache:
+        corpus = cached_ratings(lambda: loadMovieLens(path), [path + '/u.item', path + '/u.data'],
+                                path + '/u.data.cache')
+        return dict_prefs(corpus) if as_dict else matrix_from_corpus(corpus)
+
     # Get movie titles
     movies = {}
     for line in open(path + '/u.item'):
@@ -213,7 +394,15 @@ def loadMovieLens(path='/home/goran/Desktop/data'):
     return prefs
 
 
-def loadMovieLens2(path='/home/goran/Desktop/data'):
+def loadMovieLens2(path=None, cache=False, as_dict=False):
+    # With cache the ratings are read from the binary ratings.dat.cache (rebuilt when movies.dat or ratings.dat
+    # change) and returned as a read only RatingMatrix over the mapped file, as_dict builds the prefs dictionary from it instead
+    path = path or DATA_PATH
+    if cache:
+        corpus = cached_ratings(lambda: loadMovieLens2(path), [path + '/movies.dat', path + '/ratings.dat'],
+                                path + '/ratings.dat.cache')
+        return dict_prefs(corpus) if as_dict else matrix_from_corpus(corpus)
+
     # Get movie titles
     movies = {}
     for line in open(path + '/movies.dat'):
@@ -228,10 +417,12 @@ def loadMovieLens2(path='/home/goran/Desktop/data'):
         prefs[user][movies[movieid]] = float(rating)
     return prefs
 
-prefs = loadMovieLens()
-items_sim = calculate_similar_items(prefs, n=50)
-# print prefs['87']
-# print items_sim
-# print user_based_recommendation(prefs, '87')[0:30]
-print item_based_recommendation(prefs, items_sim, '87')[0:30]
+
+if __name__ == '__main__':
+    prefs = loadMovieLens()
+    items_sim = calculate_similar_items(prefs, n=50)
+    # print prefs['87']
+    # print items_sim
+    # print user_based_recommendation(prefs, '87', top=30)
+    print item_based_recommendation(prefs, items_sim, '87', top=30)
 
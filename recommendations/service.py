@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+from array import array
+from collections import OrderedDict
+import threading
+from timeit import default_timer
+
+from recommend import item_based_recommendation, prefs_changed, user_based_recommendation_first_n, sim_pearson
+from vector_index import factor_index_recommendation
+
+__author__ = 'goran'
+
+
+class ResultCache:
+    '''
+    LRU cache of at most size results, each valid for ttl seconds. The keys start with the user, and all results of
+    one user can be dropped at once with invalidate. Not thread safe by itself.
+    '''
+    def __init__(self, size=10000, ttl=300.0, clock=default_timer):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.keys_of_user = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        '''
+        Returns the result under key, or None if there is none or it is older than ttl
+        :param key:
+        :return:
+        '''
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return None
+        if self.clock() - entry[0] > self.ttl:
+            self._forget(key)
+            return None
+        # back at the end, the most recently used
+        self.entries[key] = entry
+        return entry[1]
+
+    def put(self, key, value):
+        if key in self.entries:
+            del self.entries[key]
+        elif len(self.entries) >= self.size:
+            oldest = next(iter(self.entries))
+            del self.entries[oldest]
+            self._forget(oldest)
+        self.entries[key] = (self.clock(), value)
+        self.keys_of_user.setdefault(key[0], set()).add(key)
+
+    def _forget(self, key):
+        self.entries.pop(key, None)
+        keys = self.keys_of_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_of_user[key[0]]
+
+    def invalidate(self, user):
+        '''
+        Drops all results of user
+        :param user:
+        :return:
+        '''
+        for key in self.keys_of_user.pop(user, ()):
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.keys_of_user.clear()
+
+
+class LatencyCounter:
+    '''
+    Keeps the last size latencies (in seconds) in a ring buffer and gives their percentiles
+    '''
+    def __init__(self, size=10000):
+        self.values = array('d', [0.0]) * size
+        self.count = 0
+
+    def add(self, seconds):
+        self.values[self.count % len(self.values)] = seconds
+        self.count += 1
+
+    def percentile(self, p):
+        '''
+        Returns the p-th percentile (0 to 100) of the kept latencies, None if there are none
+        :param p:
+        :return:
+        '''
+        values = sorted(self.values[:min(self.count, len(self.values))])
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+class RecommendationService:
+    '''
+    Long lived recommender for serving: recommend() and similar_items() answer from an item_model.ItemSimilarityModel
+    (item based) or from prefs (user based, with user_based_recommendation_first_n), and keep the results in a
+    ResultCache under (user, kind, n, model version). set_rating() updates the model and drops the cached results
+    computed from what it changed: all results of that user, similar_items() of the items whose neighbor lists
+    changed and the results of the users who rated any of those items. User based results of other users are not
+    dropped (a rating changes the similarities of the user to everybody) and stay until their ttl runs out.
+    use_model() replaces the model (e.g. a periodical full rebuild) and with it the model version, so all older
+    results are no longer used.
+    With factors (a factorization.FactorModel) and index (its vector_index.factor_index) recommend_factors() answers
+    from the latent factors, searching only probes clusters of the index.
+    Safe to call from many threads: the model is read and updated under one lock, the cache and counters under
+    another one. Every set_rating() increases the generation of the service, and a result is cached only if no
+    set_rating() ran while it was computed.
+    '''
+    def __init__(self, model, prefs=None, cache_size=10000, ttl=300.0, neighbors=10, similarity=sim_pearson,
+                 factors=None, index=None, probes=None):
+        self.model = model
+        self.prefs = prefs
+        self.neighbors = neighbors
+        self.similarity = similarity
+        self.factors = factors
+        self.index = index
+        self.probes = probes
+        self.model_version = 0
+        self.cache = ResultCache(cache_size, ttl)
+        self.latencies = {'recommend': LatencyCounter(), 'similar_items': LatencyCounter(),
+                          'recommend_factors': LatencyCounter()}
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._model_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+
+    def _cached(self, kind, key, compute):
+        start = default_timer()
+        with self._cache_lock:
+            result = self.cache.get(key)
+            generation = self.generation
+        if result is None:
+            with self._model_lock:
+                result = compute()
+            with self._cache_lock:
+                # a set_rating since the generation was read may have dropped the cache before this result
+                # (computed from the older ratings) gets here, then it is returned but not kept
+                if self.generation == generation:
+                    self.cache.put(key, result)
+                self.misses += 1
+                self.latencies[kind].add(default_timer() - start)
+        else:
+            with self._cache_lock:
+                self.hits += 1
+                self.latencies[kind].add(default_timer() - start)
+        return result
+
+    def recommend(self, user, n=10, user_based=False):
+        '''
+        Returns the n best (score, item) for user, from item_based_recommendation or with user_based from
+        user_based_recommendation_first_n over the self.neighbors most similar users
+        :param user:
+        :param n:
+        :param user_based:
+        :return:
+        '''
+        if user_based:
+            return self._cached('recommend', (user, 'user', n, self.model_version),
+                                lambda: user_based_recommendation_first_n(self.prefs, user, self.similarity,
+                                                                          self.neighbors, top=n))
+        return self._cached('recommend', (user, 'item', n, self.model_version),
+                            lambda: item_based_recommendation(None, self.model, user, top=n))
+
+    def recommend_factors(self, user, n=10):
+        '''
+        Returns about the n best (predicted rating, item) for user from the factor index (see
+        vector_index.factor_index_recommendation)
+        :param user:
+        :param n:
+        :return:
+        '''
+        return self._cached('recommend_factors', (user, 'factors', n, self.model_version),
+                            lambda: factor_index_recommendation(self.index, self.factors, user, n, self.probes))
+
+    def similar_items(self, item, n=10):
+        '''
+        Returns the n most similar (similarity, item) to item from the model (at most model.n)
+        :param item:
+        :param n:
+        :return:
+        '''
+        return self._cached('similar_items', (('item', item), 'similar', n, self.model_version),
+                            lambda: self.model[item][:n])
+
+    def set_rating(self, user, item, rating):
+        '''
+        Adds or changes (rating None removes) the rating of user for item and drops the cached results that depend on
+        it (see the class)
+        :param user:
+        :param item:
+        :param rating:
+        :return:
+        '''
+        with self._model_lock:
+            changed = self.model.set_rating(user, item, rating)
+            if isinstance(self.prefs, dict):
+                if rating is None:
+                    self.prefs.get(user, {}).pop(item, None)
+                else:
+                    self.prefs.setdefault(user, {})[item] = rating
+                prefs_changed(self.prefs)
+            # still under the model lock, so the ratings of the other users read by rated_any do not change
+            with self._cache_lock:
+                stale = [user] + [('item', i) for i in changed]
+                stale.extend(other for other in self.cache.keys_of_user
+                             if not isinstance(other, tuple) and other != user and self.model.rated_any(other, changed))
+                for key in stale:
+                    self.cache.invalidate(key)
+                self.generation += 1
+
+    def use_model(self, model, prefs=None, factors=None, index=None):
+        '''
+        Starts serving from model (and prefs, factors and index, if given), all cached results are dropped
+        :param model:
+        :param prefs:
+        :param factors:
+        :param index:
+        :return:
+        '''
+        with self._model_lock:
+            self.model = model
+            if prefs is not None:
+                self.prefs = prefs
+            if factors is not None:
+                self.factors, self.index = factors, index
+            self.model_version += 1
+        with self._cache_lock:
+            self.cache.clear()
+
+    def stats(self):
+        '''
+        Returns dictionary with the cache hits and misses, the number of cached results and the p50 and p99 latency
+        in milliseconds of every kind of call
+        :return:
+        '''
+        with self._cache_lock:
+            result = {'hits': self.hits, 'misses': self.misses, 'cached': len(self.cache)}
+            for kind, counter in self.latencies.iteritems():
+                for p in (50, 99):
+                    value = counter.percentile(p)
+                    result['%s_p%d_ms' % (kind, p)] = value * 1000 if value is not None else None
+        return result
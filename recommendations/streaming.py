@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+from array import array
+import heapq
+from itertools import islice
+import os
+import shutil
+import tempfile
+
+from recommend import DATA_PATH, batched_metric, sim_distance
+
+__author__ = 'goran'
+
+# Out of core version of calculate_similar_items for rating logs too large for prefs dictionaries. Nothing is kept
+# in memory per rating, only the user and item names and, at any time, one shard:
+#   1. the ratings are read in chunks and appended to user shards (every user to one shard, in file order),
+#   2. every user shard is read back and the ratings of each of its users give the co-rating statistics of all pairs
+#      of items the user rated, summed in memory and flushed to pair shards (every pair to the shards of both items),
+#   3. every pair shard holds all statistics of its items, so their similarities to all other items and the neighbor
+#      lists are computed one shard at a time.
+# Shards are flat arrays of doubles, USER_RECORD values per rating and PAIR_RECORD per pair.
+
+USER_RECORD = 3     # user, item, rating
+PAIR_RECORD = 8     # item, other item, shared, products, sum, other sum, squares, other squares
+
+
+def read_ratings(path=None, format='100k'):
+    '''
+    Streams the MovieLens ratings from directory path as (user, item, rating), with the same names as loadMovieLens
+    (format 100k) or loadMovieLens2 (format 1m). Only the movie titles are kept in memory.
+    :param path: default recommend.DATA_PATH
+    :param format:
+    :return:
+    '''
+    path = path or DATA_PATH
+    if format == '100k':
+        items_file, items_separator, ratings_file, separator = 'u.item', '|', 'u.data', '\t'
+    else:
+        items_file, items_separator, ratings_file, separator = 'movies.dat', '::', 'ratings.dat', '::'
+
+    movies = {}
+    for line in open(os.path.join(path, items_file)):
+        (id, title) = line.split(items_separator)[0:2]
+        movies[id] = title
+
+    for line in open(os.path.join(path, ratings_file)):
+        (user, movieid, rating, ts) = line.split(separator)
+        yield user, movies[movieid], float(rating)
+
+
+def append_records(path, values):
+    with open(path, 'ab') as w:
+        values.tofile(w)
+
+
+def read_records(path):
+    values = array('d')
+    if os.path.exists(path):
+        with open(path, 'rb') as r:
+            values.fromfile(r, os.path.getsize(path) // values.itemsize)
+    return values
+
+
+def write_user_shards(ratings, directory, shards, chunk_size):
+    '''
+    Pass 1: appends ratings, iterable of (user, item, rating), to the user shards chunk by chunk
+    :param ratings:
+    :param directory:
+    :param shards:
+    :param chunk_size: ratings read before writing
+    :return: (users, items, user_ids, item_ids), the names and the name -> index dictionaries
+    '''
+    users, items, user_ids, item_ids = [], [], {}, {}
+    ratings = iter(ratings)
+    while True:
+        chunk = list(islice(ratings, chunk_size))
+        if not chunk:
+            break
+        buffers = [array('d') for _ in xrange(shards)]
+        for user, item, rating in chunk:
+            u = user_ids.get(user)
+            if u is None:
+                u = user_ids[user] = len(users)
+                users.append(user)
+            i = item_ids.get(item)
+            if i is None:
+                i = item_ids[item] = len(items)
+                items.append(item)
+            buffers[u % shards].extend((u, i, rating))
+        for s in xrange(shards):
+            if buffers[s]:
+                append_records(os.path.join(directory, 'users%d' % s), buffers[s])
+    return users, items, user_ids, item_ids
+
+
+def flush_pairs(pairs, n_items, directory, shards):
+    buffers = [array('d') for _ in xrange(shards)]
+    for key, (shared, products, sum_i, sum_j, sq_i, sq_j) in pairs.iteritems():
+        i, j = divmod(key, n_items)
+        buffers[i % shards].extend((i, j, shared, products, sum_i, sum_j, sq_i, sq_j))
+        buffers[j % shards].extend((j, i, shared, products, sum_j, sum_i, sq_j, sq_i))
+    for s in xrange(shards):
+        if buffers[s]:
+            append_records(os.path.join(directory, 'pairs%d' % s), buffers[s])
+    pairs.clear()
+
+
+def write_pair_shards(directory, shards, n_items, center, max_pairs):
+    '''
+    Pass 2: reads every user shard and adds the co-rating statistics of every user to the pair shards. A user rating
+    the same item twice keeps the later rating, like prefs[user][item] does.
+    :param directory:
+    :param shards:
+    :param n_items:
+    :param center: subtract the mean rating of the user first (for centered metrics)
+    :param max_pairs: pairs summed in memory before they are flushed
+    :return: (counts, sums, sums_sq) of every item, over all its ratings
+    '''
+    counts = array('l', [0]) * n_items
+    sums = array('d', [0.0]) * n_items
+    sums_sq = array('d', [0.0]) * n_items
+    pairs = {}
+
+    for s in xrange(shards):
+        records = read_records(os.path.join(directory, 'users%d' % s))
+        ratings = {}
+        for k in xrange(0, len(records), USER_RECORD):
+            ratings.setdefault(int(records[k]), {})[int(records[k + 1])] = records[k + 2]
+        del records
+
+        for user_ratings in ratings.itervalues():
+            rated = sorted(user_ratings.iteritems())
+            mean = sum(x for i, x in rated) / len(rated) if center else 0.0
+            for i, x in rated:
+                counts[i] += 1
+                sums[i] += x
+                sums_sq[i] += x * x
+            for a in xrange(len(rated)):
+                i, x = rated[a]
+                x -= mean
+                for b in xrange(a + 1, len(rated)):
+                    j, y = rated[b]
+                    y -= mean
+                    key = i * n_items + j
+                    p = pairs.get(key)
+                    if p is None:
+                        pairs[key] = [1, x * y, x, y, x * x, y * y]
+                    else:
+                        p[0] += 1
+                        p[1] += x * y
+                        p[2] += x
+                        p[3] += y
+                        p[4] += x * x
+                        p[5] += y * y
+            if len(pairs) >= max_pairs:
+                flush_pairs(pairs, n_items, directory, shards)
+    flush_pairs(pairs, n_items, directory, shards)
+    return counts, sums, sums_sq
+
+
+def stream_similar_items(ratings, n=10, similarity=sim_distance, shards=16, chunk_size=100000, max_pairs=1000000,
+                         directory=None):
+    '''
+    Returns the same as calculate_similar_items(prefs, n, similarity) for prefs holding ratings, without building
+    prefs or its transposed copy (see the passes above). Memory holds the names, the statistics of max_pairs pairs
+    and one shard.
+    :param ratings: iterable of (user, item, rating), e.g. read_ratings()
+    :param n:
+    :param similarity: sim_distance, sim_pearson, or similarity_metrics.Metric or its name
+    :param shards: number of user and of pair shards, more shards use less memory in passes 2 and 3
+    :param chunk_size: ratings read at a time
+    :param max_pairs:
+    :param directory: where the shards are written (a temporary directory, removed at the end)
+    :return: dictionary item -> list of (similarity, other item)
+    '''
+    metric = batched_metric(similarity)
+    if metric is None:
+        raise ValueError('Streaming needs a similarity with a similarity_metrics.Metric, not %r' % similarity)
+
+    work = tempfile.mkdtemp(prefix='similar_items', dir=directory)
+    try:
+        users, items, user_ids, item_ids = write_user_shards(ratings, work, shards, chunk_size)
+        totals = write_pair_shards(work, shards, len(items), metric.center, max_pairs)
+
+        # items not co-rated with an item fill its list with similarity 0, largest names first like top_matches
+        by_name = sorted(xrange(len(items)), key=items.__getitem__, reverse=True)
+        result = {}
+        for s in xrange(shards):
+            records = read_records(os.path.join(work, 'pairs%d' % s))
+            stats = {}
+            for k in xrange(0, len(records), PAIR_RECORD):
+                i, j = int(records[k]), int(records[k + 1])
+                row = stats.setdefault(i, {})
+                p = row.get(j)
+                if p is None:
+                    row[j] = records[k + 2:k + PAIR_RECORD].tolist()
+                else:
+                    for v in xrange(6):
+                        p[v] += records[k + 2 + v]
+            del records
+
+            for i in xrange(s, len(items), shards):
+                row = stats.pop(i, {})
+                scores = [(metric.combine(p[0], p[1], p[2], p[3], p[4], p[5], totals, i, j), items[j])
+                          for j, p in row.iteritems()]
+                zeros = []
+                for j in by_name:
+                    if len(zeros) == n:
+                        break
+                    if j != i and j not in row:
+                        zeros.append((0.0, items[j]))
+                scores.extend(zeros)
+                result[items[i]] = heapq.nlargest(n, scores)
+        return result
+    finally:
+        shutil.rmtree(work)
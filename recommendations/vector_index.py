@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import heapq
+import random
+from math import sqrt
+from timeit import default_timer
+
+__author__ = 'goran'
+
+# Extra coordinate of the indexed vectors, see InnerProductIndex
+NORM = ('norm',)
+
+
+def dot(x, y):
+    '''
+    Inner product of sparse vectors x and y, dictionaries dimension -> value
+    :param x:
+    :param y:
+    :return:
+    '''
+    if len(x) > len(y):
+        x, y = y, x
+    return sum(value * y[d] for d, value in x.iteritems() if d in y)
+
+
+class InnerProductIndex:
+    '''
+    Approximate maximum inner product search over sparse vectors (dictionaries dimension -> value), an inverted file
+    (IVF) index. Every vector gets the extra coordinate NORM = sqrt(M^2 - |x|^2), where M is the largest norm, so all
+    have norm M and the largest inner product with a query (which has no NORM) is also the closest vector. The vectors
+    are then clustered by spherical k-means in lists clusters. A search scores the centroids against the query and
+    computes the exact inner products only for the vectors of the probes best clusters: about
+    lists + probes * len(vectors) / lists products instead of len(vectors). More probes give better recall and are
+    slower, with probes = lists the search is exact.
+    '''
+    def __init__(self, names, vectors, lists=None, probes=None, iterations=5, seed=0):
+        self.names = list(names)
+        self.ids = dict((name, i) for i, name in enumerate(self.names))
+        self.vectors = [dict(v) for v in vectors]
+        n = len(self.vectors)
+        self.lists = max(1, min(n, lists or int(sqrt(n))))
+        self.probes = probes or max(1, self.lists // 8)
+
+        norms = [sqrt(dot(v, v)) for v in self.vectors]
+        largest = max(norms) if norms else 0.0
+        for v, norm in zip(self.vectors, norms):
+            v[NORM] = sqrt(max(0.0, largest ** 2 - norm ** 2))
+
+        r = random.Random(seed)
+        self.centroids = [dict(self.vectors[i]) for i in r.sample(xrange(n), self.lists)] if n else []
+        self.members = []
+        for _ in xrange(iterations + 1):
+            self.members = [[] for _ in xrange(self.lists)]
+            for i, v in enumerate(self.vectors):
+                self.members[max(xrange(self.lists), key=lambda c: dot(v, self.centroids[c]))].append(i)
+            for c, members in enumerate(self.members):
+                if members:
+                    self.centroids[c] = self._centroid(members)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _centroid(self, members):
+        total = {}
+        for i in members:
+            for d, value in self.vectors[i].iteritems():
+                total[d] = total.get(d, 0.0) + value
+        norm = sqrt(dot(total, total))
+        return dict((d, value / norm) for d, value in total.iteritems()) if norm else total
+
+    def search(self, query, n=10, probes=None, exclude=()):
+        '''
+        Returns the (about) n largest (inner product, name) of query with the indexed vectors, from the largest
+        :param query: dictionary dimension -> value
+        :param n:
+        :param probes: clusters searched, self.probes if None
+        :param exclude: names left out
+        :return:
+        '''
+        probes = min(self.lists, probes or self.probes)
+        best = heapq.nlargest(probes, xrange(self.lists), key=lambda c: dot(query, self.centroids[c]))
+        return heapq.nlargest(n, ((dot(query, self.vectors[i]), self.names[i])
+                                  for c in best for i in self.members[c] if self.names[i] not in exclude))
+
+
+def factor_index(model, lists=None, probes=None, seed=0):
+    '''
+    Returns InnerProductIndex of the items of factorization.FactorModel model: item i is [b_i, q_i], so that its
+    inner product with factor_query(model, user) = [1, p_u] is its predicted rating minus mean + b_u
+    :param model:
+    :param lists:
+    :param probes:
+    :param seed:
+    :return:
+    '''
+    size = model.k + 1
+    vectors = [dict(enumerate(model.item_params[i * size:(i + 1) * size])) for i in xrange(len(model.items))]
+    return InnerProductIndex(model.items, vectors, lists, probes, seed=seed)
+
+
+def factor_query(model, user):
+    size = model.k + 1
+    u = model.user_ids[user]
+    query = dict(enumerate(model.user_params[u * size:(u + 1) * size]))
+    query[0] = 1.0
+    return query
+
+
+def factor_index_recommendation(index, model, user, top=10, probes=None):
+    '''
+    Approximate model.recommend(user, top) from factor_index index
+    :param index:
+    :param model:
+    :param user:
+    :param top:
+    :param probes:
+    :return:
+    '''
+    base = model.mean + model.user_params[model.user_ids[user] * (model.k + 1)]
+    return [(base + score, item) for score, item in
+            index.search(factor_query(model, user), top, probes, model.matrix[user])]
+
+
+def recall_report(index, queries, exact, n=10, probes=(1, 2, 4, 8)):
+    '''
+    Returns for every number of probes the recall of the top n (the share of the exact results found) and the
+    milliseconds per query
+    :param index:
+    :param queries: list of arguments of search (query, exclude)
+    :param exact: function of a query giving its exact top n names
+    :param n:
+    :param probes:
+    :return: list of (probes, recall, milliseconds)
+    '''
+    truth = [set(exact(query, exclude)) for query, exclude in queries]
+    report = []
+    for p in probes:
+        start = default_timer()
+        found = [set(name for score, name in index.search(query, n, p, exclude)) for query, exclude in queries]
+        seconds = default_timer() - start
+        hits = sum(len(f & t) for f, t in zip(found, truth))
+        report.append((p, 1.0 * hits / max(1, sum(len(t) for t in truth)), 1000 * seconds / max(1, len(queries))))
+    return report
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'goran'
+
+# Regression tests, run from the repository root with: python -m unittest discover -s tests -t .
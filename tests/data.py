@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import atexit
+import os
+import shutil
+import tempfile
+
+from benchmarks.synthetic import write_movielens, write_news
+
+__author__ = 'goran'
+
+# Small synthetic corpora for the tests (see benchmarks.synthetic), written to a temporary directory once per process
+
+
+_directory = None
+
+
+def directory():
+    global _directory
+    if _directory is None:
+        _directory = tempfile.mkdtemp(prefix='tests')
+        atexit.register(cleanup)
+    return _directory
+
+
+def news_path(documents=150, seed=0):
+    '''
+    Returns path of a synthetic news file with the given number of documents, in the format of news.txt
+    :param documents:
+    :param seed:
+    :return:
+    '''
+    path = os.path.join(directory(), 'news_%d_%d.txt' % (documents, seed))
+    if not os.path.exists(path):
+        write_news(path, documents=documents, vocabulary=400, words_per_document=10, topics=12, seed=seed)
+    return path
+
+
+def movielens_path(users=60, items=120, seed=0):
+    '''
+    Returns directory with synthetic ratings in the MovieLens 100k format (u.item and u.data)
+    :param users:
+    :param items:
+    :param seed:
+    :return:
+    '''
+    path = os.path.join(directory(), 'movielens_%d_%d_%d' % (users, items, seed))
+    if not os.path.exists(path):
+        os.mkdir(path)
+        write_movielens(path, users=users, items=items, ratings_per_user=20, seed=seed)
+    return path
+
+
+def cleanup():
+    global _directory
+    if _directory is not None:
+        shutil.rmtree(_directory, ignore_errors=True)
+        _directory = None
+
+
+def partition(clusters):
+    '''
+    Returns the clusters as sorted list of sorted tuples of document ids, for comparing clusterings
+    :param clusters:
+    :return:
+    '''
+    return sorted(tuple(sorted(d.id for d in documents(c))) for c in clusters)
+
+
+def documents(cluster):
+    '''
+    Documents of cluster, for the Dendrogram views and the BiCluster objects of HAC_news alike
+    :param cluster:
+    :return:
+    '''
+    if hasattr(cluster, 'documents'):
+        return list(cluster.documents())
+    stack, result = [cluster], []
+    while stack:
+        c = stack.pop()
+        if c.left is None:
+            result.append(c)
+        else:
+            stack.extend((c.right, c.left))
+    return result
+
+
+def merge_similarities(clusters):
+    '''
+    Returns the sorted similarities of all merges in clusters
+    :param clusters:
+    :return:
+    '''
+    result = []
+    stack = list(clusters)
+    while stack:
+        c = stack.pop()
+        if c.left is not None:
+            result.append(c.similarity)
+            stack.extend((c.left, c.right))
+    return sorted(result)
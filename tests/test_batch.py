@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from recommendations.batch import NeighborMatrix, recommend_all, recommend_rows, user_chunks
+from recommendations.rating_matrix import rating_matrix
+from recommendations import recommend
+from tests.data import directory, movielens_path
+
+__author__ = 'goran'
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.items_sim = recommend.calculate_similar_items(self.prefs, n=10)
+
+    def expected(self, n):
+        return [(user, recommend.item_based_recommendation(self.prefs, self.items_sim, user, top=n))
+                for user in rating_matrix(self.prefs).users]
+
+    def test_recommend_rows(self):
+        matrix = rating_matrix(self.prefs)
+        rows = recommend_rows(matrix, NeighborMatrix(self.items_sim, matrix.items), xrange(len(matrix)), 5)
+        self.assertEqual(zip(matrix.users, rows), self.expected(5))
+
+    def test_recommend_all(self):
+        path = os.path.join(directory(), 'recommendations.txt')
+        lines = ['%s\t%s\t%r\n' % (user, item, score) for user, rankings in self.expected(5)
+                 for score, item in rankings]
+        for workers, window in ((1, None), (2, None), (2, 1)):
+            self.assertEqual(recommend_all(self.prefs, self.items_sim, path, n=5, workers=workers, chunk_size=7,
+                                           window=window), len(self.prefs))
+            with open(path) as r:
+                self.assertEqual(r.readlines(), lines)
+
+    def test_user_chunks(self):
+        neighbors = NeighborMatrix(self.items_sim)
+        chunks = list(user_chunks(self.prefs, neighbors, 25))
+        self.assertEqual([len(chunk) for chunk in chunks], [25, 25, 10])
+        self.assertEqual([user for chunk in chunks for user in chunk.users], list(self.prefs))
+        chunk = chunks[1]
+        for u, user in enumerate(chunk.users):
+            ratings = dict((neighbors.items[chunk.indices[k]], chunk.ratings[k])
+                           for k in xrange(chunk.indptr[u], chunk.indptr[u + 1]))
+            self.assertEqual(ratings, self.prefs[user])
+
+
+if __name__ == '__main__':
+    unittest.main()
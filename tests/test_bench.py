@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from benchmarks.bench import compare, exponents, run, timed
+from benchmarks.synthetic import write_news
+from exams import HAC_news
+from recommendations.recommend import loadMovieLens
+from tests.data import directory, movielens_path, news_path
+
+__author__ = 'goran'
+
+
+class SyntheticTest(unittest.TestCase):
+    def test_news(self):
+        data = HAC_news.load_data(news_path(50))
+        self.assertEqual(len(data), 50)
+        self.assertTrue(all(len(c.words) == 10 for c in data))
+
+        path = os.path.join(directory(), 'same_seed.txt')
+        write_news(path, documents=50, vocabulary=400, words_per_document=10, topics=12)
+        self.assertEqual(open(path).read(), open(news_path(50)).read())
+
+    def test_movielens(self):
+        prefs = loadMovieLens(movielens_path())
+        self.assertEqual(len(prefs), 60)
+        self.assertTrue(all(1 <= rating <= 5 for ratings in prefs.itervalues() for rating in ratings.itervalues()))
+
+
+class BenchTest(unittest.TestCase):
+    def test_exponents(self):
+        results = [{'name': 'square', 'n': n, 'seconds': 1e-4 * n * n} for n in (10, 20, 40)]
+        results += [{'name': 'fast', 'n': n, 'seconds': 1e-5} for n in (10, 20, 40)]
+        fitted = exponents(results)
+        self.assertEqual(fitted.keys(), ['square'])
+        self.assertAlmostEqual(fitted['square'], 2.0)
+
+    def test_compare(self):
+        old = {'results': [{'name': 'a', 'n': 10, 'seconds': 2.0}, {'name': 'b', 'n': 10, 'seconds': 1.0}]}
+        new = {'results': [{'name': 'a', 'n': 10, 'seconds': 1.0}, {'name': 'c', 'n': 10, 'seconds': 1.0}]}
+        lines = compare(old, new)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('a ') and lines[0].endswith('x0.50'))
+
+    def test_timed(self):
+        def noisy():
+            print 'dropped'
+            return 42
+        seconds, result = timed(noisy, repeat=2)
+        self.assertEqual(result, 42)
+        self.assertTrue(seconds >= 0)
+
+    def test_run(self):
+        report = run(news_sizes=(30,), ratings_sizes=(20,))
+        names = set(r['name'] for r in report['results'])
+        self.assertTrue('news.hierarchical_clustering' in names and 'ratings.top_matches.per_pair' in names)
+        self.assertEqual(report['settings']['news_sizes'], [30])
+
+
+if __name__ == '__main__':
+    unittest.main()
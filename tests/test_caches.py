@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import ctypes
+import os
+import shutil
+import unittest
+
+from exams import optimized_HAC_news as hac
+from exams.corpus_cache import cached_corpus, load_corpus
+from recommendations.rating_matrix import RatingMatrix
+from recommendations.ratings_cache import cached_ratings, corpus_from_prefs, load_ratings
+from recommendations.recommend import critics, loadMovieLens
+from tests.data import directory, movielens_path, news_path
+
+__author__ = 'goran'
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+class CorpusCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.source = os.path.join(directory(), 'cached_news.txt')
+        shutil.copy(news_path(60), self.source)
+        if os.path.exists(self.source + '.cache'):
+            os.remove(self.source + '.cache')
+
+    def test_round_trip(self):
+        matrix, titles = cached_corpus(self.source)
+        self.assertTrue(os.path.exists(self.source + '.cache'))
+        cached, cached_titles = load_corpus(self.source + '.cache', self.source)
+        self.assertEqual(list(cached_titles), titles)
+        self.assertEqual(list(cached.vocabulary.words), matrix.vocabulary.words)
+        for name in ('indptr', 'indices', 'data', 'norms'):
+            self.assertEqual(list(getattr(cached, name)), list(getattr(matrix, name)))
+        self.assertTrue(isinstance(cached.data, ctypes.Array))
+
+    def test_load_data(self):
+        expected = hac.load_data(self.source)
+        for c in (hac.load_data(self.source, cache=True), hac.load_data(self.source, cache=True)):
+            self.assertEqual([d.title for d in c], [d.title for d in expected])
+            self.assertEqual([hac.cluster_words(d) for d in c], [hac.cluster_words(d) for d in expected])
+
+    def test_stale(self):
+        cached_corpus(self.source)
+        touch(self.source)
+        self.assertEqual(load_corpus(self.source + '.cache', self.source), None)
+        cached_corpus(self.source)
+        self.assertNotEqual(load_corpus(self.source + '.cache', self.source), None)
+
+
+class RatingsCacheTest(unittest.TestCase):
+    def test_corpus_from_prefs(self):
+        self.assertEqual(corpus_from_prefs(critics).prefs(), critics)
+
+    def test_round_trip(self):
+        path = movielens_path()
+        cache = os.path.join(path, 'u.data.cache')
+        if os.path.exists(cache):
+            os.remove(cache)
+        expected = loadMovieLens(path)
+        for matrix in (loadMovieLens(path, cache=True), loadMovieLens(path, cache=True)):
+            self.assertTrue(isinstance(matrix, RatingMatrix))
+            self.assertEqual(dict(matrix.iteritems()), expected)
+        self.assertEqual(loadMovieLens(path, cache=True, as_dict=True), expected)
+
+    def test_mapped(self):
+        # the cached ratings are read in place from the mapped file, not copied into new arrays
+        path = movielens_path()
+        loadMovieLens(path, cache=True)
+        matrix = loadMovieLens(path, cache=True)
+        self.assertTrue(isinstance(matrix.ratings, ctypes.Array))
+        self.assertEqual(sorted(matrix['1'].items()), sorted(loadMovieLens(path)['1'].items()))
+
+    def test_stale(self):
+        sources = [os.path.join(directory(), name) for name in ('a.txt', 'b.txt')]
+        for source in sources:
+            open(source, 'w').close()
+        path = os.path.join(directory(), 'critics.cache')
+        loads = []
+        load = lambda: loads.append(1) or critics
+        self.assertEqual(cached_ratings(load, sources, path).prefs(), critics)
+        self.assertEqual(cached_ratings(load, sources, path).prefs(), critics)
+        self.assertEqual(len(loads), 1)
+        touch(sources[1])
+        self.assertEqual(load_ratings(path, sources), None)
+        cached_ratings(load, sources, path)
+        self.assertEqual(len(loads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
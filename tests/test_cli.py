@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from cStringIO import StringIO
+import os
+import subprocess
+import sys
+import unittest
+
+import cli
+from exams import optimized_HAC_news as hac
+from recommendations import recommend
+from tests.data import directory, movielens_path, news_path
+
+__author__ = 'goran'
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(*argv):
+    '''
+    Runs cli.main with argv, returns what it printed to stdout and stderr
+    '''
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = StringIO(), StringIO()
+    try:
+        cli.main(list(argv))
+        return sys.stdout.getvalue(), sys.stderr.getvalue()
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+class ImportTest(unittest.TestCase):
+    def test_no_side_effects(self):
+        for module in ('exams.HAC_news', 'exams.optimized_HAC_news', 'recommendations.recommend', 'cli'):
+            output = subprocess.check_output([sys.executable, '-c', 'import %s' % module], cwd=ROOT,
+                                             stderr=subprocess.STDOUT)
+            self.assertEqual(output, '', module)
+
+    def test_cli_imports_lazily(self):
+        output = subprocess.check_output([sys.executable, '-c', 'import sys, cli; cli.parser(); '
+                                          'print sorted(m for m, module in sys.modules.items() if module is not None and '
+                                          'm.split(".")[0] in ("exams", "recommendations"))'], cwd=ROOT)
+        self.assertEqual(output.strip(), "['exams', 'exams.linkage']")
+
+
+class CommandsTest(unittest.TestCase):
+    def test_cluster(self):
+        output = os.path.join(directory(), 'clusters.txt')
+        expected = os.path.join(directory(), 'expected_clusters.txt')
+        for algorithm, function in [('heap', hac.hierarchical_clustering), ('nn_chain', hac.nn_chain_clustering)]:
+            run('cluster', '--input', news_path(60), '--output', output, '--algorithm', algorithm)
+            stdout, sys.stdout = sys.stdout, StringIO()
+            try:
+                hac.write_clusters(expected, function(hac.load_data(news_path(60))))
+            finally:
+                sys.stdout = stdout
+            self.assertEqual(open(output).read(), open(expected).read())
+
+    def test_cluster_linkage(self):
+        self.assertRaises(SystemExit, run, 'cluster', '--algorithm', 'nn_chain', '--linkage', 'centroid')
+        self.assertRaises(SystemExit, run, 'cluster', '--linkage', 'median')
+        self.assertRaises(SystemExit, run, 'cluster', '--unknown')
+
+    def test_stats(self):
+        stdout, stderr = run('cluster', '--input', news_path(60), '--output', os.path.join(directory(), 'stats.txt'),
+                             '--stats')
+        self.assertTrue('merge_loop' in stdout)
+
+    def test_recommend(self):
+        prefs = recommend.loadMovieLens(movielens_path())
+        user = sorted(prefs)[0]
+        items_sim = recommend.calculate_similar_items(prefs, n=50)
+        expected = ''.join('%s\t%s\t%f\n' % (user, item, score)
+                           for score, item in recommend.item_based_recommendation(prefs, items_sim, user, top=5))
+
+        stdout, stderr = run('recommend', '--data', movielens_path(), '--user', user, '-n', '5')
+        self.assertEqual(stdout, expected)
+
+        model = os.path.join(directory(), 'cli.model')
+        run('build-model', '--data', movielens_path(), '--output', model)
+        stdout, stderr = run('recommend', '--data', movielens_path(), '--model', model, '--user', user, '-n', '5',
+                             '--user', 'nobody')
+        self.assertEqual(stdout, expected)
+        self.assertEqual(stderr, 'Unknown user nobody\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams.condensed import CondensedMatrix
+from exams import optimized_HAC_news as hac
+from tests.data import merge_similarities, news_path, partition
+
+__author__ = 'goran'
+
+
+class CondensedMatrixTest(unittest.TestCase):
+    def test_layout(self):
+        n = 6
+        m = CondensedMatrix(n)
+        self.assertEqual(len(m.values), n * (n - 1) // 2)
+        self.assertEqual([m.index(i, j) for i in xrange(n) for j in xrange(i + 1, n)], range(len(m.values)))
+        self.assertRaises(IndexError, m.index, 2, 2)
+
+    def test_symmetric(self):
+        m = CondensedMatrix(5)
+        m.set(3, 1, 0.25)
+        self.assertEqual(m.get(1, 3), 0.25)
+        row = m.row(3)
+        self.assertEqual(list(row), [0.0, 0.25, 0.0, 1.0, 0.0])
+        row[4] = 0.5
+        self.assertEqual(m.get(4, 3), 0.5)
+
+    def test_set_upper_row(self):
+        for shared in (False, True):
+            m = CondensedMatrix(5, shared=shared)
+            m.set_upper_row(1, [0.1, 0.2, 0.3])
+            self.assertEqual([m.get(1, j) for j in (0, 2, 3, 4)], [0.0, 0.1, 0.2, 0.3])
+            self.assertEqual(m.get(2, 3), 0.0)
+
+    def test_float32(self):
+        m = CondensedMatrix(100, 'f')
+        self.assertEqual(m.nbytes() * 2, CondensedMatrix(100).nbytes())
+        m.set(0, 1, 0.1)
+        self.assertAlmostEqual(m.get(0, 1), 0.1, places=6)
+
+    def test_float32_clustering(self):
+        data = hac.load_data(news_path(120))
+        expected = hac.hierarchical_clustering(data)
+        clusters = hac.hierarchical_clustering(data, typecode='f')
+        self.assertEqual(partition(clusters), partition(expected))
+        for a, b in zip(merge_similarities(clusters), merge_similarities(expected)):
+            self.assertAlmostEqual(a, b, places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams import HAC_news
+from exams.dendrogram import BiCluster, Dendrogram, merge_key_words
+from exams import optimized_HAC_news as hac
+from tests.data import news_path
+
+__author__ = 'goran'
+
+
+def reference_clusters(clusters):
+    '''
+    Dictionary from the sorted document ids of every cluster of HAC_news (merged clusters included) to the cluster
+    '''
+    result = {}
+    stack = list(clusters)
+    while stack:
+        c = stack.pop()
+        documents, todo = [], [c]
+        while todo:
+            x = todo.pop()
+            if x.left is None:
+                documents.append(x.id)
+            else:
+                todo.extend((x.left, x.right))
+        result[tuple(sorted(documents))] = c
+        if c.left is not None:
+            stack.extend((c.left, c.right))
+    return result
+
+
+class DendrogramTest(unittest.TestCase):
+    def setUp(self):
+        self.tree = Dendrogram()
+        self.words = [{'a': 1.0, 'b': 2.0}, {'b': 4.0}, {'c': 3.0}, {'a': 5.0, 'c': 1.0}]
+        self.leaves = [self.tree.add_document('doc %d' % i, None, words=w) for i, w in enumerate(self.words)]
+        a, b, c, d = self.leaves
+        self.ab = self.tree.merge(a, b, 0.5)
+        self.cd = self.tree.merge(c, d, 0.4)
+        self.root = self.tree.merge(self.ab, self.cd, 0.1)
+
+    def test_views(self):
+        self.assertEqual([self.ab.id, self.cd.id, self.root.id], [-1, -2, -3])
+        self.assertEqual((self.root.left, self.root.right), (self.ab, self.cd))
+        self.assertEqual(BiCluster(self.tree, self.root.node), self.root)
+        self.assertEqual(len(set([self.root, BiCluster(self.tree, self.root.node), self.ab])), 2)
+        self.assertEqual([self.root.size, self.root.similarity, self.root.title, self.root.words], [4, 0.1, None, None])
+        self.assertEqual([self.leaves[0].left, self.leaves[0].similarity, self.leaves[0].title], [None, 1.0, 'doc 0'])
+        self.assertEqual([d.id for d in self.root.documents()], [0, 1, 2, 3])
+        self.assertEqual(self.tree.linkage_matrix(), [(0, 1, 0.5, 2), (2, 3, 0.4, 2), (4, 5, 0.1, 4)])
+        self.assertEqual(len(self.tree), 7)
+
+    def test_centroid(self):
+        ab = merge_key_words(self.words[0], self.words[1], 1, 1)
+        cd = merge_key_words(self.words[2], self.words[3], 1, 1)
+        expected = merge_key_words(ab, cd, 2, 2)
+        centroid = self.tree.centroid(self.root.node)
+        self.assertEqual(sorted(centroid), sorted(expected))
+        for word in expected:
+            self.assertAlmostEqual(centroid[word], expected[word])
+        self.assertEqual(sorted(self.tree.words), [0, 1, 2, 3])
+
+    def test_no_documents_after_merge(self):
+        self.assertRaises(ValueError, self.tree.add_document, 'late', None)
+
+    def test_same_as_original(self):
+        path = news_path(120)
+        expected = reference_clusters(HAC_news.hierarchical_clustering(HAC_news.load_data(path)))
+        clusters = hac.hierarchical_clustering(hac.load_data(path))
+        stack = list(clusters)
+        while stack:
+            view = stack.pop()
+            if view.left is not None:
+                stack.extend((view.left, view.right))
+            reference = expected[tuple(sorted(d.id for d in view.documents()))]
+            words = hac.cluster_words(view)
+            self.assertEqual(sorted(words), sorted(reference.words))
+            for word in words:
+                self.assertAlmostEqual(words[word], reference.words[word])
+            self.assertAlmostEqual(view.similarity, reference.similarity)
+
+
+if __name__ == '__main__':
+    unittest.main()
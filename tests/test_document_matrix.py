@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from exams.document_matrix import DocumentMatrix, Vocabulary, build_document_matrix
+from exams.news_reader import parse_word_ratings
+from exams.optimized_HAC_news import module, scalar, sim_fun
+
+__author__ = 'goran'
+
+
+def random_documents(n, words=40, per_document=8, seed=0):
+    r = random.Random(seed)
+    vocabulary = ['w%d' % i for i in xrange(words)]
+    return [dict((w, round(r.uniform(0.1, 5.0), 3)) for w in r.sample(vocabulary, r.randint(1, per_document)))
+            for _ in xrange(n)]
+
+
+class DocumentMatrixTest(unittest.TestCase):
+    '''
+    The sparse engine against the scalar sim_fun of the HAC modules
+    '''
+    def setUp(self):
+        self.documents = random_documents(30)
+        # an empty document in the middle and at the end, sim_fun itself divides by zero for them
+        self.documents.insert(7, {})
+        self.documents.append({})
+        self.matrix = DocumentMatrix()
+        for words in self.documents:
+            self.matrix.add_row(words)
+
+    def expected(self, r, c):
+        if not self.documents[r] or not self.documents[c]:
+            return 0.0
+        return sim_fun(self.documents[r], self.documents[c])
+
+    def test_rows_back(self):
+        for r, words in enumerate(self.documents):
+            self.assertEqual(self.matrix.row_words(r), words)
+            self.assertAlmostEqual(self.matrix.norms[r], module(words) if words else 0.0)
+
+    def test_similarity(self):
+        n = len(self.documents)
+        for r in xrange(n):
+            for c in xrange(n):
+                self.assertAlmostEqual(self.matrix.similarity(r, c), self.expected(r, c))
+
+    def test_similarity_row(self):
+        n = len(self.documents)
+        for r in xrange(n):
+            sims = self.matrix.similarity_row(r)
+            self.assertEqual(len(sims), n)
+            for c in xrange(n):
+                self.assertAlmostEqual(sims[c], self.expected(r, c))
+
+    def test_similarity_row_from_first(self):
+        sims = self.matrix.similarity_row(3, 10)
+        self.assertEqual(list(sims[:10]), [0.0] * 10)
+        for c in xrange(10, len(self.documents)):
+            self.assertAlmostEqual(sims[c], self.expected(3, c))
+
+    def test_upper_similarities(self):
+        n = len(self.documents)
+        rows = list(self.matrix.upper_similarities())
+        self.assertEqual([r for r, sims in rows], range(n))
+        for r, sims in rows:
+            self.assertEqual(len(sims), n - r - 1)
+            for k, value in enumerate(sims):
+                self.assertAlmostEqual(value, self.expected(r, r + 1 + k))
+
+    def test_similarity_block(self):
+        block = self.matrix.similarity_block([0, 7, 12], [1, 7, 30])
+        for row, r in zip(block, [0, 7, 12]):
+            for value, c in zip(row, [1, 7, 30]):
+                self.assertAlmostEqual(value, self.expected(r, c))
+
+    def test_dot_row(self):
+        dots = self.matrix.dot_row(5)
+        for c, words in enumerate(self.documents):
+            self.assertAlmostEqual(dots[c], scalar(self.documents[5], words))
+
+    def test_vectors_of_another_vocabulary(self):
+        vocabulary = Vocabulary()
+        vectors = [parse_word_ratings('b(2.0) c(1.5)\n', vocabulary), parse_word_ratings('a(1.0) b(3.0)\n', vocabulary)]
+        matrix = DocumentMatrix()
+        matrix.add_row({'c': 4.0})
+        for vector in vectors:
+            matrix.add_vector(vector)
+        self.assertEqual(matrix.row_words(1), {'b': 2.0, 'c': 1.5})
+        self.assertEqual(matrix.row_words(2), {'a': 1.0, 'b': 3.0})
+        self.assertAlmostEqual(matrix.similarity(0, 1), sim_fun({'c': 4.0}, {'b': 2.0, 'c': 1.5}))
+
+    def test_build_document_matrix(self):
+        class Leaf:
+            def __init__(self, words):
+                self.words = words
+                self.vector = None
+        matrix = build_document_matrix([Leaf(words) for words in self.documents])
+        for r in xrange(len(self.documents)):
+            self.assertAlmostEqual(matrix.similarity(r, 3), self.expected(r, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from recommendations.factorization import (cholesky_solve, compare_rmse, factor_recommendation, rmse, split_prefs,
+                                           train_als, train_sgd)
+from recommendations import factorization, recommend
+from tests.data import movielens_path
+
+__author__ = 'goran'
+
+
+class FactorizationTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.ratings = [(user, item, rating) for user in sorted(self.prefs)
+                        for item, rating in sorted(self.prefs[user].iteritems())]
+        self.mean = sum(rating for user, item, rating in self.ratings) / len(self.ratings)
+
+    def training_rmse(self, model):
+        return rmse([model.predict(user, item) for user, item, rating in self.ratings], self.ratings)
+
+    def test_cholesky_solve(self):
+        a = [[4.0, 2.0, 0.6], [2.0, 5.0, 1.0], [0.6, 1.0, 3.0]]
+        x = cholesky_solve(a, [1.0, 2.0, 3.0])
+        for row, b in zip(a, [1.0, 2.0, 3.0]):
+            self.assertAlmostEqual(sum(v * y for v, y in zip(row, x)), b)
+
+    def test_als_fits(self):
+        model = train_als(self.prefs, k=3, iterations=5)
+        self.assertTrue(self.training_rmse(model) < rmse([self.mean] * len(self.ratings), self.ratings))
+
+    def test_als_workers(self):
+        single = train_als(self.prefs, k=3, iterations=3, chunk_size=7)
+        pooled = train_als(self.prefs, k=3, iterations=3, chunk_size=7, workers=2)
+        self.assertEqual(list(pooled.user_params), list(single.user_params))
+        self.assertEqual(list(pooled.item_params), list(single.item_params))
+
+    def test_als_in_process(self):
+        # training in this process leaves the worker global alone, so it can not redirect a pool set up before
+        train_als(self.prefs, k=2, iterations=1)
+        self.assertEqual(factorization._rows, None)
+
+    def test_sgd_fits(self):
+        model = train_sgd(self.prefs, k=3, iterations=10)
+        self.assertTrue(self.training_rmse(model) < rmse([self.mean] * len(self.ratings), self.ratings))
+
+    def test_recommend(self):
+        model = train_als(self.prefs, k=3, iterations=2)
+        user = sorted(self.prefs)[0]
+        scores = model.scores(user)
+        for i, item in enumerate(model.items[:20]):
+            self.assertAlmostEqual(scores[i], model.predict(user, item))
+
+        ranking = factor_recommendation(self.prefs, model, user, top=5)
+        self.assertEqual(ranking, model.recommend(user)[:5])
+        self.assertTrue(all(item not in self.prefs[user] for score, item in model.recommend(user)))
+        self.assertEqual(len(model.recommend(user)), len(model.items) - len(self.prefs[user]))
+        self.assertAlmostEqual(model.predict('nobody', 'nothing'), model.mean)
+
+    def test_split_prefs(self):
+        train, test = split_prefs(self.prefs, 0.25)
+        self.assertTrue(0 < len(test) < len(self.ratings))
+        split = [(user, item, rating) for user in train for item, rating in train[user].iteritems()] + test
+        self.assertEqual(sorted(split), self.ratings)
+
+    def test_compare_rmse(self):
+        results = compare_rmse(self.prefs, k=3, iterations=3, neighbors=10)
+        self.assertEqual(sorted(results), ['als', 'item_based', 'mean', 'sgd', 'user_based'])
+        self.assertTrue(all(0 <= coverage <= 1 for error, coverage in results.itervalues()))
+
+
+if __name__ == '__main__':
+    unittest.main()
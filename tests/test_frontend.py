@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from recommendations.frontend import BatchingFrontend, load_test
+from recommendations import recommend
+from tests.data import movielens_path
+
+__author__ = 'goran'
+
+
+class BatchingFrontendTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.items_sim = recommend.calculate_similar_items(self.prefs, n=10)
+        self.users = sorted(self.prefs)
+        self.frontends = []
+
+    def tearDown(self):
+        for frontend in self.frontends:
+            frontend.close()
+
+    def frontend(self, prefs, items_sim, **options):
+        frontend = BatchingFrontend(prefs, items_sim, **options)
+        self.frontends.append(frontend)
+        return frontend
+
+    def test_same_as_recommend(self):
+        for workers in (1, 2):
+            frontend = self.frontend(self.prefs, self.items_sim, n=10, window=0.01, workers=workers)
+            pending = [(user, frontend.submit(user, 5)) for user in self.users]
+            for user, result in pending:
+                self.assertEqual(result.result(10),
+                                 recommend.item_based_recommendation(self.prefs, self.items_sim, user, top=5))
+            stats = frontend.stats()
+            self.assertEqual(stats['served'], len(self.users))
+            self.assertTrue(stats['batches'] < len(self.users))
+
+    def test_unknown_user(self):
+        frontend = self.frontend(self.prefs, self.items_sim)
+        self.assertRaises(KeyError, frontend.recommend, 'nobody', timeout=10)
+
+    def test_independent_frontends(self):
+        # two front ends in one process each answer from their own ratings
+        other = dict((user, dict(ratings)) for user, ratings in self.prefs.iteritems() if user in self.users[:20])
+        other_sim = recommend.calculate_similar_items(other, n=5)
+        first = self.frontend(self.prefs, self.items_sim, workers=1)
+        second = self.frontend(other, other_sim, workers=1)
+        for user in self.users[:20]:
+            self.assertEqual(second.recommend(user, timeout=10),
+                             recommend.item_based_recommendation(other, other_sim, user, top=10))
+            self.assertEqual(first.recommend(user, timeout=10),
+                             recommend.item_based_recommendation(self.prefs, self.items_sim, user, top=10))
+
+    def test_load_test(self):
+        frontend = self.frontend(self.prefs, self.items_sim, window=0.002, max_batch=8)
+        result = load_test(frontend, self.users, clients=4, requests_per_client=10)
+        self.assertEqual(result['served'], 40)
+        self.assertTrue(result['max_batch_size'] <= 8)
+        self.assertTrue(result['requests_per_second'] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams import HAC_news
+from exams import optimized_HAC_news as hac
+from tests.data import merge_similarities, news_path, partition
+
+__author__ = 'goran'
+
+
+class HeapClusteringTest(unittest.TestCase):
+    '''
+    The heap with lazy deletion against the original clustering of HAC_news, which searches all pairs for every merge
+    '''
+    def test_same_as_original(self):
+        path = news_path(120)
+        expected = HAC_news.hierarchical_clustering(HAC_news.load_data(path))
+        clusters = hac.hierarchical_clustering(hac.load_data(path))
+        self.assertEqual(partition(clusters), partition(expected))
+        for a, b in zip(merge_similarities(clusters), merge_similarities(expected)):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual([c.size for c in clusters], [c.size for c in expected])
+
+    def test_merges_only_above_min_closeness(self):
+        clusters = hac.hierarchical_clustering(hac.load_data(news_path(120)), min_closeness=0.6)
+        self.assertTrue(all(s >= 0.6 for s in merge_similarities(clusters)))
+        self.assertEqual(sum(c.size for c in clusters), 120)
+
+    def test_no_merges(self):
+        clusters = hac.hierarchical_clustering(hac.load_data(news_path(40)), min_closeness=100.0)
+        self.assertEqual(len(clusters), 40)
+        self.assertEqual(partition(clusters), [(i,) for i in xrange(40)])
+
+
+if __name__ == '__main__':
+    unittest.main()
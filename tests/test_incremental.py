@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from exams.incremental import IncrementalClustering, load_incremental
+from exams import optimized_HAC_news as hac
+from tests.data import directory, merge_similarities, news_path, partition
+
+__author__ = 'goran'
+
+
+class IncrementalClusteringTest(unittest.TestCase):
+    def setUp(self):
+        self.data = hac.load_data(news_path(120))
+        self.first, self.second = self.data[:80], self.data[80:]
+
+    def test_first_batch(self):
+        state = IncrementalClustering()
+        report = state.add_documents(self.first)
+        self.assertEqual((report['routed'], report['unrouted'], report['regions']), (0, 80, 1))
+        self.assertEqual(partition(state.clusters.values()), partition(hac.hierarchical_clustering(self.first)))
+
+    def test_next_batch(self):
+        state = IncrementalClustering()
+        state.add_documents(self.first)
+        report = state.add_documents(self.second)
+        self.assertEqual(report['routed'] + report['unrouted'], 40)
+        self.assertTrue(report['routed'] > 0)
+        self.assertEqual(len(state), 120)
+        self.assertEqual(sorted(d for c in partition(state.clusters.values()) for d in c), range(120))
+
+        sizes = [c.size for c in state.sorted_clusters()]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+
+        # every centroid is the mean of the key words of its documents
+        for key, cluster in state.clusters.iteritems():
+            words, module = state.centroids[key]
+            expected = cluster.tree.centroid(cluster.node)
+            self.assertEqual(sorted(state.matrix.vocabulary.words[w] for w in words), sorted(expected))
+            for w, rating in words.iteritems():
+                self.assertAlmostEqual(rating, expected[state.matrix.vocabulary.words[w]])
+            self.assertAlmostEqual(module, hac.module(expected))
+            self.assertTrue(all(key in state.index[w] for w in words))
+
+    def test_zero_ratings(self):
+        # a document whose ratings are all 0 has module 0, and so has the centroid of a cluster of only such documents
+        path = os.path.join(directory(), 'zero_news.txt')
+        with open(path, 'w') as w:
+            w.write('a\nx(0.0)\n\nb\nx(0.0)\n\nc\nx(1.0)\n\n')
+        zeros = hac.load_data(path)
+        state = IncrementalClustering()
+        state.add_documents(self.first + zeros[:1])
+        self.assertTrue(any(module == 0 for words, module in state.centroids.values()))
+        report = state.add_documents(zeros[1:] + self.second)
+        self.assertEqual(report['routed'] + report['unrouted'], 42)
+        self.assertEqual(sorted(d for c in partition(state.clusters.values()) for d in c), range(123))
+
+    def test_rebuild(self):
+        state = IncrementalClustering(rebuild_every=2)
+        self.assertFalse(state.add_documents(self.first)['rebuilt'])
+        self.assertTrue(state.add_documents(self.second)['rebuilt'])
+        self.assertEqual(state.batches, 0)
+        self.assertEqual(partition(state.clusters.values()), partition(hac.hierarchical_clustering(self.data)))
+
+    def test_save_load(self):
+        path = os.path.join(directory(), 'news.state')
+        state = IncrementalClustering(0.5, 'average', 3)
+        state.add_documents(self.first[:50])
+        state.add_documents(self.first[50:])
+        state.save(path)
+        loaded = load_incremental(path)
+
+        self.assertEqual((loaded.min_closeness, loaded.linkage, loaded.rebuild_every, loaded.batches),
+                         (0.5, 'average', 3, 2))
+        self.assertEqual(partition(loaded.clusters.values()), partition(state.clusters.values()))
+        self.assertEqual(sorted(loaded.centroids.values()), sorted(state.centroids.values()))
+        self.assertEqual(list(loaded.documents.titles), list(state.documents.titles))
+        self.assertEqual(merge_similarities(loaded.clusters.values()), merge_similarities(state.clusters.values()))
+
+        self.assertEqual(loaded.add_documents(self.second), state.add_documents(self.second))
+        self.assertEqual(partition(loaded.clusters.values()), partition(state.clusters.values()))
+
+    def test_load_other_file(self):
+        path = os.path.join(directory(), 'not_a_state')
+        with open(path, 'wb') as w:
+            w.write('x' * 100)
+        self.assertRaises(ValueError, load_incremental, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
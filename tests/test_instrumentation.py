@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from cStringIO import StringIO
+import unittest
+
+from exams.instrumentation import ClusteringStats, progress_printer
+from exams import optimized_HAC_news as hac
+from tests.data import news_path, partition
+
+__author__ = 'goran'
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        self.data = hac.load_data(news_path(120))
+        self.n = len(self.data)
+
+    def test_counters(self):
+        stats = ClusteringStats()
+        clusters = hac.hierarchical_clustering(self.data, stats=stats)
+        self.assertEqual(partition(clusters), partition(hac.hierarchical_clustering(self.data)))
+
+        merges = self.n - len(clusters)
+        loop = stats.counters['merge_loop']
+        self.assertEqual(stats.phases, ['similarities', 'heap', 'merge_loop'])
+        self.assertEqual(loop['merges'], merges)
+        self.assertEqual(loop['pops'], loop['merges'] + loop['stale'])
+        # every pushed entry is popped or left in the heap at the end, which counts as popped
+        self.assertEqual(stats.total('pushes'), loop['pops'])
+        self.assertEqual(loop['evaluations'], sum(self.n - m - 2 for m in xrange(merges)))
+        self.assertEqual(stats.counters['similarities']['evaluations'], self.n * (self.n - 1) // 2)
+        self.assertEqual(stats.store_bytes, self.n * (self.n - 1) // 2 * 8)
+        self.assertTrue(stats.peak_heap_entries >= stats.counters['heap']['pushes'])
+        self.assertTrue(stats.peak_memory() > stats.store_bytes)
+        self.assertEqual(len(stats.report()), 4)
+
+    def test_on_merge(self):
+        calls = []
+        clusters = hac.hierarchical_clustering(self.data, on_merge=lambda c, m, left: calls.append((c.size, m, left)))
+        self.assertEqual([m for size, m, left in calls], range(1, self.n - len(clusters) + 1))
+        self.assertTrue(all(m + left == self.n and size >= 2 for size, m, left in calls))
+
+    def test_progress_printer(self):
+        writer = StringIO()
+        hac.hierarchical_clustering(self.data, on_merge=progress_printer(every=10, writer=writer))
+        lines = writer.getvalue().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(lines[0].startswith('10 merges, %d of %d clusters left' % (self.n - 10, self.n)))
+
+    def test_not_with_edges(self):
+        self.assertRaises(ValueError, hac.hierarchical_clustering, self.data, edges=[], stats=ClusteringStats())
+
+
+if __name__ == '__main__':
+    unittest.main()
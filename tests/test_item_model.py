@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import copy
+import os
+import unittest
+
+from recommendations.item_model import build_item_model, load_item_model
+from recommendations import recommend
+from tests.data import directory, movielens_path
+
+__author__ = 'goran'
+
+
+class ItemModelTest(unittest.TestCase):
+    '''
+    The neighbor lists of the model, built at once or kept up to date rating by rating, against calculate_similar_items
+    '''
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.items = sorted(recommend.transform_prefs(self.prefs))
+
+    def assertSameNeighbors(self, model, prefs):
+        expected = recommend.calculate_similar_items(prefs, n=10)
+        self.assertEqual(sorted(model), sorted(expected))
+        for item in expected:
+            self.assertEqual(model[item], expected[item])
+
+    def changes(self):
+        users = sorted(self.prefs)
+        return [(users[0], self.items[0], 1.0), (users[1], self.items[3], 5.0), (users[2], self.items[7], None),
+                (users[2], sorted(self.prefs[users[2]])[0], None), (users[3], sorted(self.prefs[users[3]])[1], 2.0)]
+
+    def test_build(self):
+        self.assertSameNeighbors(build_item_model(self.prefs), self.prefs)
+
+    def test_pearson(self):
+        model = build_item_model(self.prefs, n=len(self.items), metric='pearson')
+        expected = recommend.calculate_similar_items(self.prefs, n=len(self.items), similarity=recommend.sim_pearson)
+        for item in expected:
+            scores = dict((name, similarity) for similarity, name in expected[item])
+            self.assertEqual(len(model[item]), len(scores))
+            for similarity, name in model[item]:
+                self.assertAlmostEqual(similarity, scores[name])
+
+    def test_update(self):
+        model = build_item_model(self.prefs)
+        prefs = copy.deepcopy(self.prefs)
+        for user, item, rating in self.changes():
+            version = model.version
+            if rating is None:
+                model.remove_rating(user, item)
+                prefs[user].pop(item, None)
+            else:
+                model.set_rating(user, item, rating)
+                prefs[user][item] = rating
+            recommend.prefs_changed(prefs)
+            self.assertEqual(model.version, version + 1)
+            self.assertSameNeighbors(model, prefs)
+            self.assertEqual(model.user_prefs(user), prefs[user])
+
+    def test_new_user_and_item(self):
+        model = build_item_model(self.prefs)
+        prefs = copy.deepcopy(self.prefs)
+        model.update([('new user', 'new item', 4.0), ('new user', self.items[0], 3.0)])
+        prefs['new user'] = {'new item': 4.0, self.items[0]: 3.0}
+        self.assertSameNeighbors(model, prefs)
+
+    def test_save_load(self):
+        path = os.path.join(directory(), 'items.model')
+        model = build_item_model(self.prefs)
+        model.save(path)
+        loaded = load_item_model(path)
+        for item in model:
+            self.assertEqual(loaded[item], model[item])
+
+        prefs = copy.deepcopy(self.prefs)
+        loaded.update(self.changes())
+        for user, item, rating in self.changes():
+            if rating is None:
+                prefs[user].pop(item, None)
+            else:
+                prefs[user][item] = rating
+        self.assertSameNeighbors(loaded, prefs)
+
+    def test_recommendation(self):
+        model = build_item_model(self.prefs)
+        items_sim = recommend.calculate_similar_items(self.prefs, n=10)
+        for user in sorted(self.prefs)[:10]:
+            self.assertEqual(recommend.item_based_recommendation(None, model, user),
+                             recommend.item_based_recommendation(self.prefs, items_sim, user))
+
+    def test_unknown_metric(self):
+        self.assertRaises(ValueError, build_item_model, self.prefs, metric='cosine')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams.dendrogram import merge_key_words
+from exams.linkage import LINKAGES, get_linkage
+from exams import optimized_HAC_news as hac
+from tests.data import news_path
+
+__author__ = 'goran'
+
+
+def centroid(words):
+    result, size = {}, 0
+    for w in words:
+        result = merge_key_words(result, w, size, 1)
+        size += 1
+    return result
+
+
+def similarity(name, x, y):
+    '''
+    Similarity of the clusters with documents x and y (lists of key word dictionaries), computed from its definition
+    '''
+    if name == 'centroid':
+        return hac.sim_fun(centroid(x), centroid(y))
+    pairs = [hac.sim_fun(a, b) for a in x for b in y]
+    if name == 'single':
+        return max(pairs)
+    if name == 'complete':
+        return min(pairs)
+    return sum(pairs) / len(pairs)
+
+
+class LinkageTest(unittest.TestCase):
+    '''
+    The Lance-Williams update of every linkage against the similarity of the merged cluster computed from its documents
+    '''
+    def setUp(self):
+        words = [hac.cluster_words(c) for c in hac.load_data(news_path(30))]
+        self.i, self.j, self.k = words[0:4], words[10:13], words[20:25]
+
+    def assertUpdate(self, name):
+        i, j, k = self.i, self.j, self.k
+        masses = [sum(centroid(x).itervalues()) for x in (i, j)]
+        combined = get_linkage(name, [], []).combine(similarity(name, k, i), similarity(name, k, j),
+                                                     similarity(name, i, j), len(i), len(j), len(k), *masses)
+        self.assertAlmostEqual(combined, similarity(name, k, i + j))
+
+    def test_single(self):
+        self.assertUpdate('single')
+
+    def test_complete(self):
+        self.assertUpdate('complete')
+
+    def test_average(self):
+        self.assertUpdate('average')
+
+    def test_centroid(self):
+        self.assertUpdate('centroid')
+
+    def test_ward_keeps_equal_similarities(self):
+        self.assertAlmostEqual(get_linkage('ward', [], []).combine(0.3, 0.3, 0.3, 4, 3, 5, 1.0, 1.0), 0.3)
+
+    def test_update_uses_slots(self):
+        link = get_linkage('average', [1, 2, 3], [1.0, 1.0, 1.0])
+        self.assertAlmostEqual(link.update(0.2, 0.5, 0.6, 0, 1, 2), (0.2 + 2 * 0.5) / 3)
+        link.merge(0, 1, 0.6)
+        self.assertEqual(link.sizes, [3, 2, 3])
+
+    def test_reducible(self):
+        self.assertEqual(sorted(name for name in LINKAGES if LINKAGES[name].reducible),
+                         ['average', 'complete', 'single', 'ward'])
+
+    def test_unknown_linkage(self):
+        self.assertRaises(ValueError, get_linkage, 'median', [], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
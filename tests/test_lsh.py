@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams.document_matrix import build_document_matrix
+from exams.lsh import SimHashIndex, knn_graph, recall_report
+from exams import optimized_HAC_news as hac
+from tests.data import news_path, partition
+
+__author__ = 'goran'
+
+
+class SimHashTest(unittest.TestCase):
+    def setUp(self):
+        self.data = hac.load_data(news_path(120))
+        self.matrix = build_document_matrix(self.data)
+
+    def test_signatures_are_reproducible(self):
+        index = SimHashIndex(self.matrix, bands=8, rows_per_band=4, seed=3)
+        self.assertEqual(index.signatures, SimHashIndex(self.matrix, bands=8, rows_per_band=4, seed=3).signatures)
+        self.assertTrue(all(len(s) == 8 and max(s) < 16 for s in index.signatures))
+        self.assertNotEqual(index.signatures, SimHashIndex(self.matrix, bands=8, rows_per_band=4, seed=4).signatures)
+
+    def test_edges_are_exact(self):
+        edges = knn_graph(self.matrix, k=3)
+        self.assertTrue(edges)
+        for i, j, similarity in edges:
+            self.assertTrue(i < j)
+            self.assertTrue(similarity >= 0.4)
+            self.assertAlmostEqual(similarity, self.matrix.similarity(i, j))
+
+    def test_k_nearest(self):
+        # the edges are the union of the 2 nearest neighbors of every document
+        edges = knn_graph(self.matrix, k=2)
+        self.assertTrue(len(self.matrix) <= len(edges) * 2)
+        self.assertTrue(len(edges) <= 2 * len(self.matrix))
+
+    def test_recall(self):
+        self.assertEqual(recall_report(self.matrix, k=len(self.matrix), bands=32, rows_per_band=2)['recall'], 1.0)
+
+    def test_clustering(self):
+        edges = knn_graph(self.matrix, k=len(self.matrix), bands=32, rows_per_band=2)
+        self.assertEqual(partition(hac.hierarchical_clustering(self.data, edges=edges, linkage='single')),
+                         partition(hac.hierarchical_clustering(self.data, linkage='single')))
+
+
+if __name__ == '__main__':
+    unittest.main()
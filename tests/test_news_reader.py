@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from exams import HAC_news
+from exams.document_matrix import Vocabulary
+from exams.news_reader import parse_word_ratings, read_news, read_news_chunks
+from tests.data import directory, news_path
+
+__author__ = 'goran'
+
+
+def write(name, text):
+    path = os.path.join(directory(), name)
+    with open(path, 'w') as w:
+        w.write(text)
+    return path
+
+
+class NewsReaderTest(unittest.TestCase):
+    def test_same_as_original(self):
+        path = news_path(60)
+        documents = list(read_news(path))
+        expected = HAC_news.load_data(path)
+        self.assertEqual([title for title, vector in documents], [c.title for c in expected])
+        self.assertEqual([vector.words() for title, vector in documents], [c.words for c in expected])
+
+    def test_parse_word_ratings(self):
+        vocabulary = Vocabulary()
+        vector = parse_word_ratings('prius(22.11) toyota(19.07) bad( (3.0) x(y) prius(1.5)\n', vocabulary)
+        self.assertEqual(vocabulary.words, ['prius', 'toyota'])
+        self.assertEqual(vector.words(), {'prius': 1.5, 'toyota': 19.07})
+
+    def test_malformed_documents(self):
+        path = write('malformed.txt', 'first\na(1.0) b(2.0)\n\nsecond\nbroken(\n\nthird\nb(3.0)\nfourth\nc(4.0)\n\n')
+        documents = list(read_news(path))
+        self.assertEqual([title for title, vector in documents], ['first\n', 'third\n', 'fourth\n'])
+        self.assertEqual([vector.words() for title, vector in documents], [{'a': 1.0, 'b': 2.0}, {'b': 3.0}, {'c': 4.0}])
+
+    def test_chunks_share_vocabulary(self):
+        path = news_path(60)
+        vocabulary = Vocabulary()
+        chunks = list(read_news_chunks(path, chunk_size=25, vocabulary=vocabulary))
+        self.assertEqual([len(chunk) for chunk in chunks], [25, 25, 10])
+        self.assertEqual([vector.words() for chunk in chunks for title, vector in chunk],
+                         [vector.words() for title, vector in read_news(path)])
+        self.assertTrue(all(vector.vocabulary is vocabulary for chunk in chunks for title, vector in chunk))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams import optimized_HAC_news as hac
+from tests.data import merge_similarities, news_path, partition
+
+__author__ = 'goran'
+
+
+class NearestNeighborChainTest(unittest.TestCase):
+    '''
+    The nearest neighbor chain has to do the same merges as the heap for every reducible linkage
+    '''
+    def assertSameClustering(self, linkage, min_closeness=0.4):
+        data = hac.load_data(news_path(120))
+        expected = hac.hierarchical_clustering(data, min_closeness=min_closeness, linkage=linkage)
+        clusters = hac.nn_chain_clustering(data, min_closeness=min_closeness, linkage=linkage)
+        self.assertEqual(partition(clusters), partition(expected))
+        for a, b in zip(merge_similarities(clusters), merge_similarities(expected)):
+            self.assertAlmostEqual(a, b)
+
+    def test_single(self):
+        self.assertSameClustering('single')
+
+    def test_complete(self):
+        self.assertSameClustering('complete', 0.2)
+
+    def test_average(self):
+        self.assertSameClustering('average')
+
+    def test_ward(self):
+        self.assertSameClustering('ward')
+
+    def test_centroid_is_rejected(self):
+        self.assertRaises(ValueError, hac.nn_chain_clustering, hac.load_data(news_path(40)), linkage='centroid')
+        self.assertRaises(ValueError, hac.check_linkage, 'nn_chain', 'centroid')
+        hac.check_linkage('heap', 'centroid')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams.condensed import CondensedMatrix
+from exams.document_matrix import build_document_matrix
+from exams import optimized_HAC_news as hac
+from exams.parallel_similarity import fill_similarities, row_blocks
+from tests.data import news_path, partition
+
+__author__ = 'goran'
+
+
+class ParallelSimilarityTest(unittest.TestCase):
+    def test_row_blocks(self):
+        for n, blocks in [(1, 4), (2, 4), (10, 3), (100, 16)]:
+            ranges = row_blocks(n, blocks)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], n)
+            self.assertTrue(all(a[1] == b[0] for a, b in zip(ranges, ranges[1:])))
+
+    def test_same_as_serial(self):
+        matrix = build_document_matrix(hac.load_data(news_path(80)))
+        serial = CondensedMatrix(len(matrix))
+        for i, sims in matrix.upper_similarities():
+            serial.set_upper_row(i, sims)
+        for typecode in ('d', 'f'):
+            store = fill_similarities(matrix, CondensedMatrix(len(matrix), typecode, shared=True), workers=2)
+            for a, b in zip(store.values, serial.values):
+                self.assertAlmostEqual(a, b, places=5)
+
+    def test_clustering(self):
+        data = hac.load_data(news_path(120))
+        self.assertEqual(partition(hac.hierarchical_clustering(data, workers=2)),
+                         partition(hac.hierarchical_clustering(data)))
+
+
+if __name__ == '__main__':
+    unittest.main()
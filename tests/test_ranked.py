@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+
+from recommendations.recommend import critics, item_based_recommendation, calculate_similar_items, ranked, \
+    top_matches, user_based_recommendation
+
+__author__ = 'goran'
+
+
+class RankedTest(unittest.TestCase):
+    '''
+    Selecting the top with a heap has to give what sorting everything and slicing gave
+    '''
+    def test_same_as_sorting(self):
+        rnd = random.Random(0)
+        # few distinct scores, so there are many ties broken by the name
+        scores = [(rnd.randint(0, 5) / 2.0, 'item %d' % rnd.randint(0, 50)) for _ in xrange(200)]
+        for top in (0, 1, 5, 50, 200, 300):
+            self.assertEqual(ranked(iter(scores), top), sorted(scores, reverse=True)[:top])
+        self.assertEqual(ranked(scores), sorted(scores, reverse=True))
+
+    def test_top(self):
+        items_sim = calculate_similar_items(critics)
+        for person in critics:
+            for top in (1, 2, 10):
+                self.assertEqual(user_based_recommendation(critics, person, top=top),
+                                 user_based_recommendation(critics, person)[:top])
+                self.assertEqual(item_based_recommendation(critics, items_sim, person, top=top),
+                                 item_based_recommendation(critics, items_sim, person)[:top])
+                self.assertEqual(top_matches(critics, person, n=top), top_matches(critics, person, n=10)[:top])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from recommendations.rating_matrix import rating_matrix
+from recommendations import recommend
+from tests.data import movielens_path
+
+__author__ = 'goran'
+
+
+# The per pair functions wrapped, so recommend does not replace them by their Metric and loops over the dictionaries
+PER_PAIR = {recommend.sim_pearson: lambda prefs, a, b: recommend.sim_pearson(prefs, a, b),
+            recommend.sim_distance: lambda prefs, a, b: recommend.sim_distance(prefs, a, b)}
+
+
+class RatingMatrixTest(unittest.TestCase):
+    '''
+    The batched RatingMatrix paths of recommend against the per pair functions on dictionary prefs
+    '''
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.matrix = rating_matrix(self.prefs)
+        self.users = sorted(self.prefs)[:10]
+
+    def assertSameScores(self, scores, expected):
+        self.assertEqual(len(scores), len(expected))
+        expected = dict((name, score) for score, name in expected)
+        for score, name in scores:
+            self.assertAlmostEqual(score, expected[name])
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_dictionary(self):
+        self.assertEqual(dict(self.matrix.iteritems()), self.prefs)
+        self.assertEqual(dict(self.matrix.transposed().iteritems()), recommend.transform_prefs(self.prefs))
+        self.assertTrue(rating_matrix(self.matrix) is self.matrix)
+
+    def test_top_matches(self):
+        for similarity in (recommend.sim_pearson, recommend.sim_distance):
+            for user in self.users:
+                expected = recommend.top_matches(self.prefs, user, len(self.prefs), PER_PAIR[similarity])
+                for prefs in (self.matrix, self.prefs):
+                    self.assertSameScores(recommend.top_matches(prefs, user, len(self.prefs), similarity), expected)
+
+    def test_user_based_recommendation(self):
+        for similarity in (recommend.sim_pearson, recommend.sim_distance):
+            for user in self.users:
+                expected = recommend.user_based_recommendation(self.prefs, user, PER_PAIR[similarity])
+                for prefs in (self.matrix, self.prefs):
+                    self.assertSameScores(recommend.user_based_recommendation(prefs, user, similarity), expected)
+
+    def test_user_based_recommendation_first_n(self):
+        # both paths divide by the total similarity of an item, which is 0 if all 5 nearest users have similarity 0
+        pearson = PER_PAIR[recommend.sim_pearson]
+        for user in [u for u in self.users if recommend.top_matches(self.prefs, u, 5)[-1][0] > 0]:
+            expected = recommend.user_based_recommendation_first_n(self.prefs, user, pearson, n=5)
+            for prefs in (self.matrix, self.prefs):
+                self.assertSameScores(recommend.user_based_recommendation_first_n(prefs, user, n=5), expected)
+
+    def test_calculate_similar_items(self):
+        items = len(recommend.transform_prefs(self.prefs))
+        expected = recommend.calculate_similar_items(self.prefs, n=items,
+                                                     similarity=PER_PAIR[recommend.sim_distance])
+        for prefs in (self.matrix, self.prefs):
+            result = recommend.calculate_similar_items(prefs, n=items)
+            self.assertEqual(sorted(result), sorted(expected))
+            for item in expected:
+                self.assertSameScores(result[item], expected[item])
+
+    def test_kept_matrix(self):
+        # dictionary prefs are served from one RatingMatrix until they are reported changed
+        prefs = dict((user, dict(ratings)) for user, ratings in recommend.critics.iteritems())
+        matrix = recommend.prefs_matrix(prefs)
+        self.assertTrue(recommend.prefs_matrix(prefs) is matrix)
+        prefs['Toby']['Just My Luck'] = 5.0
+        recommend.prefs_changed(prefs)
+        changed = recommend.prefs_matrix(prefs)
+        self.assertFalse(changed is matrix)
+        self.assertEqual(changed['Toby']['Just My Luck'], 5.0)
+        self.assertEqual(recommend.user_based_recommendation(prefs, 'Toby'),
+                         recommend.user_based_recommendation(prefs, 'Toby', PER_PAIR[recommend.sim_pearson]))
+
+    def test_critics(self):
+        self.assertSameScores(recommend.user_based_recommendation(rating_matrix(recommend.critics), 'Toby'),
+                              [(3.3477895267131013, 'The Night Listener'), (2.8325499182641614, 'Lady in the Water'),
+                               (2.5309807037655645, 'Just My Luck')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from recommendations.item_model import build_item_model
+from recommendations import recommend
+from recommendations.service import LatencyCounter, RecommendationService, ResultCache
+from tests.data import movielens_path
+
+__author__ = 'goran'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class AfterRelease:
+    '''
+    Lock which runs action once, right after it is released for the first time
+    '''
+    def __init__(self, lock, action):
+        self.lock = lock
+        self.action = action
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+        if self.action is not None:
+            action, self.action = self.action, None
+            thread = threading.Thread(target=action)
+            thread.start()
+            thread.join()
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_lru(self):
+        cache = ResultCache(size=2)
+        cache.put(('a', 1), 'a1')
+        cache.put(('b', 1), 'b1')
+        self.assertEqual(cache.get(('a', 1)), 'a1')
+        cache.put(('c', 1), 'c1')
+        self.assertEqual(cache.get(('b', 1)), None)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(sorted(cache.keys_of_user), ['a', 'c'])
+
+    def test_ttl(self):
+        clock = Clock()
+        cache = ResultCache(ttl=10, clock=clock)
+        cache.put(('a', 1), 'a1')
+        clock.now = 10
+        self.assertEqual(cache.get(('a', 1)), 'a1')
+        clock.now = 10.5
+        self.assertEqual(cache.get(('a', 1)), None)
+        self.assertEqual(cache.keys_of_user, {})
+
+    def test_invalidate(self):
+        cache = ResultCache()
+        for key in [('a', 1), ('a', 2), ('b', 1)]:
+            cache.put(key, key)
+        cache.invalidate('a')
+        self.assertEqual(list(cache.entries), [('b', 1)])
+
+    def test_latency_counter(self):
+        counter = LatencyCounter(size=10)
+        self.assertEqual(counter.percentile(50), None)
+        for k in xrange(25):
+            counter.add(k)
+        self.assertEqual(counter.percentile(0), 15)
+        self.assertEqual(counter.percentile(100), 24)
+
+
+class RecommendationServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.users = sorted(self.prefs)[:3]
+        self.service = RecommendationService(build_item_model(self.prefs, n=10), self.prefs)
+
+    def test_same_as_recommend(self):
+        items_sim = recommend.calculate_similar_items(self.prefs, n=10)
+        for user in self.users:
+            expected = recommend.item_based_recommendation(self.prefs, items_sim, user)[:5]
+            self.assertEqual(self.service.recommend(user, 5), expected)
+            self.assertEqual(self.service.recommend(user, 5), expected)
+            self.assertEqual(self.service.recommend(user, 5, user_based=True),
+                             recommend.user_based_recommendation_first_n(self.prefs, user, n=10)[:5])
+        self.assertEqual(self.service.similar_items(items_sim.keys()[0], 3), items_sim[items_sim.keys()[0]][:3])
+        stats = self.service.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['cached']), (3, 7, 7))
+
+    def test_set_rating(self):
+        user, other = self.users[:2]
+        item = self.service.recommend(user)[0][1]
+        self.service.recommend(other)
+        self.service.set_rating(user, item, 1.0)
+        self.assertEqual(self.prefs[user][item], 1.0)
+        self.assertTrue(item not in [i for s, i in self.service.recommend(user)])
+        self.assertEqual(self.service.stats()['hits'], 0)
+        self.service.recommend(other)
+        self.assertEqual(self.service.stats()['hits'], 1)
+
+    def test_set_rating_similar_items(self):
+        # the rating changes neighbor lists, their similar_items and the recommendations of the users who rated those
+        # items are dropped, the other cached results stay
+        user = self.users[0]
+        items = sorted(self.service.model)
+        for item in items:
+            self.service.similar_items(item)
+        for other in sorted(self.prefs):
+            self.service.recommend(other)
+        item = recommend.item_based_recommendation(None, self.service.model, user)[0][1]
+        changed = build_item_model(self.prefs, n=10).set_rating(user, item, 1.0)
+        self.assertTrue(changed)
+        self.service.set_rating(user, item, 1.0)
+        expected = recommend.calculate_similar_items(self.prefs, n=10)
+        for item in items:
+            self.assertEqual(self.service.similar_items(item), expected[item])
+        for other in sorted(self.prefs):
+            self.assertEqual(self.service.recommend(other),
+                             recommend.item_based_recommendation(None, self.service.model, other, top=10))
+        kept = [other for other in self.prefs if other != user and not changed & set(self.prefs[other])]
+        self.assertEqual(self.service.stats()['hits'], len(items) - len(changed) + len(kept))
+
+    def test_set_rating_user_based(self):
+        # the RatingMatrix kept for the prefs dictionary is built again after the rating changed it
+        user = self.users[0]
+        item = self.service.recommend(user, user_based=True)[0][1]
+        self.service.set_rating(user, item, 1.0)
+        self.assertEqual(recommend.prefs_matrix(self.prefs)[user][item], 1.0)
+        self.assertTrue(item not in [i for s, i in self.service.recommend(user, user_based=True)])
+
+    def test_use_model(self):
+        user = self.users[0]
+        self.service.recommend(user)
+        self.service.use_model(build_item_model(self.prefs, n=5))
+        self.assertEqual(self.service.stats()['cached'], 0)
+        self.service.recommend(user)
+        self.assertEqual(self.service.stats()['misses'], 2)
+
+    def test_rating_while_computing(self):
+        # the rating changes after the result is computed but before it is cached, the older result is not kept
+        user = self.users[0]
+        item = self.service.recommend(user)[0][1]
+        self.service.cache.clear()
+        self.service._model_lock = AfterRelease(self.service._model_lock,
+                                                lambda: self.service.set_rating(user, item, 5.0))
+        self.assertTrue(item in [i for s, i in self.service.recommend(user)])
+        self.assertTrue(item not in [i for s, i in self.service.recommend(user)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from exams.document_matrix import build_document_matrix
+from exams import optimized_HAC_news as hac
+from exams.similarity_join import similarity_join
+from tests.data import merge_similarities, news_path, partition
+
+__author__ = 'goran'
+
+
+def brute_force(matrix, min_closeness):
+    return [(i, i + 1 + x, s) for i, sims in matrix.upper_similarities() for x, s in enumerate(sims)
+            if s >= min_closeness]
+
+
+class SimilarityJoinTest(unittest.TestCase):
+    def setUp(self):
+        self.data = hac.load_data(news_path(120))
+        self.matrix = build_document_matrix(self.data)
+
+    def test_same_as_brute_force(self):
+        for min_closeness in (0.2, 0.4, 0.8, 2.0):
+            edges = similarity_join(self.matrix, min_closeness)
+            expected = brute_force(self.matrix, min_closeness)
+            self.assertEqual([(i, j) for i, j, s in edges], [(i, j) for i, j, s in expected])
+            for a, b in zip(edges, expected):
+                self.assertAlmostEqual(a[2], b[2])
+
+    def test_clustering(self):
+        edges = similarity_join(self.matrix)
+        for linkage in ('centroid', 'single', 'complete', 'average', 'ward'):
+            clusters = hac.sparse_clustering(self.data, edges, linkage=linkage)
+            expected = hac.hierarchical_clustering(self.data, linkage=linkage)
+            self.assertEqual(partition(clusters), partition(expected))
+            for a, b in zip(merge_similarities(clusters), merge_similarities(expected)):
+                self.assertAlmostEqual(a, b)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from math import sqrt
+import unittest
+
+from common.similarity_metrics import METRICS, Metric, as_metric, get_metric, register_metric
+from exams.document_matrix import build_document_matrix
+from exams import optimized_HAC_news as hac
+from recommendations.rating_matrix import rating_matrix
+from recommendations import recommend
+from tests.data import movielens_path, news_path, partition
+
+__author__ = 'goran'
+
+
+def cosine(x, y):
+    den = sqrt(sum(v * v for v in x.itervalues()) * sum(v * v for v in y.itervalues()))
+    return sum(x[k] * y[k] for k in x if k in y) / den
+
+
+def jaccard(x, y):
+    return 1.0 * len(set(x) & set(y)) / len(set(x) | set(y))
+
+
+class SimilarityMetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.ratings = rating_matrix(self.prefs)
+        self.documents = build_document_matrix(hac.load_data(news_path(40)))
+
+    def assertRowsMatch(self, matrix, metric, expected):
+        '''
+        similarity_row and similarity of metric against expected(r, c) for the first rows of matrix
+        '''
+        for r in xrange(10):
+            row = metric.similarity_row(matrix, r)
+            for c in xrange(len(matrix)):
+                if c != r:
+                    self.assertAlmostEqual(row[c], expected(r, c))
+                    self.assertAlmostEqual(metric.similarity(matrix, r, c), expected(r, c))
+            partial = metric.similarity_row(matrix, r, 5)
+            self.assertEqual(list(partial[:5]), [0.0] * 5)
+            self.assertEqual(list(partial[5:]), list(row[5:]))
+
+    def test_euclidean(self):
+        users = self.ratings.users
+        self.assertRowsMatch(self.ratings, get_metric('euclidean'),
+                             lambda r, c: recommend.sim_distance(self.prefs, users[r], users[c]))
+
+    def test_pearson(self):
+        users = self.ratings.users
+        self.assertRowsMatch(self.ratings, get_metric('pearson'),
+                             lambda r, c: recommend.sim_pearson(self.prefs, users[r], users[c]))
+
+    def test_cosine(self):
+        users = self.ratings.users
+        self.assertRowsMatch(self.ratings, get_metric('cosine'),
+                             lambda r, c: cosine(self.prefs[users[r]], self.prefs[users[c]]))
+
+    def test_jaccard(self):
+        users = self.ratings.users
+        self.assertRowsMatch(self.ratings, get_metric('jaccard'),
+                             lambda r, c: jaccard(self.prefs[users[r]], self.prefs[users[c]]))
+
+    def test_adjusted_cosine(self):
+        users, items = self.ratings.users, self.ratings.items
+        means = self.ratings.column_means()
+        centered = [dict((i, self.prefs[user][items[i]] - means[i]) for i in xrange(len(items))
+                         if items[i] in self.prefs[user]) for user in users]
+
+        def expected(r, c):
+            x = dict((i, v) for i, v in centered[r].iteritems() if i in centered[c])
+            y = dict((i, v) for i, v in centered[c].iteritems() if i in centered[r])
+            return cosine(x, y) if x and any(x.values()) and any(y.values()) else 0.0
+
+        self.assertRowsMatch(self.ratings, get_metric('adjusted_cosine'), expected)
+
+    def test_sim_fun(self):
+        words = [self.documents.row_vector(r).words() for r in xrange(len(self.documents))]
+        self.assertRowsMatch(self.documents, get_metric('sim_fun'), lambda r, c: hac.sim_fun(words[r], words[c]))
+
+    def test_clustering(self):
+        data = hac.load_data(news_path(120))
+        self.assertEqual(partition(hac.hierarchical_clustering(data, sim_function='sim_fun')),
+                         partition(hac.hierarchical_clustering(data)))
+
+    def test_registry(self):
+        class Overlap(Metric):
+            name = 'overlap'
+
+            def combine(self, shared, products, sum_x, sum_y, sq_x, sq_y, totals, r, c):
+                return shared
+
+        try:
+            metric = register_metric(Overlap())
+            self.assertTrue(get_metric('overlap') is metric)
+            self.assertTrue(as_metric('overlap') is metric)
+            self.assertTrue(as_metric(metric) is metric)
+            users = self.ratings.users
+            self.assertRowsMatch(self.ratings, metric,
+                                 lambda r, c: len(set(self.prefs[users[r]]) & set(self.prefs[users[c]])))
+        finally:
+            METRICS.pop('overlap', None)
+        self.assertEqual(as_metric(recommend.sim_pearson), None)
+        self.assertRaises(ValueError, get_metric, 'overlap')
+
+
+if __name__ == '__main__':
+    unittest.main()
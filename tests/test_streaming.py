@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from recommendations import recommend
+from recommendations.streaming import read_ratings, stream_similar_items
+from tests.data import directory, movielens_path
+
+__author__ = 'goran'
+
+
+class StreamingTest(unittest.TestCase):
+    '''
+    The out of core similar items against calculate_similar_items, with chunks and pair buffers small enough that
+    every pass flushes many times
+    '''
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.items = len(recommend.transform_prefs(self.prefs))
+
+    def stream(self, n, similarity):
+        return stream_similar_items(read_ratings(movielens_path()), n, similarity, shards=3, chunk_size=50,
+                                    max_pairs=200, directory=directory())
+
+    def assertSameScores(self, result, expected):
+        self.assertEqual(sorted(result), sorted(expected))
+        for item in expected:
+            scores = dict((name, similarity) for similarity, name in expected[item])
+            self.assertEqual(len(result[item]), len(scores))
+            for similarity, name in result[item]:
+                self.assertAlmostEqual(similarity, scores[name])
+
+    def test_read_ratings(self):
+        prefs = {}
+        for user, item, rating in read_ratings(movielens_path()):
+            prefs.setdefault(user, {})[item] = rating
+        self.assertEqual(prefs, self.prefs)
+
+    def test_distance(self):
+        self.assertEqual(self.stream(10, recommend.sim_distance), recommend.calculate_similar_items(self.prefs, 10))
+
+    def test_pearson(self):
+        self.assertSameScores(self.stream(self.items, recommend.sim_pearson),
+                              recommend.calculate_similar_items(self.prefs, self.items, recommend.sim_pearson))
+
+    def test_metrics(self):
+        for name in ('jaccard', 'adjusted_cosine'):
+            self.assertSameScores(self.stream(self.items, name),
+                                  recommend.calculate_similar_items(self.prefs, self.items, name))
+
+    def test_shards_removed(self):
+        self.stream(5, recommend.sim_distance)
+        self.assertEqual([name for name in os.listdir(directory()) if name.startswith('similar_items')], [])
+
+    def test_plain_function(self):
+        self.assertRaises(ValueError, self.stream, 5, lambda prefs, a, b: 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import heapq
+import random
+from math import sqrt
+import unittest
+
+from recommendations.factorization import train_als
+from recommendations.item_model import build_item_model
+from recommendations import recommend
+from recommendations.service import RecommendationService
+from recommendations.vector_index import (InnerProductIndex, dot, factor_index, factor_index_recommendation,
+                                          factor_query, recall_report)
+from tests.data import movielens_path
+
+__author__ = 'goran'
+
+
+class InnerProductIndexTest(unittest.TestCase):
+    def setUp(self):
+        r = random.Random(0)
+        self.names = ['v%d' % i for i in xrange(200)]
+        self.vectors = [dict((d, r.gauss(0, 1 + i % 3)) for d in r.sample(xrange(20), 8)) for i in xrange(200)]
+        self.index = InnerProductIndex(self.names, self.vectors, lists=12, probes=2)
+        self.queries = [dict((d, r.gauss(0, 1)) for d in xrange(20)) for _ in xrange(10)]
+
+    def exact(self, query, n=10, exclude=()):
+        return heapq.nlargest(n, ((dot(query, v), name) for name, v in zip(self.names, self.vectors)
+                                  if name not in exclude))
+
+    def test_lists(self):
+        self.assertEqual(sorted(i for members in self.index.members for i in members), range(len(self.names)))
+        norms = [sqrt(dot(v, v)) for v in self.index.vectors]
+        for norm in norms:
+            self.assertAlmostEqual(norm, norms[0])
+
+    def test_all_probes_are_exact(self):
+        for query in self.queries:
+            exclude = set(self.names[:5])
+            result = self.index.search(query, 10, self.index.lists, exclude)
+            expected = self.exact(query, 10, exclude)
+            self.assertEqual([name for score, name in result], [name for score, name in expected])
+            for (a, x), (b, y) in zip(result, expected):
+                self.assertAlmostEqual(a, b)
+
+    def test_recall(self):
+        report = recall_report(self.index, [(query, ()) for query in self.queries],
+                               lambda query, exclude: [name for score, name in self.exact(query, 10, exclude)],
+                               probes=(1, 4, 12))
+        recalls = [recall for probes, recall, milliseconds in report]
+        self.assertEqual(recalls, sorted(recalls))
+        self.assertEqual(recalls[-1], 1.0)
+
+
+class FactorIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.prefs = recommend.loadMovieLens(movielens_path())
+        self.model = train_als(self.prefs, k=3, iterations=3)
+        self.index = factor_index(self.model, lists=8)
+
+    def test_query(self):
+        user = self.model.users[0]
+        base = self.model.mean + self.model.user_params[0]
+        for i, item in enumerate(self.model.items[:10]):
+            self.assertAlmostEqual(base + dot(factor_query(self.model, user), self.index.vectors[i]),
+                                   self.model.predict(user, item))
+
+    def test_all_probes_are_exact(self):
+        for user in self.model.users[:10]:
+            result = factor_index_recommendation(self.index, self.model, user, 10, probes=self.index.lists)
+            expected = self.model.recommend(user, 10)
+            self.assertEqual([item for score, item in result], [item for score, item in expected])
+            for (a, x), (b, y) in zip(result, expected):
+                self.assertAlmostEqual(a, b)
+
+    def test_service(self):
+        service = RecommendationService(build_item_model(self.prefs), self.prefs, factors=self.model,
+                                        index=self.index, probes=self.index.lists)
+        user = self.model.users[0]
+        self.assertEqual(service.recommend_factors(user, 5),
+                         factor_index_recommendation(self.index, self.model, user, 5, self.index.lists))
+
+
+if __name__ == '__main__':
+    unittest.main()